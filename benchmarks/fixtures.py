@@ -0,0 +1,252 @@
+'''Fixture corpus of TOP500 pages for offline benchmarks.
+
+A corpus is a directory with the pages laid out like the site's URLs:
+
+    list/YYYY/MM/PAGE.html    a page of a list edition
+    system/SYSTEM_ID.html     a system details page
+    site/SITE_ID.html         a site details page
+
+A corpus can be recorded from the live site, or generated: generated pages
+follow the structure of the site's pages (see the scraper for details), with
+made up systems that enter and leave the list across editions.
+
+Usage:
+    python3 -m benchmarks.fixtures record [-y YEAR -m MONTH ...] DIR
+    python3 -m benchmarks.fixtures generate [-y YEAR -m MONTH ...] DIR
+'''
+
+import argparse
+import os
+import random
+import re
+from datetime import date
+from bs4 import BeautifulSoup
+from top500.fetch import Fetcher
+from top500.scraper import _fetch
+from top500.urlgen import editions, id_from_link, url_for_list, \
+    url_for_site, url_for_system, LAST_LIST, VALID_MONTHS, VALID_YEARS
+
+PAGES = 5
+ENTRIES_PER_PAGE = 100
+
+def list_path(corpus, edition, page):
+    'Path of a list page in a corpus'
+    return os.path.join(corpus, 'list', '%4d' % edition.year,
+                        '%02d' % edition.month, '%d.html' % page)
+
+def system_path(corpus, system_id):
+    'Path of a system details page in a corpus'
+    return os.path.join(corpus, 'system', '%s.html' % system_id)
+
+def site_path(corpus, site_id):
+    'Path of a site details page in a corpus'
+    return os.path.join(corpus, 'site', '%s.html' % site_id)
+
+def path_for_url(corpus, path):
+    '''Maps the path (and query) of an URL of the site to the file of a
+    corpus that holds the page, or None if it's not a known kind of page'''
+    match = re.match(r'/list/(\d{4})/(\d{2})/?\?page=(\d+)$', path)
+    if match:
+        year, month, page = (int(x) for x in match.groups())
+        return list_path(corpus, date(year, month, 1), page)
+    match = re.match(r'/(system|site)/(\d+)$', path)
+    if match:
+        kind, key = match.groups()
+        return os.path.join(corpus, kind, '%s.html' % key)
+    return None
+
+def _save(path, content):
+    'Writes a page into a corpus'
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as page:
+        page.write(content)
+
+def record(corpus, start, end, pages=PAGES):
+    '''Downloads the list pages of the editions between start and end, and the
+    system and site pages they reference, into a corpus'''
+    fetcher = Fetcher()
+    for edition in editions(start, end):
+        for page in range(1, pages + 1):
+            content = _fetch(url_for_list(edition, page), fetcher).content
+            _save(list_path(corpus, edition, page), content)
+            soup = BeautifulSoup(content, 'html.parser')
+            for link in soup.find_all('a', href=True):
+                match = re.search(r'/(system|site)/\d+$', link['href'])
+                if not match:
+                    continue
+                key = id_from_link(link['href'])
+                if match.group(1) == 'system':
+                    path, url = system_path(corpus, key), url_for_system(key)
+                else:
+                    path, url = site_path(corpus, key), url_for_site(key)
+                if not os.path.exists(path):
+                    _save(path, _fetch(url, fetcher).content)
+
+PROCESSORS = ('Xeon E5-2680v2 10C 2.8GHz', 'Power BQC 16C 1.60 GHz',
+              'Sunway SW26010 260C 1.45GHz', 'Opteron 6274 16C 2.2GHz',
+              'SPARC64 VIIIfx 2.0GHz', 'Xeon Platinum 8160 24C 2.1GHz')
+INTERCONNECTS = ('Infiniband FDR', 'Custom Interconnect', 'Gigabit Ethernet',
+                 'Aries interconnect', 'Tofu interconnect', '10G Ethernet')
+GPUS = ('NVIDIA Tesla K20x', 'Intel Xeon Phi 7120P', 'NVIDIA Tesla P100')
+SEGMENTS = ('Research', 'Academic', 'Industry', 'Government', 'Vendor')
+
+SYSTEM_PAGE = '''<html><head><title>%(name)s</title></head><body>
+<h1>%(name)s - %(processor)s, %(interconnect)s</h1>
+<table class="table table-condensed">
+<tr><th>Site:</th><td><a href="/site/%(site_id)d">Site %(site_id)d</a></td></tr>
+<tr><th>Manufacturer:</th><td>%(manufacturer)s</td></tr>
+<tr><th>Cores:</th><td>%(cores)s</td></tr>
+<tr><th>Memory:</th><td>%(memory)s GB</td></tr>
+<tr><th>Processor:</th><td>%(processor)s</td></tr>
+<tr><th>Interconnect:</th><td>%(interconnect)s</td></tr>
+<tr><th colspan="2">Performance</th></tr>
+<tr><th>Linpack Performance (Rmax)</th><td>%(rmax)s TFlop/s</td></tr>
+<tr><th>Theoretical Peak (Rpeak)</th><td>%(rpeak)s TFlop/s</td></tr>
+<tr><th>Nmax</th><td>%(nmax)s</td></tr>
+<tr><th colspan="2">Power Consumption</th></tr>
+<tr><th>Power:</th><td>%(power)s</td></tr>
+<tr><th colspan="2">Software</th></tr>
+<tr><th>Operating System:</th><td>Linux</td></tr>
+</table>
+<h3>List Rank History</h3>
+<table class="table table-condensed">
+<tr><th>List</th><th>Rank</th><th>System</th><th>Vendor</th><th>Total Cores</th>
+<th>Rmax (TFlops)</th><th>Rpeak (TFlops)</th><th>Power (kW)</th></tr>
+%(history)s
+</table></body></html>
+'''
+
+HISTORY_ROW = '''<tr><td>%02d/%d</td><td>%d</td><td>%s</td><td>%s</td>\
+<td>%s</td><td>%s</td><td>%s</td><td>%s</td></tr>'''
+
+SITE_PAGE = '''<html><head><title>Site %(site_id)d</title></head><body>
+<h1></h1><h1>Site %(site_id)d</h1>
+<table class="table table-condensed">
+<tr><th>URL</th><td>http://www.site%(site_id)d.example.org</td></tr>
+<tr><th>City</th><td>City %(site_id)d</td></tr>
+<tr><th>Country</th><td>Country %(country)d</td></tr>
+<tr><th>Segment</th><td>%(segment)s</td></tr>
+</table>
+<table class="table"><tr><th>System</th></tr></table>
+</body></html>
+'''
+
+LIST_PAGE = '''<html><head><title>TOP500 List</title></head><body>
+<table class="table table-condensed table-striped">
+<thead><tr><th>Rank</th><th>Site</th><th>System</th><th>Cores</th>
+<th>Rmax (TFlop/s)</th><th>Rpeak (TFlop/s)</th><th>Power (kW)</th></tr></thead>
+%s
+</table></body></html>
+'''
+
+LIST_ROW = '''<tr><td>%d</td>
+<td><a href="https://www.top500.org/site/%d">Site %d</a><br>Country %d</td>
+<td><a href="https://www.top500.org/system/%d">%s</a><br>%s</td>
+<td>%s</td><td>%s</td><td>%s</td><td>%s</td></tr>'''
+
+def _system(system_id, rand):
+    'Makes up the details of a system'
+    rmax = rand.uniform(1, 100000)
+    return {
+        'system_id': system_id,
+        'name': 'System %d' % system_id,
+        'site_id': 10000 + rand.randrange(400),
+        'manufacturer': 'Vendor %d' % rand.randrange(20),
+        'cores': rand.randrange(1000, 1000000),
+        'memory': '{:,}'.format(rand.randrange(1000, 2000000)),
+        'processor': rand.choice(PROCESSORS),
+        'interconnect': rand.choice(INTERCONNECTS),
+        'gpu': rand.choice(GPUS) if rand.random() < 0.2 else None,
+        'rmax': rmax,
+        'rpeak': rmax * rand.uniform(1, 2),
+        'nmax': '{:,}'.format(rand.randrange(100000, 10000000)),
+        'power': rand.uniform(10, 20000) if rand.random() < 0.6 else None,
+        'history': [],
+    }
+
+def _listing(system):
+    'The text of a system in a list page'
+    parts = [system['name'], system['processor'],
+             system['interconnect'].split()[0]]
+    if system['gpu']:
+        parts.append(system['gpu'])
+    return ', '.join(parts)
+
+def generate(corpus, start, end, pages=PAGES, seed=500):
+    '''Generates a corpus with the list pages of the editions between start
+    and end, and the system and site pages they reference'''
+    rand = random.Random(seed)
+    entries = pages * ENTRIES_PER_PAGE
+    next_id = 170000
+    systems = {}
+    ranked = []
+    for edition in editions(start, end):
+        # About a fifth of the systems drop out of the list in each edition
+        ranked = [s for s in ranked if rand.random() > 0.2]
+        while len(ranked) < entries:
+            systems[next_id] = _system(next_id, rand)
+            ranked.append(next_id)
+            next_id += 1
+        ranked.sort(key=lambda s: -systems[s]['rmax'])
+        rows = []
+        for rank, system_id in enumerate(ranked, 1):
+            system = systems[system_id]
+            power = '' if system['power'] is None \
+                else '{:,.1f}'.format(system['power'])
+            values = ('{:,}'.format(system['cores']),
+                      '{:,.1f}'.format(system['rmax']),
+                      '{:,.1f}'.format(system['rpeak']), power)
+            rows.append(LIST_ROW % ((rank, system['site_id'], system['site_id'],
+                                     system['site_id'] % 50, system_id,
+                                     _listing(system), system['manufacturer'])
+                                    + values))
+            system['history'].append(
+                HISTORY_ROW % ((edition.month, edition.year, rank,
+                                _listing(system), system['manufacturer'])
+                               + values))
+        for page in range(pages):
+            content = LIST_PAGE % '\n'.join(
+                rows[page * ENTRIES_PER_PAGE:(page + 1) * ENTRIES_PER_PAGE])
+            _save(list_path(corpus, edition, page + 1), content.encode())
+    for system in systems.values():
+        details = dict(system,
+                       cores='{:,}'.format(system['cores']),
+                       rmax='{:,.2f}'.format(system['rmax']),
+                       rpeak='{:,.2f}'.format(system['rpeak']),
+                       power='' if system['power'] is None
+                       else '{:,.2f} kW (Submitted)'.format(system['power']),
+                       history='\n'.join(reversed(system['history'])))
+        _save(system_path(corpus, system['system_id']),
+              (SYSTEM_PAGE % details).encode())
+    for site_id in {system['site_id'] for system in systems.values()}:
+        site = {'site_id': site_id, 'country': site_id % 50,
+                'segment': SEGMENTS[site_id % len(SEGMENTS)]}
+        _save(site_path(corpus, site_id), (SITE_PAGE % site).encode())
+
+def main():
+    'Parses the command line and records or generates a corpus'
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+    parser.add_argument('action', choices=('record', 'generate'))
+    parser.add_argument('-y', '--year', default=LAST_LIST.year, type=int,
+                        choices=VALID_YEARS, help="From year")
+    parser.add_argument('-m', '--month', default=LAST_LIST.month, type=int,
+                        choices=VALID_MONTHS, help="From month")
+    parser.add_argument('-z', '--endyear', default=LAST_LIST.year, type=int,
+                        choices=VALID_YEARS, help="Until year")
+    parser.add_argument('-n', '--endmonth', default=LAST_LIST.month, type=int,
+                        choices=VALID_MONTHS, help="Until month")
+    parser.add_argument('-p', '--pages', default=PAGES, type=int,
+                        help="Number of pages of each edition")
+    parser.add_argument('corpus', help="Directory of the corpus")
+    args = parser.parse_args()
+    start = date(args.year, args.month, 1)
+    end = date(args.endyear, args.endmonth, 1)
+    if args.action == 'record':
+        record(args.corpus, start, end, args.pages)
+    else:
+        generate(args.corpus, start, end, args.pages)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+'''Micro-benchmark of the fuzzy matching of system components.
+
+Compares the ComponentMatcher with computing a full SequenceMatcher ratio
+for every part and component, like the scraper used to do, and checks that
+both give the same name/GPU split for every entry.
+
+The entries are built from the processor and interconnect of each row of a
+dataset (by default, the cleaned dataset in this repository), as they would
+appear in the listings.
+
+Usage: python3 -m benchmarks.matcher [DATASET]
+'''
+
+import csv
+import sys
+import time
+from difflib import SequenceMatcher
+from top500.matcher import ComponentMatcher, SM_RATIO
+
+DEFAULT_DATASET = 'data/top500-clean.csv'
+
+def reference_split(text, processor, interconnect):
+    'Name/GPU split computing every ratio, as the scraper used to do it'
+    parts = [x.strip() for x in text.split(',')]
+    toremove = []
+    for part in parts:
+        for component in (processor, interconnect):
+            if component and \
+               SequenceMatcher(None, part, component).ratio() > SM_RATIO:
+                if not part in toremove:
+                    toremove.append(part)
+    for part in toremove:
+        parts.remove(part)
+    name = parts.pop(0) if parts else None
+    gpu = ', '.join(parts) if parts else None
+    return name, gpu
+
+def load_samples(path):
+    '''Builds (system_id, text, processor, interconnect) samples from the rows
+    of a dataset. The listings use a shorter version of the interconnect.'''
+    samples = []
+    with open(path, encoding='utf-8') as dataset:
+        for row in csv.DictReader(dataset):
+            processor = row['processor'] if row['processor'] != 'NA' else None
+            interconnect = row['interconnect'] \
+                if row['interconnect'] != 'NA' else None
+            parts = ['System %s' % row['system_id']]
+            parts += [x for x in (processor, interconnect) if x]
+            if interconnect:
+                parts[-1] = interconnect.split()[0]
+            samples.append((row['system_id'], ', '.join(parts),
+                            processor, interconnect))
+    return samples
+
+def main(path):
+    'Runs the benchmark'
+    samples = load_samples(path)
+    print("%d entries" % len(samples))
+
+    start = time.perf_counter()
+    expected = [reference_split(*sample[1:]) for sample in samples]
+    reference = time.perf_counter() - start
+    print("SequenceMatcher per entry: %.3fs" % reference)
+
+    matcher = ComponentMatcher()
+    start = time.perf_counter()
+    results = [matcher.split(*sample) for sample in samples]
+    optimized = time.perf_counter() - start
+    print("ComponentMatcher:          %.3fs (%.1fx)"
+          % (optimized, reference / optimized))
+
+    mismatches = sum(1 for a, b in zip(expected, results) if a != b)
+    print("Mismatches: %d" % mismatches)
+    return 1 if mismatches else 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1] if len(sys.argv) > 1 else DEFAULT_DATASET))
@@ -0,0 +1,65 @@
+'''Benchmark of the columnar queries (see top500.query) over a dataset.
+
+It reports the time to load the dataset from its CSV file and from a
+snapshot (see top500.snapshot), and the time of the queries behind the
+plots of the analysis (the best of several runs of each).
+
+Usage: python3 -m benchmarks.query [-r REPEAT] [CSV]
+'''
+
+import argparse
+import os
+import tempfile
+import time
+from top500.query import Dataset, by_segment, loglog_fit, top_and_bottom
+
+DEFAULT_DATASET = os.path.join(os.path.dirname(__file__), os.pardir, 'data',
+                               'top500-clean.csv')
+
+def best_time(function, repeat):
+    'Returns the shortest time of several runs of a function, in ms'
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return 1000 * min(times)
+
+def run(path, repeat):
+    'Runs the benchmark, printing the results'
+    print("%-24s %10s" % ('operation', 'time'))
+    print("%-24s %8.1fms" % ('load CSV',
+                             best_time(lambda: Dataset.from_csv(path), 1)))
+    dataset = Dataset.from_csv(path)
+    with tempfile.TemporaryDirectory() as directory:
+        snapshot = os.path.join(directory, 'dataset.snap')
+        dataset.save(snapshot)
+        print("%-24s %8.2fms" % ('load snapshot', best_time(
+            lambda: Dataset.from_snapshot(snapshot), repeat)))
+    queries = [
+        ('rank 1 and 500', lambda: top_and_bottom(dataset)),
+        ('segments', lambda: by_segment(dataset)),
+        ('rmax by country', lambda: dataset.group_by('edition', 'country')
+         .aggregate(systems='count', rmax=('sum', 'rmax'))),
+        ('rmax ~ cores', lambda: loglog_fit(dataset, 'cores')),
+        ('rmax ~ memory', lambda: loglog_fit(dataset, 'memory')),
+        ('rmax ~ power', lambda: loglog_fit(dataset, 'power')),
+    ]
+    for name, query in queries:
+        print("%-24s %8.2fms" % (name, best_time(query, repeat)))
+    print("Rows: %d" % len(dataset))
+
+def main():
+    'Parses the command line and runs the benchmark'
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+    parser.add_argument('-r', '--repeat', default=20, type=int,
+                        help="Number of runs of each query")
+    parser.add_argument('dataset', nargs='?', default=DEFAULT_DATASET,
+                        help="CSV file with the dataset")
+    args = parser.parse_args()
+    run(args.dataset, args.repeat)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,217 @@
+'''Benchmark of the scraper over whole editions of a fixture corpus.
+
+The corpus (see benchmarks.fixtures) is served by a local stand-in server
+running in a separate process, so that the server doesn't compete with the
+scraper. For each edition found in the corpus, it reports:
+ - pages downloaded per second
+ - entries scraped per second
+ - time to parse each page, and to fetch it, on average (as reported by
+   the scraper's parse and fetch hooks)
+and the peak memory (maximum resident set size) of each edition, sampled
+every SAMPLE_INTERVAL seconds while it's scraped, and of the whole run.
+
+Usage: python3 -m benchmarks.run [-j JOBS] [-p PARSER] [-l LATENCY] CORPUS
+'''
+
+import argparse
+import contextlib
+import multiprocessing
+import os
+import resource
+import threading
+import time
+from datetime import date
+import top500.urlgen
+from top500.scraper import Scraper, DownloadError, PARSERS
+from top500.urlgen import url_for_list
+from benchmarks.server import FixtureServer
+from benchmarks.fixtures import ENTRIES_PER_PAGE
+
+# Seconds between samples of the memory used
+SAMPLE_INTERVAL = 0.01
+
+def corpus_editions(corpus):
+    'Returns the editions (and their number of pages) found in a corpus'
+    found = []
+    lists = os.path.join(corpus, 'list')
+    for year in sorted(os.listdir(lists)):
+        for month in sorted(os.listdir(os.path.join(lists, year))):
+            pages = len(os.listdir(os.path.join(lists, year, month)))
+            found.append((date(int(year), int(month), 1), pages))
+    return found
+
+def _serve(corpus, latency, error_rate, queue):
+    'Runs a fixture server, sending its URL through a queue'
+    server = FixtureServer(corpus, 0, latency, error_rate)
+    queue.put(server.base_url)
+    server.serve_forever()
+
+class PageTimer:
+    '''Adds up the time to fetch and to parse pages, and the number and size
+    of the pages downloaded, from the scraper's hooks. Pages can be fetched
+    and parsed from several threads.'''
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.downloaded = 0
+        self.bytes = 0
+        self.fetched = 0
+        self.fetch_seconds = 0.0
+        self.parsed = 0
+        self.parse_seconds = 0.0
+
+    def attach(self, scraper):
+        'Times the pages of a Scraper, adding hooks to it'
+        scraper.add_hook('fetch', self.on_fetch)
+        scraper.add_hook('parse', self.on_parse)
+
+    def on_fetch(self, url, kind, source, seconds, size):
+        # pylint: disable=unused-argument,too-many-arguments
+        'Hook for each page fetched'
+        with self.lock:
+            if source == 'network':
+                self.downloaded += 1
+                self.bytes += size
+            self.fetched += 1
+            self.fetch_seconds += seconds
+
+    def on_parse(self, kind, seconds):  # pylint: disable=unused-argument
+        'Hook for each page parsed'
+        with self.lock:
+            self.parsed += 1
+            self.parse_seconds += seconds
+
+    def totals(self):
+        'Returns the (fetched, fetch seconds, parsed, parse seconds)'
+        with self.lock:
+            return (self.fetched, self.fetch_seconds, self.parsed,
+                    self.parse_seconds)
+
+def _per_page(seconds, pages):
+    'Average milliseconds per page'
+    return 1000 * seconds / max(pages, 1)
+
+def resident_memory():
+    '''Returns the resident set size of this process, in bytes, or its
+    maximum so far if the current one isn't available'''
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * resource.getpagesize()
+    except OSError:
+        # On Linux, ru_maxrss is in kilobytes
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+class MemorySampler:
+    '''Samples the resident memory of this process in a thread, every
+    SAMPLE_INTERVAL seconds, keeping the peak since the last reset'''
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.peak = resident_memory()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.__sample, daemon=True)
+        self.thread.start()
+
+    def __sample(self):
+        'Samples the memory until stopped'
+        while not self.stopped.wait(SAMPLE_INTERVAL):
+            rss = resident_memory()
+            with self.lock:
+                self.peak = max(self.peak, rss)
+
+    def reset(self):
+        'Returns the peak memory since the last reset, in bytes, and resets it'
+        rss = resident_memory()
+        with self.lock:
+            peak, self.peak = max(self.peak, rss), rss
+        return peak
+
+    def stop(self):
+        'Stops sampling'
+        self.stopped.set()
+        self.thread.join()
+
+def run(corpus, jobs=1, parser=PARSERS[0], latency=0.0, error_rate=0.0):
+    'Runs the benchmark, printing the results'
+    queue = multiprocessing.Queue()
+    server = multiprocessing.Process(target=_serve, daemon=True,
+                                     args=(corpus, latency, error_rate, queue))
+    server.start()
+    top500.urlgen.BASE_URL = queue.get()
+
+    scraper = Scraper(jobs=jobs, parser=parser)
+    entries = [0]
+    def count_entry(_):
+        entries[0] += 1
+    scraper.set_entry_callback(count_entry)
+    timer = PageTimer()
+    timer.attach(scraper)
+
+    print("%-8s %7s %8s %9s %10s %12s %12s %9s"
+          % ('edition', 'pages', 'entries', 'pages/s', 'entries/s',
+             'parse/page', 'fetch/page', 'peak'))
+    totals = [0, 0, 0.0]
+    peaks = []
+    sampler = MemorySampler()
+    for edition, pages in corpus_editions(corpus):
+        pages_before, entries_before = timer.downloaded, entries[0]
+        sampler.reset()
+        times_before = timer.totals()
+        wall = time.perf_counter()
+        try:
+            # Silence the scraper's progress messages
+            with open(os.devnull, 'w') as devnull, \
+                 contextlib.redirect_stdout(devnull):
+                for page in range(1, pages + 1):
+                    scraper.scrape_list_page(url_for_list(edition, page),
+                                             ENTRIES_PER_PAGE)
+        except DownloadError as error:
+            print("%d/%02d failed: %s" % (edition.year, edition.month, error))
+            break
+        wall = time.perf_counter() - wall
+        peak = sampler.reset()
+        peaks.append(peak)
+        fetched = timer.downloaded - pages_before
+        scraped = entries[0] - entries_before
+        timed, fetch, parsed, parse = (after - before for after, before
+                                       in zip(timer.totals(), times_before))
+        print("%4d/%02d  %7d %8d %9.1f %10.1f %10.2fms %10.2fms %7.1fMB"
+              % (edition.year, edition.month, fetched, scraped,
+                 fetched / wall, scraped / wall, _per_page(parse, parsed),
+                 _per_page(fetch, timed), peak / (1024 * 1024)))
+        totals = [totals[0] + fetched, totals[1] + scraped,
+                  totals[2] + wall]
+    sampler.stop()
+    fetched, scraped, wall = totals
+    timed, fetch, parsed, parse = timer.totals()
+    # On Linux, ru_maxrss is in kilobytes
+    peak = max(peaks + [resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+                        * 1024])
+    if wall:
+        print("%-8s %7d %8d %9.1f %10.1f %10.2fms %10.2fms %7.1fMB"
+              % ('total', fetched, scraped, fetched / wall, scraped / wall,
+                 _per_page(parse, parsed), _per_page(fetch, timed),
+                 peak / (1024 * 1024)))
+    print("Downloaded: %.1f MB" % (timer.bytes / (1024 * 1024)))
+    scraper.close()
+    server.terminate()
+
+def main():
+    'Parses the command line and runs the benchmark'
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+    parser.add_argument('-j', '--jobs', default=1, type=int,
+                        help="Number of details pages to download in parallel")
+    parser.add_argument('-p', '--parser', default=PARSERS[0], choices=PARSERS,
+                        help="How to parse the pages")
+    parser.add_argument('-l', '--latency', default=0.0, type=float,
+                        help="Seconds added by the server to each response")
+    parser.add_argument('-e', '--error-rate', default=0.0, type=float,
+                        help="Ratio of requests that fail")
+    parser.add_argument('corpus', help="Directory of the fixture corpus")
+    args = parser.parse_args()
+    run(args.corpus, args.jobs, args.parser, args.latency, args.error_rate)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+'''A local stand-in for the www.top500.org site, serving a fixture corpus.
+
+Pages are served at the same paths as in the site (see urlgen), so pointing
+urlgen.BASE_URL to the server is enough to scrape from it. It can simulate
+a slow or unreliable site with a latency added to each response and a rate
+of "503 Service Unavailable" errors.
+
+Usage: python3 -m benchmarks.server [-p PORT] [-l LATENCY] [-e RATE] CORPUS
+'''
+
+import argparse
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from benchmarks.fixtures import path_for_url
+
+DEFAULT_PORT = 8500
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    'Serves the pages of the corpus configured in the server'
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        'Handles a GET request'
+        server = self.server
+        if server.latency:
+            time.sleep(server.latency)
+        with server.lock:
+            server.requests += 1
+            fail = server.random.random() < server.error_rate
+        if fail:
+            self.send_error(503)
+            return
+        path = path_for_url(server.corpus, self.path)
+        try:
+            with open(path, 'rb') as page:
+                content = page.read()
+        except (TypeError, OSError):
+            self.send_error(404)
+            return
+        with server.lock:
+            server.bytes_sent += len(content)
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *args):  # pylint: disable=arguments-differ
+        'Requests are not logged'
+        pass
+
+class FixtureServer(ThreadingHTTPServer):
+    '''HTTP server for a fixture corpus.
+
+    Params:
+     - corpus: the directory of the corpus
+     - port: the port to listen on (0 to pick any free port)
+     - latency: seconds added to each response
+     - error_rate: ratio of requests that fail with a 503 error
+    '''
+
+    daemon_threads = True
+
+    def __init__(self, corpus, port=DEFAULT_PORT, latency=0.0, error_rate=0.0,
+                 seed=None):
+        super().__init__(('127.0.0.1', port), FixtureHandler)
+        self.corpus = corpus
+        self.latency = latency
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.bytes_sent = 0
+
+    @property
+    def base_url(self):
+        'The URL to use as urlgen.BASE_URL'
+        return 'http://%s:%d' % self.server_address[:2]
+
+    def start(self):
+        'Serves requests from a background thread'
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
+
+def main():
+    'Parses the command line and runs the server'
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+    parser.add_argument('-p', '--port', default=DEFAULT_PORT, type=int)
+    parser.add_argument('-l', '--latency', default=0.0, type=float,
+                        help="Seconds added to each response")
+    parser.add_argument('-e', '--error-rate', default=0.0, type=float,
+                        help="Ratio of requests that fail")
+    parser.add_argument('corpus', help="Directory of the corpus")
+    args = parser.parse_args()
+    server = FixtureServer(args.corpus, args.port, args.latency,
+                           args.error_rate)
+    print("Serving %s at %s" % (args.corpus, server.base_url))
+    server.serve_forever()
+
+if __name__ == '__main__':
+    main()
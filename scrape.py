@@ -7,11 +7,30 @@ See https://www.top500.org/
 '''
 
 import argparse
-import csv
+import heapq
+import os
+import socket
 import sys
+from concurrent.futures import ProcessPoolExecutor
+from collections import Counter
 from datetime import date
-from top500.scraper import Scraper, ENTRY_FIELDS
+from functools import partial
+from top500.aggregates import EditionAggregates
+from top500.archive import ArchiveWriter, init_worker, scrape_archived_edition
+from top500.backfill import Backfill, DEFAULT_SAMPLE_EVERY, DEFAULT_MAX_GAPS
+from top500.cache import ResponseCache, DEFAULT_CACHE_SIZE
+from top500.checkpoint import Journal
+from top500.clean import CleanCSVWriter
+from top500.fetch import Fetcher, DEFAULT_TIMEOUT, DEFAULT_RETRIES
+from top500.readers import read_entries
+from top500.metrics import Metrics, FORMATS as METRICS_FORMATS
+from top500.pipeline import Pipeline
+from top500.profiling import Profiler
+from top500.scraper import Scraper, PARSERS, list_pages, GPUCarryOver
+from top500.store import SQLiteStore, MemoryStore
 from top500.urlgen import url_for_list, LAST_LIST, editions, VALID_YEARS, VALID_MONTHS
+from top500.workqueue import WorkQueue, WorkItem, DEFAULT_LEASE
+from top500.writers import open_writer, FORMATS, STREAM_FORMATS, WRITERS
 
 #
 # Default values for command line options
@@ -22,6 +41,18 @@ DEFAULT_END_YEAR = DEFAULT_YEAR
 DEFAULT_END_MONTH = DEFAULT_MONTH
 DEFAULT_COUNT = 500
 DEFAULT_OUTPUT_FILE = 'top500.csv'
+DEFAULT_JOBS = 1
+DEFAULT_PARSER = PARSERS[0]
+DEFAULT_CACHE_SIZE_MB = DEFAULT_CACHE_SIZE // (1024 * 1024)
+DEFAULT_FORMAT = FORMATS[0]
+DEFAULT_PROCESSES = os.cpu_count()
+DEFAULT_METRICS_FORMAT = METRICS_FORMATS[0]
+
+# Differences of a cross-check that are shown (see TOP500.backfill)
+MAX_DIFFERENCES = 20
+
+# The checkpoint journal of a run is kept next to its output file
+JOURNAL_SUFFIX = '.journal'
 
 def parse_options(dest):
     '''Parses and validate command line arguments
@@ -46,18 +77,163 @@ def parse_options(dest):
                         help="Number of entries to get from each edition")
     parser.add_argument('-f', '--force', action='store_true',
                         help="Force a partial count")
+    parser.add_argument('-j', '--jobs', default=DEFAULT_JOBS, type=int,
+                        help="Number of details pages to download in parallel")
+    parser.add_argument('--timeout', default=DEFAULT_TIMEOUT, type=float,
+                        help="Seconds to wait for the server to respond")
+    parser.add_argument('--retries', default=DEFAULT_RETRIES, type=int,
+                        help="Number of times a failed download is retried")
+    parser.add_argument('--rate', type=float,
+                        help="Maximum number of downloads per second. It is "
+                        "lowered when the server asks to slow down")
+    parser.add_argument('-p', '--parser', default=DEFAULT_PARSER,
+                        choices=PARSERS, help="How to parse the pages")
+    parser.add_argument('--cache', metavar='DIR',
+                        help="Keep downloaded pages in a persistent cache")
+    parser.add_argument('--cache-size', metavar='MB', type=int,
+                        default=DEFAULT_CACHE_SIZE_MB,
+                        help="Maximum size of the pages cache")
+    parser.add_argument('--store', metavar='FILE',
+                        help="Keep scraped system and site details in an "
+                        "SQLite database, and reuse them in later runs")
+    parser.add_argument('--max-age', metavar='DAYS', type=float,
+                        help="Scrape again the details in the store (or in "
+                        "the output, with --update) older than DAYS")
+    parser.add_argument('--update', action='store_true',
+                        help="Add the editions missing from the output file, "
+                        "only scraping the systems and sites not in it")
+    parser.add_argument('--archive', metavar='FILE',
+                        help="Add the downloaded pages to an archive")
+    parser.add_argument('--reparse-from', metavar='ARCHIVE',
+                        help="Scrape the pages in an archive instead of "
+                        "downloading them")
+    parser.add_argument('--history', action='store_true',
+                        help="Rebuild the editions from the rank history of "
+                        "their systems, scraping the list pages of a sample "
+                        "of them only")
+    parser.add_argument('--sample-every', metavar='EDITIONS', type=int,
+                        default=DEFAULT_SAMPLE_EVERY,
+                        help="Scrape the list pages of one of every EDITIONS "
+                        "editions (with --history)")
+    parser.add_argument('--max-gaps', metavar='RANKS', type=int,
+                        default=DEFAULT_MAX_GAPS,
+                        help="Leave out up to RANKS ranks of a list page that "
+                        "no history covers instead of scraping the page (with "
+                        "--history)")
+    parser.add_argument('--queue', metavar='FILE',
+                        help="Scrape the pages in a work queue shared with "
+                        "other workers (created if needed), writing partial "
+                        "outputs next to it")
+    parser.add_argument('--lease', metavar='SECONDS', type=float,
+                        default=DEFAULT_LEASE,
+                        help="Time a worker has to scrape a page of the queue "
+                        "before others can claim it")
+    parser.add_argument('--merge', action='store_true',
+                        help="Merge the partial outputs of a completed work "
+                        "queue (given with --queue) into the output file")
+    parser.add_argument('--pipeline', action='store_true',
+                        help="Fetch, parse and write several editions at "
+                        "once, parsing them in a pool of processes")
+    parser.add_argument('--processes', default=DEFAULT_PROCESSES, type=int,
+                        help="Number of processes to parse the pages (with "
+                        "--reparse-from or --pipeline)")
+    parser.add_argument('--metrics', metavar='FILE',
+                        help="Write metrics of the run (timings of each "
+                        "stage, cache hits, throughput) to a file")
+    parser.add_argument('--metrics-format', default=DEFAULT_METRICS_FORMAT,
+                        choices=METRICS_FORMATS, help="Format of the metrics")
+    parser.add_argument('--clean', metavar='FILE',
+                        help="Also write the entries cleaned for their "
+                        "analysis (like data/top500-clean.csv) to FILE")
+    parser.add_argument('--aggregates', metavar='FILE',
+                        help="Keep the aggregates of each edition (by segment "
+                        "and country) in an SQLite database, updating the "
+                        "ones of the editions written")
+    parser.add_argument('--profile', metavar='FILE',
+                        help="Profile the run (functions and memory "
+                        "allocations, by kind of page) and write a report to "
+                        "FILE. Pages are scraped with a single job")
+    parser.add_argument('-o', '--format', default=DEFAULT_FORMAT,
+                        choices=FORMATS, help="Output format")
+    parser.add_argument('--resume', action='store_true',
+                        help="Resume an interrupted run from its last "
+                        "completed page, appending to the output file")
     parser.add_argument('outfile', nargs='?', default=DEFAULT_OUTPUT_FILE,
-                        help="Output file",
-                        type=argparse.FileType('w', encoding='utf-8'))
+                        help="Output file ('-' for standard output)")
     parser.parse_args(namespace=dest)
 
     if dest.count < 1 or dest.count > 500:
         parser.error("COUNT must be >1 and <500 (in hundreds unless forced)")
     if dest.count % 100 != 0 and not dest.force:
         parser.error("COUNT must be in hundreds. Use --force to override")
-    if dest.endyear < dest.year or \
-       (dest.endyear == dest.year and dest.endmonth < dest.month):
+    # With --update, editions start from the first one in the output
+    if not dest.update and (dest.endyear < dest.year or
+                            (dest.endyear == dest.year and
+                             dest.endmonth < dest.month)):
         parser.error("End year/month must be >= start year/month")
+    if dest.jobs < 1:
+        parser.error("JOBS must be >=1")
+    if dest.retries < 0:
+        parser.error("RETRIES must be >=0")
+    if dest.rate is not None and dest.rate <= 0:
+        parser.error("RATE must be >0")
+    if dest.processes < 1:
+        parser.error("PROCESSES must be >=1")
+    if dest.sample_every < 1:
+        parser.error("EDITIONS must be >=1")
+    if dest.max_gaps < 0:
+        parser.error("RANKS must be >=0")
+    if dest.history and dest.resume:
+        parser.error("Can't resume when rebuilding from the histories")
+    if dest.history and dest.reparse_from:
+        parser.error("Can't rebuild from the histories when parsing an "
+                     "archive")
+    if dest.max_age is not None and dest.max_age < 0:
+        parser.error("DAYS must be >=0")
+    if dest.update and (dest.resume or dest.reparse_from or dest.history or
+                        dest.queue):
+        parser.error("Can't update with --resume, --reparse-from, --history "
+                     "or --queue")
+    if dest.update and dest.outfile == '-':
+        parser.error("Can't update the standard output")
+    if dest.clean and (dest.update or dest.resume):
+        parser.error("Can't write the cleaned entries with --update or "
+                     "--resume")
+    if dest.aggregates and dest.resume:
+        parser.error("Can't update the aggregates with --resume")
+    if dest.aggregates and dest.queue and not dest.merge:
+        parser.error("Workers can't update the aggregates: use --aggregates "
+                     "with --merge")
+    if dest.clean and dest.queue and not dest.merge:
+        parser.error("Workers can't write the cleaned entries: use --clean "
+                     "with --merge")
+    if dest.merge and not dest.queue:
+        parser.error("--merge needs a --queue")
+    if dest.queue and (dest.resume or dest.reparse_from or dest.history):
+        parser.error("Can't use a work queue with --resume, --reparse-from "
+                     "or --history")
+    if dest.pipeline and (dest.resume or dest.reparse_from or dest.history or
+                          dest.queue or dest.update or dest.store):
+        parser.error("Can't use --pipeline with --resume, --reparse-from, "
+                     "--history, --queue, --update or --store")
+    if dest.profile and dest.pipeline:
+        parser.error("Can't profile with --pipeline")
+    if dest.reparse_from and dest.resume:
+        parser.error("Can't resume when parsing an archive")
+    if dest.reparse_from and not os.path.exists(dest.reparse_from):
+        parser.error("Archive not found: %s" % dest.reparse_from)
+    if dest.resume and not WRITERS[dest.format].resumable:
+        parser.error("Can't resume when writing in %s format" % dest.format)
+    if dest.outfile == '-':
+        if dest.resume:
+            parser.error("Can't resume when writing to standard output")
+        if dest.format not in STREAM_FORMATS:
+            parser.error("Can't write %s to standard output" % dest.format)
+        dest.outfile = sys.stdout
+
+def entry_order(entry):
+    'Key to sort entries in (year, month, rank) order'
+    return (entry['year'], entry['month'], entry['rank'])
 
 class TOP500:
     '''Main logic for the TOP500 website scraping'''
@@ -69,24 +245,166 @@ class TOP500:
         self.endyear = DEFAULT_END_YEAR
         self.endmonth = DEFAULT_END_MONTH
         self.count = DEFAULT_COUNT
+        self.jobs = DEFAULT_JOBS
+        self.parser = DEFAULT_PARSER
+        self.timeout = DEFAULT_TIMEOUT
+        self.retries = DEFAULT_RETRIES
+        self.rate = None
+        self.cache = None
+        self.cache_size = DEFAULT_CACHE_SIZE_MB
+        self.store = None
+        self.max_age = None
+        self.update = False
+        self.archive = None
+        self.reparse_from = None
+        self.history = False
+        self.pipeline = False
+        self.queue = None
+        self.lease = DEFAULT_LEASE
+        self.merge = False
+        self.sample_every = DEFAULT_SAMPLE_EVERY
+        self.max_gaps = DEFAULT_MAX_GAPS
+        self.processes = DEFAULT_PROCESSES
+        self.metrics = None
+        self.metrics_format = DEFAULT_METRICS_FORMAT
+        self.collector = None
+        self.profile = None
+        self.profiler = None
+        self.clean = None
+        self.cleaner = None
+        self.aggregates = None
+        self.aggregator = None
+        self.format = DEFAULT_FORMAT
+        self.resume = False
         self.outfile = sys.stdout
-        self.csvwriter = None
-        self.scraper = Scraper()
+        self.writer = None
+        self.scraper = None
+        # Checkpoints are only kept when writing to a file given by its name
+        self.journal = None
+        self.written = 0
+
+    def init_scraper(self, retain=True):
+        '''Initialize the scraper. Like init_writer, this is not done inside
+        __init__ to allow options to configure it. If 'retain' is False, the
+        scraper doesn't keep the scraped entries in memory'''
+        cache = None
+        if self.cache:
+            cache = ResponseCache(self.cache, self.cache_size * 1024 * 1024)
+        store = None
+        if self.store:
+            max_age = None
+            if self.max_age is not None:
+                max_age = self.max_age * 24 * 3600
+            store = SQLiteStore(self.store, max_age)
+        elif self.queue:
+            # Workers forget the details updated by the entries of each page
+            # (see work), but not the scraped ones
+            store = MemoryStore()
+        archive = None
+        if self.archive:
+            archive = ArchiveWriter(self.archive)
+        # Profiles are only accurate when pages are scraped one at a time
+        jobs = 1 if self.profile else self.jobs
+        fetcher = Fetcher(jobs, self.timeout, self.retries, self.rate)
+        self.scraper = Scraper(jobs=jobs, cache=cache, store=store,
+                               parser=self.parser, retain=retain,
+                               archive=archive, fetcher=fetcher)
+        if self.metrics:
+            self.collector = Metrics()
+            self.collector.attach(self.scraper)
+        self.init_profiler()
+        if self.profiler:
+            self.profiler.attach(self.scraper)
+
+    def close_scraper(self):
+        'Stops the background downloads of the scraper, if any'
+        if self.scraper:
+            self.scraper.close()
+
+    def init_profiler(self):
+        'Starts profiling the run, if requested'
+        if self.profile and not self.profiler:
+            self.profiler = Profiler()
+            self.profiler.start()
+
+    def write_metrics(self):
+        'Writes the collected metrics and the profile, if requested'
+        if self.collector:
+            self.collector.write(self.metrics, self.metrics_format)
+        if self.profiler:
+            self.profiler.stop()
+            self.profiler.write(self.profile)
 
     def init_writer(self):
-        '''Initialize the CSV writer on top of the output file. This is not done
-        inside __init__ to allow options to set a differnt outfile
+        '''Initialize the writer for the output format on top of the output
+        file. This is not done inside __init__ to allow options to set a
+        differnt outfile
         '''
-        self.csvwriter = csv.writer(self.outfile,
-                                    delimiter=',',
-                                    quotechar='"',
-                                    quoting=csv.QUOTE_MINIMAL)
-        # Write header (column names)
-        self.csvwriter.writerow(ENTRY_FIELDS)
+        append = False
+        if self.journal and self.journal.offset is not None:
+            # Resuming a previous run: drop anything written after its
+            # last completed page, and continue from there
+            print("Resuming after %d entries" % self.journal.entries)
+            WRITERS[self.format].truncate(self.outfile, self.journal.offset)
+            append = True
+        self.writer = open_writer(self.format, self.outfile, append)
+        if self.clean:
+            self.cleaner = CleanCSVWriter(self.clean)
+        self.init_aggregator()
+
+    def init_aggregator(self):
+        'Initialize the aggregates of the editions, if requested'
+        if self.aggregates:
+            self.aggregator = EditionAggregates(self.aggregates)
+
+    def close_writer(self):
+        '''Closes the writer, and the writer of the cleaned entries and the
+        aggregates if any'''
+        self.writer.close()
+        if self.cleaner:
+            self.cleaner.close()
+        if self.aggregator:
+            self.aggregator.close()
+
+    def init_journal(self):
+        '''Initialize the checkpoint journal, if the output goes to a file in a
+        format that can be resumed. This needs to be done before init_writer,
+        which resumes the output from the journal's last checkpoint'''
+        if isinstance(self.outfile, str) and WRITERS[self.format].resumable:
+            self.journal = Journal(self.outfile + JOURNAL_SUFFIX, self.resume)
+            self.written = self.journal.entries
+
+    def remember_written(self):
+        '''When resuming a previous run, makes the scraper remember the latest
+        entry of each system kept in the output, as if it had scraped them,
+        so that the entries that follow are the same as in an uninterrupted
+        run (e.g. their GPU is carried over, like in update_output)'''
+        if not self.journal or self.journal.offset is None:
+            return
+        latest = {}
+        for entry in read_entries(self.format, self.outfile):
+            latest[entry['system_id']] = entry
+        for entry in latest.values():
+            self.scraper.remember(entry, site=entry['site_id'] is not None)
+
+    def is_completed(self, edition, page):
+        'Whether a page was completed by a previous run being resumed'
+        return bool(self.journal) and self.journal.is_completed(edition, page)
+
+    def checkpoint(self, edition, page):
+        'Records that all the entries of a page have been written'
+        if self.journal:
+            self.journal.record(edition, page, self.writer.tell(),
+                                self.written)
 
     def write_entry(self, entry):
-        'Writes an entry to the output file in CSV format'
-        self.csvwriter.writerow(entry.values())
+        'Writes an entry to the output file'
+        self.writer.write(entry)
+        if self.cleaner:
+            self.cleaner.write(entry)
+        if self.aggregator:
+            self.aggregator.add(entry)
+        self.written += 1
 
     def write_all(self):
         '''Alternative approach to writing: when calling scrape() with
@@ -97,36 +415,324 @@ class TOP500:
         entries = self.scraper.get_list()
         if entries:
             for entry in entries:
-                self.csvwriter.writerow(entry.values())
+                self.write_entry(entry)
             print("Wrote a total of %d entries" % len(entries))
+        self.close_writer()
 
     def scrape(self, write=True):
         '''Scraping function. It drives the scraping by obtaining each of
-        the list's pages and calling the scraper for each.'''
+        the list's pages and calling the scraper for each.
+        Entries are only kept in memory (for write_all) if write is False.'''
+        self.init_scraper(retain=not write)
         if write:
+            self.init_journal()
             self.init_writer()
+            self.remember_written()
             self.scraper.set_entry_callback(self.write_entry)
 
         start = date(self.year, self.month, 1)
         end = date(self.endyear, self.endmonth, 1)
-        pages = int(self.count / 100)
-        limit = self.count % 100
-        if limit:
-            # The user requested a partial page
-            pages += 1
+        pages = list_pages(self.count)
+        # The list pages still to scrape, to download each of them while
+        # the previous one is scraped
+        pending = [url_for_list(edition, pagenum)
+                   for edition in editions(start, end)
+                   for pagenum, _ in pages
+                   if not self.is_completed(edition, pagenum)]
+        following = iter(pending[1:])
         for edition in editions(start, end):
             print("* Scraping TOP500 list edition: %d/%d" % (edition.year, edition.month))
-            for page in range(pages):
-                pagenum = page + 1
-                print("** Page %d of %d" % (pagenum, pages))
+            for pagenum, limit in pages:
+                if self.is_completed(edition, pagenum):
+                    print("** Page %d of %d already scraped"
+                          % (pagenum, len(pages)))
+                    continue
+                print("** Page %d of %d" % (pagenum, len(pages)))
                 url = url_for_list(edition, pagenum)
-                if pagenum == pages and limit:
-                    # Only partially parse the last page as requested
-                    self.scraper.scrape_list_page(url, limit)
-                else:
-                    self.scraper.scrape_list_page(url)
+                self.scraper.prefetch_list_page(next(following, None))
+                # The last page is only partially parsed if requested
+                self.scraper.scrape_list_page(url, limit)
+                self.checkpoint(edition, pagenum)
+        if write:
+            self.close_writer()
+        self.write_metrics()
+
+    def reparse(self):
+        '''Alternative to scrape(): scrapes the pages in the archive given by
+        reparse_from instead of downloading them. Editions are parsed in
+        parallel by a pool of processes, and written in order.
+        Only the entries are counted in the metrics, as the pages are parsed
+        in other processes. When profiling, editions are parsed one at a time
+        in this process instead.'''
+        self.init_writer()
+        if self.metrics:
+            self.collector = Metrics()
+        self.init_profiler()
+        start = date(self.year, self.month, 1)
+        end = date(self.endyear, self.endmonth, 1)
+        carry_over = GPUCarryOver()
+        scrape_edition = partial(scrape_archived_edition, count=self.count,
+                                 parser=self.parser, profiler=self.profiler)
+        edition_list = list(editions(start, end))
+        if self.profiler:
+            init_worker(self.reparse_from)
+            self.write_parsed(edition_list, map(scrape_edition, edition_list),
+                              carry_over)
+        else:
+            with ProcessPoolExecutor(self.processes, initializer=init_worker,
+                                     initargs=(self.reparse_from,)) as pool:
+                self.write_parsed(edition_list,
+                                  pool.map(scrape_edition, edition_list),
+                                  carry_over)
+        self.close_writer()
+        self.write_metrics()
+
+    def write_parsed(self, edition_list, parsed, carry_over):
+        '''Writes the entries of some editions, parsed in order, through a
+        GPUCarryOver'''
+        for edition, entries in zip(edition_list, parsed):
+            print("* Parsed TOP500 list edition: %d/%d"
+                  % (edition.year, edition.month))
+            for entry in entries:
+                self.write_entry(carry_over(entry))
+                if self.collector:
+                    self.collector.on_entry(entry)
+
+    def run_pipeline(self):
+        '''Alternative to scrape(): downloads, parses and writes several
+        editions at once (see top500.pipeline), parsing them in a pool of
+        processes. Only the entries are counted in the metrics, as the pages
+        are parsed in other processes.'''
+        self.init_writer()
+        if self.metrics:
+            self.collector = Metrics()
+        cache = None
+        if self.cache:
+            cache = ResponseCache(self.cache, self.cache_size * 1024 * 1024)
+        archive = None
+        if self.archive:
+            archive = ArchiveWriter(self.archive)
+        fetcher = Fetcher(self.jobs, self.timeout, self.retries, self.rate)
+        pipeline = Pipeline(fetcher, self.jobs, self.processes, self.parser,
+                            cache, archive)
+        start = date(self.year, self.month, 1)
+        end = date(self.endyear, self.endmonth, 1)
+        carry_over = GPUCarryOver()
+        for edition, entries in pipeline.run(list(editions(start, end)),
+                                             self.count):
+            print("* Parsed TOP500 list edition: %d/%d"
+                  % (edition.year, edition.month))
+            for entry in entries:
+                self.write_entry(carry_over(entry))
+                if self.collector:
+                    self.collector.on_entry(entry)
+        if archive:
+            archive.close()
+        fetcher.close()
+        self.close_writer()
+        self.write_metrics()
+
+    def backfill(self):
+        '''Alternative to scrape(): rebuilds the editions from the rank
+        history of their systems (see top500.backfill), reporting the ranks
+        left out and the differences found between the histories and the
+        list pages that were scraped'''
+        self.init_scraper(retain=False)
+        self.init_writer()
+        start = date(self.year, self.month, 1)
+        end = date(self.endyear, self.endmonth, 1)
+        backfill = Backfill(self.scraper, start, end, self.count,
+                            self.sample_every, self.max_gaps)
+        backfill.run()
+        gaps = backfill.gaps()
+        if gaps:
+            print("* %d ranks that no history covers are left out (see "
+                  "--max-gaps)" % len(gaps))
+        differences = backfill.cross_check()
+        print("* Cross-check: %d differences in %d listings"
+              % (len(differences), len(backfill.listed)))
+        for difference in differences[:MAX_DIFFERENCES]:
+            print("** %d/%d #%d: %s is %r in the list, %r in the history"
+                  % difference)
+        for entry in backfill.iter_entries():
+            self.write_entry(entry)
+        self.close_writer()
+        self.write_metrics()
+
+    def scrape_editions(self, selected, count, carry_over):
+        '''Generator for the first 'count' entries of some editions, through
+        a GPUCarryOver, counting them as written'''
+        for edition in selected:
+            for entry in self.scraper.iter_entries(edition, edition, count):
+                self.written += 1
+                entry = carry_over(entry)
+                if self.aggregator:
+                    self.aggregator.add(entry)
+                yield entry
+
+    def is_fresh(self, get_details, key):
+        '''Whether the details of a system or site (obtained from the store
+        by get_details) are fresh according to max_age'''
+        return self.max_age is None or get_details(key) is not None
+
+    def update_output(self):
+        '''Alternative to scrape(): adds to the output file the editions
+        missing from it (or incomplete), from its first edition until the end
+        edition, with as many entries as its editions have. The details of
+        the systems and sites in the output are used instead of scraping
+        them, unless they are stale: with a max_age, only the details found
+        fresh in the store are used.
+
+        The new entries are appended (or upserted) if possible. Otherwise,
+        e.g. for missing editions before the last one in a CSV file, the
+        output is rewritten with the existing and the new entries.
+        '''
+        if not os.path.exists(self.outfile):
+            print("* %s not found: scraping all the editions" % self.outfile)
+            self.scrape()
+            return
+        present = Counter((entry['year'], entry['month']) for entry
+                          in read_entries(self.format, self.outfile))
+        count = max(present.values(), default=self.count)
+        start = date(*min(present, default=(self.year, self.month)), 1)
+        end = date(self.endyear, self.endmonth, 1)
+        missing = [edition for edition in editions(start, end)
+                   if present[(edition.year, edition.month)] < count]
+        if not missing:
+            print("* %s is up to date" % self.outfile)
+            return
+        for edition in missing:
+            print("* Edition %d/%d: %d of %d entries"
+                  % (edition.year, edition.month,
+                     present[(edition.year, edition.month)], count))
+
+        # Continue from the latest entry of each system before the first
+        # edition to scrape
+        self.init_scraper(retain=False)
+        first = (missing[0].year, missing[0].month)
+        latest = {}
+        for entry in read_entries(self.format, self.outfile):
+            if (entry['year'], entry['month']) < first:
+                latest[entry['system_id']] = entry
+        store = self.scraper.store
+        for entry in latest.values():
+            self.scraper.remember(
+                entry, system=self.is_fresh(store.get_system,
+                                            entry['system_id']),
+                site=self.is_fresh(store.get_site, entry['site_id']))
+        carry_over = GPUCarryOver({system_id: entry['gpu'] for system_id, entry
+                                   in latest.items() if entry['gpu']})
+        # Only the aggregates of the editions scraped are updated
+        self.init_aggregator()
+        new = self.scrape_editions(missing, count, carry_over)
+
+        writer = WRITERS[self.format]
+        if writer.upsert or (writer.resumable and
+                             all(edition > date(*max(present), 1)
+                                 for edition in missing)):
+            self.writer = open_writer(self.format, self.outfile, append=True)
+            for entry in new:
+                self.writer.write(entry)
+            self.writer.close()
+        else:
+            replaced = {(edition.year, edition.month) for edition in missing}
+            existing = (entry for entry
+                        in read_entries(self.format, self.outfile)
+                        if (entry['year'], entry['month']) not in replaced)
+            tmp = self.outfile + '.tmp'
+            self.writer = open_writer(self.format, tmp)
+            for entry in heapq.merge(existing, new, key=entry_order):
+                self.writer.write(entry)
+            self.writer.close()
+            os.replace(tmp, self.outfile)
+        if self.aggregator:
+            self.aggregator.close()
+        print("Wrote a total of %d new entries" % self.written)
+        self.write_metrics()
+
+    def work(self):
+        '''Alternative to scrape(): scrapes the pages in the work queue given
+        by 'queue', adding the pages of the editions requested to it if
+        needed, until there are none left. Each page is scraped as if by a
+        new scraper, so that its entries don't depend on the pages that
+        this worker scraped before. merge() then applies the GPU carry-over.
+        '''
+        queue = WorkQueue(self.queue)
+        start = date(self.year, self.month, 1)
+        end = date(self.endyear, self.endmonth, 1)
+        queue.add(WorkItem(edition, pagenum, limit)
+                  for edition in editions(start, end)
+                  for pagenum, limit in list_pages(self.count))
+        self.init_scraper(retain=False)
+        worker = '%s:%d' % (socket.gethostname(), os.getpid())
+        while True:
+            item = queue.claim(worker, self.lease)
+            if not item:
+                break
+            print("* Scraping TOP500 list edition %d/%d, page %d"
+                  % (item.edition.year, item.edition.month, item.page))
+            path = queue.part_path(item)
+            # Write to a temporary file first, so that a partial output is
+            # never seen incomplete
+            tmp = '%s.%s' % (path, worker)
+            writer = open_writer('jsonl', tmp)
+            self.scraper.forget()
+            try:
+                for entry in self.scraper.iter_list_page(
+                        url_for_list(item.edition, item.page), item.limit):
+                    writer.write(entry)
+                writer.close()
+            except BaseException:
+                queue.release(item, worker)
+                raise
+            os.replace(tmp, path)
+            if not queue.complete(item, worker):
+                # Another worker claimed it: its output is the same
+                print("... Warning: the lease of edition %d/%d, page %d "
+                      "expired before it was completed (see --lease)"
+                      % (item.edition.year, item.edition.month, item.page))
+        print("* Queue: %s" % ', '.join('%d %s' % (count, state)
+                                        for state, count
+                                        in sorted(queue.counts().items())))
+        queue.close()
+        self.write_metrics()
+
+    def merge_queue(self):
+        '''Writes the entries of the partial outputs of a completed work
+        queue, in order, to the output file'''
+        queue = WorkQueue(self.queue)
+        counts = queue.counts()
+        unfinished = sum(counts.values()) - counts.get('done', 0)
+        if unfinished:
+            sys.exit("Can't merge: %d pages of the queue are not done"
+                     % unfinished)
+        self.init_writer()
+        carry_over = GPUCarryOver()
+        for item in queue.items():
+            for entry in queue.read_part(item):
+                self.write_entry(carry_over(entry))
+        print("Wrote a total of %d entries" % self.written)
+        self.close_writer()
+        queue.close()
 
 if __name__ == '__main__':
     top500 = TOP500()  # pylint: disable=invalid-name
     parse_options(top500)
-    top500.scrape()
+    try:
+        if top500.merge:
+            top500.merge_queue()
+        elif top500.queue:
+            top500.work()
+        elif top500.reparse_from:
+            top500.reparse()
+        elif top500.update:
+            top500.update_output()
+        elif top500.history:
+            top500.backfill()
+        elif top500.pipeline:
+            top500.run_pipeline()
+        else:
+            top500.scrape()
+    finally:
+        # Don't wait for the pages queued for download after an error
+        top500.close_scraper()
@@ -0,0 +1,93 @@
+'''A fixture corpus (see benchmarks.fixtures) for the tests, read directly
+instead of being served over HTTP'''
+
+import contextlib
+import io
+import shutil
+import tempfile
+import unittest
+from datetime import date
+from urllib.parse import urlsplit
+from benchmarks.fixtures import generate, path_for_url
+from benchmarks.server import FixtureServer
+from top500 import urlgen
+from top500.cache import CachedPage
+from top500.fetch import DownloadError
+
+# The editions of the corpus, with a page of each
+START = date(2016, 6, 1)
+END = date(2016, 11, 1)
+PAGES = 1
+
+class CorpusSource:
+    '''Source of pages (see Scraper) that reads them from a corpus
+
+    Params:
+     - corpus: the directory of the corpus
+    '''
+
+    def __init__(self, corpus):
+        self.corpus = corpus
+
+    def fetch(self, url):
+        'Returns the page for an URL. Raises DownloadError if not found.'
+        parts = urlsplit(url)
+        path = parts.path + ('?' + parts.query if parts.query else '')
+        try:
+            with open(path_for_url(self.corpus, path), 'rb') as page:
+                return CachedPage(url, page.read(), 'utf-8')
+        except (TypeError, OSError):
+            raise DownloadError("Not in the corpus: %s" % url)
+
+def make_corpus():
+    'Generates a corpus in a temporary directory, and returns its path'
+    corpus = tempfile.mkdtemp(prefix='top500-corpus-')
+    generate(corpus, START, END, PAGES)
+    return corpus
+
+def remove_corpus(corpus):
+    'Removes a corpus made by make_corpus'
+    shutil.rmtree(corpus, ignore_errors=True)
+
+class CorpusTestCase(unittest.TestCase):
+    '''Base class of the tests over a corpus, made once for each class. The
+    scraper's progress messages are captured in self.output while each test
+    runs.'''
+
+    @classmethod
+    def setUpClass(cls):
+        cls.corpus = make_corpus()
+
+    @classmethod
+    def tearDownClass(cls):
+        remove_corpus(cls.corpus)
+
+    def setUp(self):
+        self.output = io.StringIO()
+        redirect = contextlib.redirect_stdout(self.output)
+        redirect.__enter__()
+        self.addCleanup(redirect.__exit__, None, None, None)
+
+    def source(self):
+        'Returns a CorpusSource for the corpus'
+        return CorpusSource(self.corpus)
+
+class ServedCorpusTestCase(CorpusTestCase):
+    '''Base class of the tests of the code that downloads pages from the
+    site: the corpus is served by a FixtureServer, which urlgen.BASE_URL
+    points to while the tests of the class run'''
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = FixtureServer(cls.corpus, 0)
+        cls.server.start()
+        cls.site = urlgen.BASE_URL
+        urlgen.BASE_URL = cls.server.base_url
+
+    @classmethod
+    def tearDownClass(cls):
+        urlgen.BASE_URL = cls.site
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
@@ -0,0 +1,81 @@
+'''Tests of the aggregates of the editions'''
+
+import os
+import shutil
+import tempfile
+import unittest
+from top500.aggregates import (EditionAggregates, read_aggregates,
+                               summarize)
+
+def entry(year, month, rank, rmax, segment, country, power=None):
+    'Returns an entry, with the fields that are aggregated'
+    return {'year': year, 'month': month, 'rank': rank, 'rmax': rmax,
+            'rpeak': rmax * 2, 'cores': 1000 * rank, 'memory': None,
+            'power': power, 'segment': segment, 'country': country}
+
+# Performance is in TFlop/s in these editions
+ENTRIES = [
+    entry(2017, 6, 1, 4.0, 'Research', 'Japan', 100.0),
+    entry(2017, 6, 2, 3.0, 'Research', 'Italy'),
+    entry(2017, 6, 3, 2.0, 'Industry', 'Italy', 50.0),
+    entry(2017, 6, 4, 1.0, None, 'Italy'),
+    entry(2017, 11, 1, 5.0, 'Research', 'Japan'),
+]
+
+def rows(path, dimension='edition', field='rmax'):
+    'Returns the (year, month, value, entries, count, sum) of the aggregates'
+    return [(row['year'], row['month'], row['value'], row['entries'],
+             row['count'], row['sum'])
+            for row in read_aggregates(path, dimension, field)]
+
+class SummarizeTest(unittest.TestCase):
+
+    def test_summarize(self):
+        self.assertEqual(summarize([4.0, 1.0, 3.0, 2.0]),
+                         (4, 10.0, 1.0, 4.0, 1.75, 2.5, 3.25))
+        self.assertEqual(summarize([2.0]), (1, 2.0, 2.0, 2.0, 2.0, 2.0, 2.0))
+        self.assertEqual(summarize([]), (0,) + (None,) * 6)
+
+class EditionAggregatesTest(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.mkdtemp(prefix='top500-aggregates-')
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, 'aggregates.db')
+
+    def aggregate(self, entries):
+        'Adds some entries to the aggregates'
+        aggregates = EditionAggregates(self.path)
+        for item in entries:
+            aggregates.add(item)
+        aggregates.close()
+
+    def test_aggregates(self):
+        self.aggregate(ENTRIES)
+        # In GFlop/s
+        self.assertEqual(rows(self.path),
+                         [(2017, 6, '', 4, 4, 10000.0),
+                          (2017, 11, '', 1, 1, 5000.0)])
+        self.assertEqual(rows(self.path, 'segment'),
+                         [(2017, 6, '', 1, 1, 1000.0),
+                          (2017, 6, 'Industry', 1, 1, 2000.0),
+                          (2017, 6, 'Research', 2, 2, 7000.0),
+                          (2017, 11, 'Research', 1, 1, 5000.0)])
+        # Missing values aren't counted
+        self.assertEqual(rows(self.path, 'country', 'power'),
+                         [(2017, 6, 'Italy', 3, 1, 50.0),
+                          (2017, 6, 'Japan', 1, 1, 100.0),
+                          (2017, 11, 'Japan', 1, 0, None)])
+
+    def test_replace_edition(self):
+        self.aggregate(ENTRIES)
+        # Only the edition whose entries are added again is replaced
+        self.aggregate([entry(2017, 6, 1, 6.0, 'Vendor', 'Japan')])
+        self.assertEqual(rows(self.path),
+                         [(2017, 6, '', 1, 1, 6000.0),
+                          (2017, 11, '', 1, 1, 5000.0)])
+        self.assertEqual(rows(self.path, 'segment')[:1],
+                         [(2017, 6, 'Vendor', 1, 1, 6000.0)])
+
+if __name__ == '__main__':
+    unittest.main()
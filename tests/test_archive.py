@@ -0,0 +1,69 @@
+'''Tests of the archive of the pages, and of scraping it again'''
+
+import os
+import shutil
+import tempfile
+import unittest
+from top500 import archive
+from top500.archive import (ArchiveReader, ArchiveWriter, read_index,
+                            init_worker, scrape_archived_edition)
+from top500.cache import CachedPage
+from top500.fetch import DownloadError
+from top500.scraper import Scraper, GPUCarryOver
+from top500.urlgen import editions
+from tests.corpus import CorpusTestCase, START, END
+
+# Part of the first list page of each edition
+COUNT = 20
+
+class ArchiveTest(CorpusTestCase):
+    'The pages archived while scraping give the same entries again'
+
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.mkdtemp(prefix='top500-archive-')
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.path = os.path.join(directory, 'pages.warc.gz')
+
+    def scrape(self):
+        'Scrapes the corpus, archiving its pages. Returns the entries.'
+        writer = ArchiveWriter(self.path)
+        try:
+            scraper = Scraper(source=self.source(), archive=writer)
+            return list(scraper.iter_entries(START, END, COUNT))
+        finally:
+            writer.close()
+
+    def test_reparse(self):
+        expected = self.scrape()
+        init_worker(self.path)
+        self.addCleanup(setattr, archive, '_reader', None)
+        self.addCleanup(archive._reader.close)  # pylint: disable=protected-access
+        carry_over = GPUCarryOver()
+        entries = [carry_over(entry) for edition in editions(START, END)
+                   for entry in scrape_archived_edition(edition, COUNT,
+                                                        'html.parser')]
+        self.assertEqual(entries, expected)
+
+    def test_latest_content(self):
+        self.scrape()
+        index = read_index(self.path)
+        url = next(iter(index))
+        # The same pages aren't archived again
+        self.scrape()
+        self.assertEqual(read_index(self.path), index)
+        writer = ArchiveWriter(self.path)
+        writer.add(url, CachedPage(url, b'<html>New</html>', 'latin-1'))
+        writer.close()
+        reader = ArchiveReader(self.path)
+        self.addCleanup(reader.close)
+        self.assertEqual(len(reader.index), len(index))
+        page = reader.fetch(url)
+        self.assertEqual((page.content, page.encoding),
+                         (b'<html>New</html>', 'latin-1'))
+        self.assertNotIn(url + '?missing', reader)
+        with self.assertRaises(DownloadError):
+            reader.fetch(url + '?missing')
+
+if __name__ == '__main__':
+    unittest.main()
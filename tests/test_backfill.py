@@ -0,0 +1,58 @@
+'''Tests of the backfilling of editions from the rank histories'''
+
+import unittest
+from top500.backfill import Backfill
+from top500.scraper import Scraper
+from tests.corpus import CorpusSource, CorpusTestCase, START, END, PAGES
+
+COUNT = PAGES * 100
+
+class CountingSource(CorpusSource):
+    'A corpus that counts the pages fetched from it'
+
+    def __init__(self, corpus):
+        super().__init__(corpus)
+        self.requests = 0
+
+    def fetch(self, url):
+        self.requests += 1
+        return super().fetch(url)
+
+class BackfillTest(CorpusTestCase):
+
+    def setUp(self):
+        super().setUp()
+        source = CountingSource(self.corpus)
+        self.expected = list(Scraper(source=source).iter_entries(START, END,
+                                                                 COUNT))
+        self.requests = source.requests
+
+    def backfill(self, max_gaps):
+        'Returns the Backfill of the corpus, and the requests it made'
+        source = CountingSource(self.corpus)
+        backfill = Backfill(Scraper(source=source), START, END, COUNT,
+                            max_gaps=max_gaps)
+        backfill.run()
+        entries = list(backfill.iter_entries())
+        return backfill, entries, source.requests
+
+    def test_fewer_requests(self):
+        backfill, entries, requests = self.backfill(COUNT // 4)
+        gaps = backfill.gaps()
+        self.assertTrue(gaps)
+        self.assertLess(requests, self.requests)
+        self.assertEqual(backfill.cross_check(), [])
+        # The same entries as a full scrape, except the ones left out
+        self.assertEqual(entries,
+                         [entry for entry in self.expected
+                          if (entry['year'], entry['month'], entry['rank'])
+                          not in gaps])
+
+    def test_no_gaps(self):
+        backfill, entries, requests = self.backfill(0)
+        self.assertEqual(backfill.gaps(), [])
+        self.assertLessEqual(requests, self.requests)
+        self.assertEqual(entries, self.expected)
+
+if __name__ == '__main__':
+    unittest.main()
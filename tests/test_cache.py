@@ -0,0 +1,126 @@
+'''Tests of the persistent cache of pages'''
+
+import contextlib
+import io
+import os
+import shutil
+import tempfile
+import unittest
+from top500.cache import ResponseCache
+from top500.scraper import _fetch
+
+URL = 'https://www.top500.org/system/170000'
+
+class Response:
+    'A downloaded page, with the attributes of a "requests" response'
+
+    encoding = 'utf-8'
+    apparent_encoding = 'utf-8'
+
+    def __init__(self, content, etag=None, status_code=200):
+        self.content = content
+        self.headers = {'ETag': etag} if etag else {}
+        self.status_code = status_code
+
+class Fetcher:
+    '''Answers the downloads of a page with some responses, in order, and
+    keeps the headers of each request'''
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.requests = []
+
+    def get(self, url, headers=None):
+        self.requests.append(headers or {})
+        return self.responses.pop(0)
+
+class EvictingFetcher(Fetcher):
+    '''A Fetcher that evicts all the pages of a cache (e.g. from another
+    thread) while the first page is being downloaded'''
+
+    def __init__(self, cache, *responses):
+        super().__init__(*responses)
+        self.cache = cache
+
+    def get(self, url, headers=None):
+        if not self.requests:
+            max_size, self.cache.max_size = self.cache.max_size, 0
+            self.cache.evict()
+            self.cache.max_size = max_size
+        return super().get(url, headers)
+
+class ResponseCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(prefix='top500-cache-')
+        self.cache = ResponseCache(self.directory)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def expire(self):
+        'Makes the cached pages stale'
+        with self.cache.db:
+            self.cache.db.execute('UPDATE pages SET fetched = 0')
+
+    def objects(self):
+        'Returns the number of content files'
+        return sum(len(files) for _, _, files
+                   in os.walk(os.path.join(self.directory, 'objects')))
+
+    def test_replaced_content(self):
+        self.cache.store(URL, Response(b'old page'))
+        self.cache.store(URL, Response(b'new page'))
+        self.assertEqual(self.cache.size(), len(b'new page'))
+        self.assertEqual(self.objects(), 1)
+        self.assertEqual(self.cache.get(URL).content, b'new page')
+
+    def test_shared_content(self):
+        other = 'https://www.top500.org/system/170001'
+        self.cache.store(URL, Response(b'page'))
+        self.cache.store(other, Response(b'page'))
+        self.cache.store(URL, Response(b'new page'))
+        self.assertEqual(self.cache.get(other).content, b'page')
+        self.assertEqual(self.objects(), 2)
+
+    def test_eviction(self):
+        self.cache.max_size = 10
+        for version in range(5):
+            self.cache.store(URL, Response(b'page %d' % version))
+        self.assertLessEqual(self.cache.size(), 10)
+        self.assertEqual(self.objects(), 1)
+
+    def test_missing_content(self):
+        self.cache.store(URL, Response(b'page', etag='"v1"'))
+        shutil.rmtree(os.path.join(self.directory, 'objects'))
+        self.assertIsNone(self.cache.get(URL))
+        self.assertEqual(self.cache.conditional_headers(URL), {})
+        self.assertEqual(self.cache.size(), 0)
+
+    def test_not_modified(self):
+        self.cache.store(URL, Response(b'page', etag='"v1"'))
+        self.expire()
+        self.assertIsNone(self.cache.get(URL))
+        fetcher = Fetcher(Response(b'', etag='"v2"', status_code=304))
+        with contextlib.redirect_stdout(io.StringIO()):
+            page = _fetch(URL, fetcher, self.cache)
+        self.assertEqual(page.content, b'page')
+        self.assertEqual(fetcher.requests, [{'If-None-Match': '"v1"'}])
+        self.assertEqual(self.cache.get(URL).content, b'page')
+        self.assertEqual(self.cache.conditional_headers(URL),
+                         {'If-None-Match': '"v2"'})
+
+    def test_evicted_before_not_modified(self):
+        self.cache.store(URL, Response(b'page', etag='"v1"'))
+        self.expire()
+        headers = self.cache.conditional_headers(URL)
+        fetcher = EvictingFetcher(self.cache, Response(b'', status_code=304),
+                                  Response(b'new page', etag='"v2"'))
+        with contextlib.redirect_stdout(io.StringIO()):
+            page = _fetch(URL, fetcher, self.cache)
+        self.assertEqual(page.content, b'new page')
+        self.assertEqual(fetcher.requests, [headers, {}])
+        self.assertEqual(self.cache.get(URL).content, b'new page')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+'''Tests of the checkpoints of a scraping run, and of resuming it'''
+
+import os
+import re
+import shutil
+import tempfile
+import unittest
+from benchmarks.fixtures import list_path
+from scrape import TOP500, JOURNAL_SUFFIX
+from top500.checkpoint import Journal
+from tests.corpus import ServedCorpusTestCase, START, END, PAGES
+
+EDITIONS = {(START.year, START.month, 1), (END.year, END.month, 1)}
+
+class ResumeTest(ServedCorpusTestCase):
+    'A run that is resumed writes the same output as an uninterrupted one'
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # Leave all but the name and processor of a system with a GPU out of
+        # its listing in the second edition, so that its GPU is carried over
+        # from the first one
+        with open(list_path(cls.corpus, START, 1), encoding='utf-8') as page:
+            first = page.read()
+        path = list_path(cls.corpus, END, 1)
+        with open(path, encoding='utf-8') as page:
+            second = page.read()
+        for system_id, gpu in re.findall(
+                r'/system/(\d+)">[^<,]*,[^<,]*,[^<,]*, ([^<]*)<', first):
+            listing = re.search(r'(/system/%s">[^<,]*,[^<,]*)[^<]*'
+                                % system_id, second)
+            if listing:
+                cls.carried = (system_id, gpu)
+                second = second.replace(listing.group(0), listing.group(1))
+                break
+        else:
+            raise AssertionError("No system with a GPU in both editions")
+        with open(path, 'w', encoding='utf-8') as page:
+            page.write(second)
+
+    def setUp(self):
+        super().setUp()
+        self.directory = tempfile.mkdtemp(prefix='top500-resume-')
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.expected = self.read(self.scrape('expected.csv'))
+
+    def scrape(self, name, end=END, resume=False):
+        'Scrapes the corpus until an edition, and returns the output file'
+        top500 = TOP500()
+        top500.year, top500.month = START.year, START.month
+        top500.endyear, top500.endmonth = end.year, end.month
+        top500.count = PAGES * 100
+        top500.outfile = os.path.join(self.directory, name)
+        top500.resume = resume
+        try:
+            top500.scrape()
+        finally:
+            top500.close_scraper()
+        return top500.outfile
+
+    @staticmethod
+    def read(path):
+        'Returns the content of a file'
+        with open(path, encoding='utf-8') as output:
+            return output.read()
+
+    def test_gpu_carried_over(self):
+        system_id, gpu = self.carried
+        self.assertEqual(len([line for line in self.expected.splitlines()
+                              if system_id in line and gpu in line]), 2)
+        # Interrupted after the first edition
+        self.scrape('top500.csv', end=START)
+        output = self.scrape('top500.csv', resume=True)
+        self.assertIn("already scraped", self.output.getvalue())
+        self.assertEqual(self.read(output), self.expected)
+
+    def test_incomplete_record(self):
+        output = self.scrape('top500.csv')
+        journal = output + JOURNAL_SUFFIX
+        # Interrupted while writing the record of the last page
+        os.truncate(journal, os.path.getsize(journal) - 10)
+        self.scrape('top500.csv', resume=True)
+        resumed = Journal(journal, resume=True)
+        resumed.close()
+        self.assertEqual(resumed.completed, EDITIONS)
+        with open(journal, encoding='utf-8') as records:
+            self.assertEqual(len(records.readlines()), len(EDITIONS))
+        # Nothing is left to scrape
+        self.scrape('top500.csv', resume=True)
+        self.assertEqual(self.output.getvalue().count("already scraped"), 3)
+        self.assertEqual(self.read(output), self.expected)
+
+if __name__ == '__main__':
+    unittest.main()
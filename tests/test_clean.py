@@ -0,0 +1,70 @@
+'''Tests of the cleaning of the entries, like analisi/analisi.R does'''
+
+import io
+import unittest
+from datetime import date
+from top500.clean import (CleanCSVWriter, CLEAN_FIELDS, clean_entry,
+                          edition_number, format_number)
+from top500.scraper import ENTRY_FIELDS
+
+def entry(year, month, **values):
+    'Returns an entry of an edition, with some values'
+    fields = dict.fromkeys(ENTRY_FIELDS)
+    fields.update(year=year, month=month, rank=1, system_id='1',
+                  manufacturer='Hewlett Packard Enterprise', os='SLES 12',
+                  compiler='N/A', cores=1024, rmax=1.5, rpeak=2.0)
+    fields.update(values)
+    return fields
+
+class CleanTest(unittest.TestCase):
+
+    def test_edition_number(self):
+        self.assertEqual(edition_number(1993, 6), 1)
+        self.assertEqual(edition_number(1993, 11), 2)
+        self.assertEqual(edition_number(2005, 6), 25)
+
+    def test_clean_entry(self):
+        clean = clean_entry(entry(2017, 11))
+        self.assertEqual(tuple(clean), CLEAN_FIELDS)
+        self.assertEqual(clean['list'], date(2017, 11, 1))
+        self.assertEqual(clean['edition'], 50)
+        self.assertEqual(clean['manufacturer'], 'HP')
+        self.assertEqual(clean['os'], 'SuSE Linux')
+        self.assertEqual(clean['osfamily'], 'Linux')
+        self.assertIsNone(clean['compiler'])
+        self.assertEqual(clean['cores'], 1024)
+
+    def test_gflops(self):
+        # rmax and rpeak are in TFlop/s from the 25th edition
+        clean = clean_entry(entry(2017, 11))
+        self.assertEqual((clean['rmax'], clean['rpeak']), (1500.0, 2000.0))
+        clean = clean_entry(entry(2004, 11))
+        self.assertEqual((clean['rmax'], clean['rpeak']), (1.5, 2.0))
+        clean = clean_entry(entry(2017, 11, rmax=None))
+        self.assertIsNone(clean['rmax'])
+
+    def test_format_number(self):
+        self.assertEqual(format_number(1500.0), '1500')
+        self.assertEqual(format_number(0.25), '0.25')
+        self.assertEqual(format_number(100000.0), '1e+05')
+        self.assertEqual(format_number(0.0001), '1e-04')
+        self.assertEqual(format_number(1 / 3), '0.333333333333333')
+
+    def test_writer(self):
+        stream = io.StringIO()
+        writer = CleanCSVWriter(stream)
+        writer.write(entry(2017, 11, country='Italy', name='Ignored'))
+        writer.close()
+        header, line = stream.getvalue().splitlines()
+        self.assertEqual(header.split(','),
+                         ['"%s"' % field for field in CLEAN_FIELDS])
+        values = dict(zip(CLEAN_FIELDS, line.split(',')))
+        self.assertEqual(values['manufacturer'], '"HP"')
+        self.assertEqual(values['rmax'], '1500')
+        self.assertEqual(values['compiler'], 'NA')
+        self.assertEqual(values['country'], '"Italy"')
+        self.assertEqual(values['list'], '2017-11-01')
+        self.assertEqual(values['edition'], '50')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+'''Tests of the downloading of pages: the rate limiter and its retries'''
+
+import time
+import unittest
+from email.utils import formatdate
+from top500.fetch import RateLimiter, retry_after, THROTTLED_RATE, MIN_RATE
+
+class Clock:
+    'A clock that only moves when something sleeps'
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        'Moves the clock'
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+class Response:
+    'A response with some headers'
+
+    def __init__(self, **headers):
+        self.headers = headers
+
+class RateLimiterTest(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = Clock()
+
+    def limiter(self, rate=None, burst=None):
+        'Returns a RateLimiter with the test clock'
+        return RateLimiter(rate, burst, clock=self.clock,
+                           sleep=self.clock.sleep)
+
+    def test_unlimited(self):
+        limiter = self.limiter()
+        for _ in range(100):
+            limiter.acquire()
+        self.assertEqual(self.clock.sleeps, [])
+        self.assertEqual(limiter.tokens, limiter.burst)
+
+    def test_rate(self):
+        limiter = self.limiter(rate=2)
+        for _ in range(4):
+            limiter.acquire()
+        # The burst of 2 requests, and then one every half a second
+        self.assertEqual(self.clock.sleeps, [0.5, 0.5])
+
+    def test_throttle(self):
+        limiter = self.limiter(rate=4)
+        limiter.throttle()
+        self.assertEqual(limiter.rate, 2)
+        for _ in range(10):
+            limiter.throttle()
+        self.assertEqual(limiter.rate, MIN_RATE)
+
+    def test_throttle_unlimited(self):
+        limiter = self.limiter()
+        for _ in range(10):
+            limiter.acquire()
+        limiter.throttle()
+        self.assertEqual(limiter.rate, THROTTLED_RATE)
+        # The requests made while unlimited don't count
+        limiter.acquire()
+        limiter.acquire()
+        self.assertEqual(self.clock.sleeps, [1 / THROTTLED_RATE])
+
+    def test_pause(self):
+        limiter = self.limiter(rate=10)
+        limiter.throttle(pause=30)
+        limiter.acquire()
+        self.assertEqual(self.clock.now, 30)
+
+    def test_recovery(self):
+        limiter = self.limiter(rate=4)
+        limiter.throttle()
+        for _ in range(100):
+            limiter.succeeded()
+        self.assertEqual(limiter.rate, 4)
+
+    def test_recovery_unlimited(self):
+        limiter = self.limiter(burst=5)
+        limiter.throttle()
+        self.assertEqual(limiter.burst, 1)
+        for _ in range(10000):
+            limiter.succeeded()
+            if limiter.rate is None:
+                break
+        self.assertIsNone(limiter.rate)
+        self.assertEqual((limiter.burst, limiter.tokens), (5, 5))
+
+class RetryAfterTest(unittest.TestCase):
+
+    def test_seconds(self):
+        self.assertEqual(retry_after(Response(**{'Retry-After': '120'})),
+                         120)
+
+    def test_date(self):
+        date = formatdate(time.time() + 120, usegmt=True)
+        wait = retry_after(Response(**{'Retry-After': date}))
+        self.assertTrue(110 < wait <= 120)
+
+    def test_invalid(self):
+        self.assertIsNone(retry_after(Response()))
+        self.assertIsNone(retry_after(Response(**{'Retry-After': 'soon'})))
+
+if __name__ == '__main__':
+    unittest.main()
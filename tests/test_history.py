@@ -0,0 +1,65 @@
+'''Tests of the histories of systems and sites, and of the differences
+between editions'''
+
+import unittest
+from datetime import date
+from top500.history import HistoryIndex
+
+JUNE = date(2017, 6, 1)
+NOVEMBER = date(2017, 11, 1)
+
+def entry(edition, rank, system_id, site_id, rmax):
+    'Returns an entry, with the fields that are indexed'
+    return {'year': edition.year, 'month': edition.month, 'rank': rank,
+            'system_id': system_id, 'site_id': site_id, 'rmax': rmax,
+            'rpeak': rmax * 2, 'power': None}
+
+ENTRIES = [
+    entry(JUNE, 1, 'a', '1', 100.0),
+    entry(JUNE, 2, 'b', '1', 50.0),
+    entry(JUNE, 3, 'c', '2', 25.0),
+    entry(NOVEMBER, 1, 'd', '2', 200.0),
+    entry(NOVEMBER, 2, 'b', '1', 60.0),
+    entry(NOVEMBER, 3, 'a', '1', 100.0),
+]
+
+class HistoryIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        # Entries that don't come in order are indexed in order too
+        self.index = HistoryIndex(reversed(ENTRIES))
+
+    def test_histories(self):
+        self.assertEqual([(item.edition, item.rank) for item
+                          in self.index.system_history('a')],
+                         [(JUNE, 1), (NOVEMBER, 3)])
+        self.assertEqual([item.system_id for item
+                          in self.index.site_history('1')],
+                         ['a', 'b', 'b', 'a'])
+        self.assertEqual(self.index.system_history('z'), [])
+        self.assertEqual([item.rank for item in self.index.edition(NOVEMBER)],
+                         [1, 2, 3])
+
+    def test_diff(self):
+        diff = self.index.diff(JUNE, NOVEMBER)
+        self.assertEqual([item.system_id for item in diff.entered], ['d'])
+        self.assertEqual([item.system_id for item in diff.exited], ['c'])
+        self.assertEqual([new.system_id for _, new in diff.stayed],
+                         ['b', 'a'])
+        self.assertEqual(diff.rank_changes(), {'a': -2, 'b': 0})
+        self.assertEqual(diff.rmax_growth(), {'a': 1.0, 'b': 1.2})
+        self.assertEqual(diff.total_rmax_growth(), 360.0 / 175.0)
+
+    def test_diffs(self):
+        self.index.add(entry(date(2018, 6, 1), 1, 'a', '1', 150.0))
+        self.assertEqual([(diff.old, diff.new) for diff in self.index.diffs()],
+                         [(JUNE, NOVEMBER), (NOVEMBER, date(2018, 6, 1))])
+
+    def test_missing_edition(self):
+        diff = self.index.diff(JUNE, date(2018, 6, 1))
+        self.assertEqual(len(diff.exited), 3)
+        self.assertEqual(diff.entered, [])
+        self.assertEqual(diff.total_rmax_growth(), 0.0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+'''Tests of the lookups of systems and sites'''
+
+import json
+import threading
+import unittest
+import urllib.error
+import urllib.request
+from top500.lookup import LRUCache, LookupService, make_server
+from top500.scraper import Scraper
+from tests.corpus import CorpusSource, CorpusTestCase
+
+class Clock:
+    'A clock that only moves when told to'
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+class LRUCacheTest(unittest.TestCase):
+
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(max_items=2, ttl=None)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        cache.get('a')
+        cache.put('c', 3)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual((cache.get('a'), cache.get('c')), (1, 3))
+
+    def test_expires(self):
+        clock = Clock()
+        cache = LRUCache(ttl=10, clock=clock)
+        cache.put('a', 1)
+        clock.now = 9
+        self.assertEqual(cache.get('a'), 1)
+        clock.now = 10
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(len(cache), 0)
+
+class BrokenSource(CorpusSource):
+    'A corpus where one system page has an unexpected layout'
+
+    def fetch(self, url):
+        page = super().fetch(url)
+        if url.endswith('/system/170001'):
+            page.content = b'<html><body>Moved</body></html>'
+        return page
+
+class LookupServiceTest(CorpusTestCase):
+
+    def setUp(self):
+        super().setUp()
+        scraper = Scraper(retain=False, source=BrokenSource(self.corpus))
+        self.service = LookupService(scraper, jobs=2)
+        self.addCleanup(self.service.close)
+
+    def test_lookup_many(self):
+        found = self.service.lookup_many('system', ['170000', '170002',
+                                                    '170000', '99'])
+        self.assertEqual(list(found), ['170000', '170002', '99'])
+        self.assertEqual(found['170002']['system_id'], '170002')
+        self.assertIsNone(found['99'])
+        self.service.system('170000')
+        self.assertEqual(self.service.cache.stats()['hits'], 1)
+
+    def test_server(self):
+        server = make_server(self.service, port=0)
+        server.log_message = lambda *args: None
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        base = 'http://127.0.0.1:%d' % server.server_address[1]
+
+        def status(path):
+            try:
+                with urllib.request.urlopen(base + path) as response:
+                    json.load(response)
+                    return response.status
+            except urllib.error.HTTPError as error:
+                return error.code
+
+        try:
+            self.assertEqual(status('/system/170000'), 200)
+            self.assertEqual(status('/sites?ids=10001,10002'), 200)
+            self.assertEqual(status('/system/99'), 404)
+            self.assertEqual(status('/system/x'), 400)
+            self.assertEqual(status('/system/170001'), 500)
+            self.assertEqual(status('/stats'), 200)
+        finally:
+            server.shutdown()
+            server.server_close()
+
+if __name__ == '__main__':
+    unittest.main()
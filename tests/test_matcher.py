@@ -0,0 +1,57 @@
+'''Tests of the fuzzy matching of system components'''
+
+import unittest
+from top500.matcher import ComponentMatcher
+
+PROCESSOR = 'Power BQC 16C 1.6GHz'
+INTERCONNECT = 'Custom'
+
+class SplitTest(unittest.TestCase):
+
+    def setUp(self):
+        self.matcher = ComponentMatcher()
+
+    def test_name_and_gpu(self):
+        self.assertEqual(self.matcher.split(
+            '1', 'Titan, Opteron 6274 16C 2.2GHz, Cray Gemini interconnect, '
+            'NVIDIA K20x', 'Opteron 6274 16C 2.200GHz',
+            'Cray Gemini interconnect'), ('Titan', 'NVIDIA K20x'))
+
+    def test_known_components(self):
+        # The processor of system 177556 is written differently in the list
+        # and details pages
+        self.assertEqual(self.matcher.split(
+            '177556', 'Sequoia-BlueGene/Q, Power BQC 16C 1.60 GHz, Custom',
+            PROCESSOR, INTERCONNECT), ('Sequoia-BlueGene/Q', None))
+
+    def test_empty_name(self):
+        # An empty first part is still the name
+        self.assertEqual(self.matcher.split(
+            '2', ', Power BQC 16C 1.60 GHz, Custom', PROCESSOR, INTERCONNECT),
+            ('', None))
+
+    def test_no_name(self):
+        self.assertEqual(self.matcher.split(
+            '3', 'Power BQC 16C 1.60 GHz', PROCESSOR, INTERCONNECT),
+            (None, None))
+
+    def test_memoized(self):
+        for _ in range(2):
+            self.assertEqual(self.matcher.split('1', 'A, B', PROCESSOR,
+                                                INTERCONNECT), ('A', 'B'))
+        self.assertEqual(self.matcher.split.cache_info().currsize, 1)
+
+    def test_bounded(self):
+        matcher = ComponentMatcher(memo_size=2)
+        for system_id in '1234':
+            self.assertEqual(matcher.split(system_id, 'A, B', PROCESSOR,
+                                           INTERCONNECT), ('A', 'B'))
+        self.assertEqual(matcher.split.cache_info().currsize, 2)
+        self.assertEqual(matcher.could_be.cache_info().currsize, 2)
+        # Evicted results are computed again, the same
+        self.assertEqual(matcher.split('1', 'A, B', PROCESSOR, INTERCONNECT),
+                         ('A', 'B'))
+        self.assertEqual(matcher.split.cache_info().misses, 5)
+
+if __name__ == '__main__':
+    unittest.main()
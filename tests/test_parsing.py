@@ -0,0 +1,109 @@
+'''Tests of the parsing modes of the scraper, and of its parsing of
+numbers. The expected values are the ones of the locale-based parsing
+(locale.atoi and locale.atof, in the en_US locale) that it replaced.'''
+
+import contextlib
+import io
+import unittest
+from datetime import date
+from top500.scraper import Scraper, PARSERS, _atof, _atoi, _listing, \
+    _numeric_value
+from tests.corpus import CorpusSource, CorpusTestCase, START, END, PAGES
+
+try:
+    import lxml
+except ImportError:
+    lxml = None
+
+# The numbers of the first entries of the corpus' first edition, by rank, as
+# (cores, memory, nmax, rmax, rpeak, power)
+FIRST_ENTRIES = {
+    1: (337007, 860638, 5194341, 96761.3, 132164.1, None),
+    2: (247590, 1472847, 5679237, 95359.8, 161929.3, 10893.8),
+    3: (275669, 470664, 5560531, 93501.7, 172853.7, 1083.0),
+}
+NUMBER_FIELDS = ('cores', 'memory', 'nmax', 'rmax', 'rpeak', 'power')
+
+# Texts of numeric fields and their values
+VALUES = [
+    ('cores', '1,234,567', 1234567),
+    ('cores', '42', 42),
+    ('memory', '1,024 GB', 1024),
+    ('nmax', '12,288,000', 12288000),
+    ('rmax', '93,014.59', 93014.59),
+    ('rpeak', '125,435.9 TFlop/s', 125435.9),
+    ('power', '15,371.00 kW (Submitted)', 15371.0),
+    ('hpcg', '0.48', 0.48),
+    # Values that aren't numbers
+    ('rmax', '-', None),
+    ('power', '-', None),
+    ('rmax', '', ''),
+    ('power', '', ''),
+    ('processor', 'Xeon', 'Xeon'),
+    ('cores', 'unknown', 'unknown'),
+]
+
+def scrape(corpus, parser):
+    'Returns the entries of the editions of a corpus, scraped with a parser'
+    scraper = Scraper(parser=parser, source=CorpusSource(corpus))
+    # Silence the scraper's progress messages
+    with contextlib.redirect_stdout(io.StringIO()):
+        return list(scraper.iter_entries(START, END, PAGES * 100))
+
+class ParsersTest(CorpusTestCase):
+    'All the parsing modes scrape the same entries'
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.expected = scrape(cls.corpus, 'html.parser')
+
+    def test_entries(self):
+        self.assertEqual(len(self.expected), 2 * PAGES * 100)
+        self.assertTrue(all(entry['processor'] for entry in self.expected))
+        self.assertTrue(all(entry['site_name'] for entry in self.expected))
+
+    def test_first_entries(self):
+        for entry in self.expected[:len(FIRST_ENTRIES)]:
+            self.assertEqual(tuple(entry[field] for field in NUMBER_FIELDS),
+                             FIRST_ENTRIES[entry['rank']])
+
+    def test_parsers(self):
+        for parser in PARSERS:
+            if parser == 'lxml' and lxml is None:
+                continue
+            with self.subTest(parser=parser):
+                self.assertEqual(scrape(self.corpus, parser), self.expected)
+
+class NumbersTest(unittest.TestCase):
+    'Numbers in the site are parsed regardless of the locale'
+
+    def test_atoi(self):
+        self.assertEqual(_atoi('1,234,567'), 1234567)
+        self.assertEqual(_atoi('42'), 42)
+        with self.assertRaises(ValueError):
+            _atoi('')
+
+    def test_atof(self):
+        self.assertEqual(_atof('1,234.5'), 1234.5)
+        self.assertEqual(_atof('0.25'), 0.25)
+        with self.assertRaises(ValueError):
+            _atof('')
+
+    def test_numeric_values(self):
+        for field, text, value in VALUES:
+            with self.subTest(field=field, text=text):
+                self.assertEqual(_numeric_value(field, text), value)
+
+    def test_listing(self):
+        listing = _listing(date(2016, 6, 1), 1, '1', '2', 'System', 'Vendor',
+                           ['337,007', '96,761.3', '132,164.1', ''])
+        self.assertEqual([listing[field] for field
+                          in ('cores', 'rmax', 'rpeak', 'power')],
+                         [337007, 96761.3, 132164.1, None])
+        listing = _listing(date(2016, 6, 1), 2, '1', '2', 'System', 'Vendor',
+                           ['1,000', '1.5', '2.0', '10,893.8'])
+        self.assertEqual(listing['power'], 10893.8)
+
+if __name__ == '__main__':
+    unittest.main()
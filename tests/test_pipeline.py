@@ -0,0 +1,50 @@
+'''Tests of the pipeline that scrapes several editions at once'''
+
+import unittest
+from benchmarks.fixtures import list_path
+from top500.fetch import Fetcher
+from top500.pipeline import Pipeline
+from top500.scraper import Scraper, GPUCarryOver
+from top500.urlgen import editions
+from tests.corpus import ServedCorpusTestCase, START, END
+
+# Part of the first list page of each edition
+COUNT = 50
+
+class PipelineTest(ServedCorpusTestCase):
+    'The pipeline scrapes the same entries as a scraper'
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # Quote the first link to a system with single quotes, which HTML
+        # allows too
+        path = list_path(cls.corpus, START, 1)
+        with open(path, encoding='utf-8') as page:
+            content = page.read()
+        content = content.replace('<a href="https://www.top500.org/system/',
+                                  "<a href='https://www.top500.org/system/",
+                                  1)
+        content = content.replace('">System', "'>System", 1)
+        with open(path, 'w', encoding='utf-8') as page:
+            page.write(content)
+
+    def test_entries(self):
+        expected = list(Scraper(source=self.source()).iter_entries(START, END,
+                                                                   COUNT))
+        requests = self.server.requests
+        fetcher = Fetcher(2)
+        pipeline = Pipeline(fetcher, jobs=2, processes=1)
+        carry_over = GPUCarryOver()
+        entries = [carry_over(entry) for _, edition_entries
+                   in pipeline.run(list(editions(START, END)), COUNT)
+                   for entry in edition_entries]
+        fetcher.close()
+        self.assertEqual(entries, expected)
+        # Only the details pages of the entries are downloaded, once
+        details = {entry['system_id'] for entry in expected} | \
+            {entry['site_id'] for entry in expected}
+        self.assertEqual(self.server.requests - requests, 2 + len(details))
+
+if __name__ == '__main__':
+    unittest.main()
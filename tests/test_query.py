@@ -0,0 +1,125 @@
+'''Tests of the columnar queries over a dataset, and of its snapshots'''
+
+import math
+import os
+import shutil
+import tempfile
+import unittest
+from top500.query import Categorical, Dataset, load, SNAPSHOT_SUFFIX
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+DATASET = '''edition,rank,system_id,segment,country,rmax,power
+2016.5,1,170001,Research,Spain,100.5,10
+2016.5,2,170002,Academic,España,50.25,
+2016.5,3,170003,,Spain,25,NA
+2016.9,1,170001,Research,Spain,110,12
+2016.9,2,170004,Research,Japan,60,30
+'''
+
+@unittest.skipIf(numpy is None, "NumPy is not installed")
+class DatasetTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(prefix='top500-query-')
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.path = self.write('top500.csv', DATASET)
+        self.dataset = Dataset.from_csv(self.path)
+
+    def write(self, name, content):
+        'Writes a file in the test directory, and returns its path'
+        path = os.path.join(self.directory, name)
+        with open(path, 'w', encoding='utf-8') as output:
+            output.write(content)
+        return path
+
+    def test_columns(self):
+        self.assertEqual(len(self.dataset), 5)
+        self.assertEqual(self.dataset['rank'].dtype, numpy.int64)
+        self.assertEqual(self.dataset['rmax'].dtype, numpy.float64)
+        self.assertTrue(math.isnan(self.dataset['power'][1]))
+        self.assertTrue(math.isnan(self.dataset['power'][2]))
+        # Ids are text, even if they look like numbers
+        self.assertIsInstance(self.dataset['system_id'], Categorical)
+        self.assertEqual(self.dataset.values('segment').tolist(),
+                         ['Research', 'Academic', None, 'Research',
+                          'Research'])
+
+    def test_snapshot(self):
+        snapshot = os.path.join(self.directory, 'top500.snap')
+        self.dataset.save(snapshot)
+        loaded = Dataset.from_snapshot(snapshot)
+        self.assertEqual(list(loaded.columns), list(self.dataset.columns))
+        rows = list(self.dataset.rows())
+        self.assertEqual(len(loaded), len(rows))
+        for row, expected in zip(loaded.rows(), rows):
+            self.assertEqual(row.keys(), expected.keys())
+            for name, value in row.items():
+                if isinstance(value, float) and math.isnan(value):
+                    self.assertTrue(math.isnan(expected[name]))
+                else:
+                    self.assertEqual(value, expected[name])
+        self.assertEqual(len(loaded.where(country='España')), 1)
+
+    def test_load(self):
+        first = load(self.path)
+        self.assertTrue(os.path.exists(self.path + SNAPSHOT_SUFFIX))
+        second = load(self.path)
+        self.assertEqual(second.values('country').tolist(),
+                         first.values('country').tolist())
+        # The snapshot is read-only, mapped from the file
+        self.assertFalse(second['rank'].flags.writeable)
+
+    def test_where(self):
+        spain = self.dataset.where(country='Spain', rank=range(1, 3))
+        self.assertEqual(spain.values('system_id').tolist(),
+                         ['170001', '170001'])
+        big = self.dataset.where(rmax=lambda rmax: rmax > 55,
+                                 segment=('Research', 'Academic'))
+        self.assertEqual(big['rank'].tolist(), [1, 1, 2])
+        self.assertEqual(len(self.dataset.where(country='France')), 0)
+
+    def test_sort(self):
+        ordered = self.dataset.sort('segment', 'rmax')
+        self.assertEqual(ordered['rmax'].tolist(),
+                         [25, 50.25, 60, 100.5, 110])
+
+    def test_group_by(self):
+        groups = self.dataset.group_by('edition', 'segment').aggregate(
+            systems='count', rmax=('sum', 'rmax'), top=('max', 'rmax'),
+            bottom=('min', 'rmax'), power=('mean', 'power'),
+            reported=('count', 'power'))
+        self.assertEqual(groups['edition'].tolist(),
+                         [2016.5, 2016.5, 2016.5, 2016.9])
+        self.assertEqual(groups.values('segment').tolist(),
+                         [None, 'Academic', 'Research', 'Research'])
+        self.assertEqual(groups['systems'].tolist(), [1, 1, 1, 2])
+        self.assertEqual(groups['rmax'].tolist(), [25, 50.25, 100.5, 170])
+        self.assertEqual(groups['top'].tolist(), [25, 50.25, 100.5, 110])
+        self.assertEqual(groups['bottom'].tolist(), [25, 50.25, 100.5, 60])
+        self.assertEqual(groups['reported'].tolist(), [0, 0, 1, 2])
+        self.assertTrue(numpy.isnan(groups['power'][:2]).all())
+        self.assertEqual(groups['power'][2:].tolist(), [10, 21])
+
+    def test_unknown_aggregate(self):
+        with self.assertRaises(ValueError):
+            self.dataset.group_by('edition').aggregate(x=('median', 'rmax'))
+
+    def test_empty(self):
+        path = self.write('empty.csv', DATASET.splitlines()[0] + '\n')
+        empty = Dataset.from_csv(path)
+        self.assertEqual(len(empty), 0)
+        snapshot = os.path.join(self.directory, 'empty.snap')
+        empty.save(snapshot)
+        loaded = Dataset.from_snapshot(snapshot)
+        self.assertEqual(len(loaded), 0)
+        self.assertEqual(list(loaded.rows()), [])
+        groups = loaded.group_by('edition').aggregate(
+            systems='count', rmax=('sum', 'rmax'), top=('max', 'rmax'))
+        self.assertEqual(len(groups), 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+'''Tests of the scraper over a fixture corpus'''
+
+import re
+import unittest
+from collections import Counter
+from benchmarks.fixtures import list_path
+from top500.scraper import Scraper
+from tests.corpus import CorpusTestCase, START, END, PAGES
+
+class LookupsTest(CorpusTestCase):
+    'Each entry looks up the details of its system and site once'
+
+    def lookups(self, jobs):
+        'Returns the entries and the lookups, by kind, of a scraper'
+        scraper = Scraper(jobs=jobs, source=self.source())
+        lookups = Counter()
+        scraper.add_hook('lookup', lambda kind, found: lookups.update([kind]))
+        entries = list(scraper.iter_entries(START, END, PAGES * 100))
+        return entries, lookups
+
+    def test_sequential(self):
+        entries, lookups = self.lookups(1)
+        self.assertEqual(lookups, {'system': len(entries),
+                                   'site': len(entries)})
+
+    def test_prefetched(self):
+        entries, lookups = self.lookups(4)
+        self.assertEqual(lookups, {'system': len(entries),
+                                   'site': len(entries)})
+
+class CloseTest(CorpusTestCase):
+    'Closing a scraper cancels its pending downloads'
+
+    def test_close(self):
+        scraper = Scraper(jobs=2, source=self.source())
+        # Queues the details pages of the systems of the first page
+        next(scraper.iter_entries(START, START, 100))
+        scraper.close()
+        self.assertEqual(scraper.inflight, {})
+        with self.assertRaises(RuntimeError):
+            scraper.executor.submit(print)
+
+class NamesTest(CorpusTestCase):
+    'The name of a system is the first part of its text in the list page'
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # Remove the name of the first system of the first edition
+        path = list_path(cls.corpus, START, 1)
+        with open(path, encoding='utf-8') as page:
+            content = page.read()
+        content = re.sub(r'(/system/\d+">)System \d+', r'\1', content,
+                         count=1)
+        with open(path, 'w', encoding='utf-8') as page:
+            page.write(content)
+
+    def test_empty_name(self):
+        scraper = Scraper(source=self.source())
+        entries = list(scraper.iter_entries(START, START, 2))
+        self.assertEqual(entries[0]['name'], '')
+        self.assertTrue(entries[1]['name'].startswith('System '))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+'''Tests of the work queue shared by workers'''
+
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import date
+from top500.workqueue import WorkQueue, WorkItem
+
+ITEM = WorkItem(date(2017, 6, 1), 1, 100)
+
+class LeaseTest(unittest.TestCase):
+    'Only the worker holding the lease of an item can complete or release it'
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(prefix='top500-queue-')
+        self.queue = WorkQueue(os.path.join(self.directory, 'queue.sqlite'))
+        self.queue.add([ITEM])
+
+    def tearDown(self):
+        self.queue.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_complete(self):
+        self.assertEqual(self.queue.claim('a'), ITEM)
+        self.assertTrue(self.queue.complete(ITEM, 'a'))
+        self.assertEqual(self.queue.counts(), {'done': 1})
+
+    def test_release(self):
+        self.queue.claim('a')
+        self.assertTrue(self.queue.release(ITEM, 'a'))
+        self.assertEqual(self.queue.claim('b'), ITEM)
+
+    def test_expired_lease(self):
+        self.queue.claim('a', lease=-1)
+        self.assertEqual(self.queue.claim('b'), ITEM)
+        self.assertFalse(self.queue.complete(ITEM, 'a'))
+        self.assertFalse(self.queue.release(ITEM, 'a'))
+        self.assertEqual(self.queue.counts(), {'leased': 1})
+        self.assertTrue(self.queue.complete(ITEM, 'b'))
+        self.assertEqual(self.queue.counts(), {'done': 1})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,40 @@
+'''Tests of the writers of the outputs, read back by the readers'''
+
+import os
+import shutil
+import tempfile
+import unittest
+from top500.readers import read_entries
+from top500.scraper import ENTRY_FIELDS
+from top500.writers import open_writer
+
+def entry(rank, site_id):
+    'Returns an entry of the June 2017 list'
+    values = dict.fromkeys(ENTRY_FIELDS)
+    values.update(year=2017, month=6, rank=rank, system_id=str(170000 + rank),
+                  site_id=site_id, name='System %d' % rank, cores=1000 * rank,
+                  rmax=1.5 * rank)
+    if site_id is not None:
+        values.update(site_name='Site %s' % site_id, country='Spain')
+    return values
+
+class SQLiteWriterTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(prefix='top500-writers-')
+        self.path = os.path.join(self.directory, 'top500.sqlite')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_entries_without_site(self):
+        # e.g. entries rebuilt from the rank histories of their systems
+        entries = [entry(1, '1000'), entry(2, None), entry(3, None)]
+        writer = open_writer('sqlite', self.path)
+        for item in entries:
+            writer.write(item)
+        writer.close()
+        self.assertEqual(list(read_entries('sqlite', self.path)), entries)
+
+if __name__ == '__main__':
+    unittest.main()
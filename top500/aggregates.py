@@ -0,0 +1,188 @@
+'''Materialized aggregates of the list editions, for reports and plots.
+
+The aggregates of each edition are kept in an SQLite database: for the
+whole edition, and by segment and by country, the number of entries and
+the number, sum, minimum, maximum and quartiles of the values of each of
+the AGGREGATED_FIELDS. Values are taken from the cleaned entries (see
+top500.clean), so that e.g. rmax is in GFlop/s in all the editions.
+
+EditionAggregates maintains them incrementally: the entries of each edition
+are aggregated as they arrive, and replace the aggregates of that edition
+(and only of that one) once it is complete. Reports then read a few rows
+per edition (see read_aggregates) instead of going through all the entries.
+
+Usage (to compute the aggregates of an output of the scraper):
+    python3 -m top500.aggregates [-o FORMAT] OUTPUT AGGREGATES
+'''
+
+import argparse
+import sqlite3
+import statistics
+from datetime import datetime, timezone
+from top500.clean import clean_entry
+from top500.readers import read_entries, READERS
+
+# Fields whose values are aggregated
+AGGREGATED_FIELDS = ('rmax', 'rpeak', 'cores', 'memory', 'power')
+
+# Groups of entries of an edition: the whole edition, and by the value of
+# some fields
+DIMENSIONS = ('edition', 'segment', 'country')
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS editions (
+    year INTEGER NOT NULL,
+    month INTEGER NOT NULL,
+    entries INTEGER NOT NULL,
+    updated TEXT NOT NULL,
+    PRIMARY KEY (year, month)
+);
+CREATE TABLE IF NOT EXISTS aggregates (
+    year INTEGER NOT NULL,
+    month INTEGER NOT NULL,
+    dimension TEXT NOT NULL,
+    value TEXT NOT NULL,
+    field TEXT NOT NULL,
+    entries INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    sum REAL,
+    min REAL,
+    max REAL,
+    q1 REAL,
+    median REAL,
+    q3 REAL,
+    PRIMARY KEY (year, month, dimension, value, field)
+);
+'''
+
+# Columns of the aggregates, after the edition and the group
+AGGREGATE_COLUMNS = ('entries', 'count', 'sum', 'min', 'max', 'q1', 'median',
+                     'q3')
+
+def summarize(values):
+    '''Returns the (count, sum, min, max, q1, median, q3) of some numbers,
+    with None for all but the count if there are none. Quartiles are
+    interpolated like R's quantile() does by default.'''
+    if not values:
+        return (0, None, None, None, None, None, None)
+    if len(values) == 1:
+        quartiles = values * 3
+    else:
+        quartiles = statistics.quantiles(values, n=4, method='inclusive')
+    return (len(values), sum(values), min(values), max(values)) \
+        + tuple(quartiles)
+
+def aggregate_edition(entries):
+    '''Returns the aggregates of the cleaned entries of an edition, as
+    (dimension, value) -> field -> (entries, count, sum, min, max, q1,
+    median, q3) dictionaries. Missing segments and countries are grouped
+    under an empty value.'''
+    groups = {}
+    for entry in entries:
+        for dimension in DIMENSIONS:
+            value = '' if dimension == 'edition' else entry[dimension] or ''
+            groups.setdefault((dimension, value), []).append(entry)
+    aggregates = {}
+    for group, members in groups.items():
+        aggregates[group] = {}
+        for field in AGGREGATED_FIELDS:
+            values = [entry[field] for entry in members
+                      if isinstance(entry[field], (int, float))]
+            aggregates[group][field] = (len(members),) + summarize(values)
+    return aggregates
+
+class EditionAggregates:
+    '''Maintains the aggregates of the editions in an SQLite database, from
+    their entries. Entries of the same edition are expected together, as
+    they are written; the aggregates of an edition are replaced when the
+    entries of the next one start, or on flush().
+
+    Params:
+     - path: the database. It is created if needed.
+    '''
+
+    def __init__(self, path):
+        self.path = path
+        self.db = sqlite3.connect(path)
+        self.db.executescript(SCHEMA)
+        # The edition whose entries are being added, as (year, month), and
+        # its cleaned entries
+        self.edition = None
+        self.entries = []
+
+    def add(self, entry):
+        'Adds an entry of the output'
+        edition = (entry['year'], entry['month'])
+        if edition != self.edition:
+            self.flush()
+            self.edition = edition
+        self.entries.append(clean_entry(entry))
+
+    def flush(self):
+        '''Replaces the aggregates of the edition being added with the ones
+        of its entries'''
+        if not self.entries:
+            return
+        year, month = self.edition
+        rows = [(year, month, dimension, value, field) + summary
+                for (dimension, value), fields
+                in aggregate_edition(self.entries).items()
+                for field, summary in fields.items()]
+        updated = datetime.now(timezone.utc).isoformat()
+        with self.db:
+            self.db.execute('DELETE FROM aggregates WHERE year = ? AND '
+                            'month = ?', self.edition)
+            self.db.executemany('INSERT INTO aggregates VALUES (%s)'
+                                % ', '.join('?' * 13), rows)
+            self.db.execute('INSERT OR REPLACE INTO editions VALUES '
+                            '(?, ?, ?, ?)',
+                            (year, month, len(self.entries), updated))
+        self.entries = []
+
+    def close(self):
+        'Stores the aggregates of the last edition, and closes the database'
+        self.flush()
+        self.db.close()
+
+def read_aggregates(path, dimension='edition', field='rmax'):
+    '''Returns the aggregates of a field for a dimension (one of DIMENSIONS)
+    in all the editions, in (year, month, value) order, as dictionaries with
+    the year, month, value and AGGREGATE_COLUMNS'''
+    db = sqlite3.connect(path)
+    try:
+        cursor = db.execute(
+            'SELECT year, month, value, %s FROM aggregates '
+            'WHERE dimension = ? AND field = ? ORDER BY year, month, value'
+            % ', '.join(AGGREGATE_COLUMNS), (dimension, field))
+        names = ('year', 'month', 'value') + AGGREGATE_COLUMNS
+        return [dict(zip(names, row)) for row in cursor]
+    finally:
+        db.close()
+
+def aggregate_file(fmt, source, path):
+    '''Computes the aggregates of the editions in an output of the scraper
+    in the given format, and stores them in 'path'. Returns the number of
+    entries.'''
+    aggregates = EditionAggregates(path)
+    count = 0
+    for entry in read_entries(fmt, source):
+        aggregates.add(entry)
+        count += 1
+    aggregates.close()
+    return count
+
+def main():
+    'Computes the aggregates of an output of the scraper'
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+    parser.add_argument('-o', '--format', default='csv', choices=READERS,
+                        help="Format of the output")
+    parser.add_argument('output', help="Output of the scraper")
+    parser.add_argument('aggregates', help="Database of aggregates to update")
+    args = parser.parse_args()
+    count = aggregate_file(args.format, args.output, args.aggregates)
+    print("Aggregated %d entries" % count)
+
+if __name__ == '__main__':
+    main()
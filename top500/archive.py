@@ -0,0 +1,159 @@
+'''Append-only archive of the raw pages downloaded from the TOP500 site.
+
+An archive keeps each page as a WARC-like record (a few header lines with
+the URL, the time it was fetched and the length of the content, followed by
+the content), compressed as a separate gzip member. Records are only ever
+appended, so the archive is a valid gzip file at all times.
+
+An index next to the archive (ARCHIVE.idx) has a line per record with its
+URL, fetch time, position in the archive and digest of its content. Pages
+are only archived again if their content changed; when reading, the latest
+record of each URL is used.
+
+With an ArchiveReader as its source, the scraper parses pages straight from
+an archive, without using the network.
+'''
+
+import gzip
+import hashlib
+import os
+import threading
+from datetime import datetime, timezone
+from top500.cache import CachedPage
+from top500.scraper import Scraper, DownloadError
+
+INDEX_SUFFIX = '.idx'
+
+def _header(url, fetched, length, encoding):
+    'Header of a record'
+    return ('WARC/1.0\r\n'
+            'WARC-Type: response\r\n'
+            'WARC-Target-URI: %s\r\n'
+            'WARC-Date: %s\r\n'
+            'Content-Type: text/html; charset=%s\r\n'
+            'Content-Length: %d\r\n'
+            '\r\n' % (url, fetched, encoding, length)).encode('utf-8')
+
+def _parse_header(header):
+    'Returns the fields of the header of a record, as a dictionary'
+    fields = {}
+    for line in header.decode('utf-8').split('\r\n')[1:]:
+        name, _, value = line.partition(': ')
+        fields[name] = value
+    return fields
+
+class ArchiveWriter:
+    '''Appends pages to an archive. Pages can be added from several threads.
+
+    Params:
+     - path: the archive file. It is created if needed.
+    '''
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        # Digests of the latest content archived for each URL
+        self.digests = {url: record[3] for url, record
+                        in read_index(path).items()}
+        self.archive = open(path, 'ab')
+        self.index = open(path + INDEX_SUFFIX, 'a', encoding='utf-8')
+
+    def add(self, url, page):
+        'Archives a page (a "requests" response object, or a cached page)'
+        content = page.content
+        digest = hashlib.sha1(content).hexdigest()
+        if self.digests.get(url) == digest:
+            return
+        fetched = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+        encoding = page.encoding or 'utf-8'
+        record = gzip.compress(_header(url, fetched, len(content), encoding)
+                               + content + b'\r\n\r\n')
+        with self.lock:
+            offset = self.archive.seek(0, os.SEEK_END)
+            self.archive.write(record)
+            self.archive.flush()
+            self.index.write('%s\t%s\t%d\t%d\t%s\n'
+                             % (url, fetched, offset, len(record), digest))
+            self.index.flush()
+            self.digests[url] = digest
+
+    def close(self):
+        'Closes the archive'
+        self.archive.close()
+        self.index.close()
+
+def read_index(path):
+    '''Reads the index of an archive. Returns a dictionary with the latest
+    (fetch time, offset, length, digest) record of each URL.'''
+    index = {}
+    try:
+        with open(path + INDEX_SUFFIX, encoding='utf-8') as lines:
+            for line in lines:
+                fields = line.rstrip('\n').split('\t')
+                if len(fields) != 5:
+                    # Incomplete line of an interrupted run
+                    continue
+                url, fetched, offset, length, digest = fields
+                index[url] = (fetched, int(offset), int(length), digest)
+    except FileNotFoundError:
+        pass
+    return index
+
+class ArchiveReader:
+    '''Reads pages from an archive. It can be used as the source of a
+    Scraper, to scrape the archived pages instead of downloading them.
+
+    Params:
+     - path: the archive file
+    '''
+
+    def __init__(self, path):
+        self.path = path
+        self.index = read_index(path)
+        self.lock = threading.Lock()
+        self.archive = open(path, 'rb')
+
+    def __contains__(self, url):
+        return url in self.index
+
+    def fetch(self, url):
+        '''Returns the latest archived page for an URL. Raises DownloadError
+        if the URL is not archived.'''
+        try:
+            _, offset, length, _ = self.index[url]
+        except KeyError:
+            raise DownloadError("Not in the archive: %s" % url)
+        with self.lock:
+            self.archive.seek(offset)
+            record = gzip.decompress(self.archive.read(length))
+        header, _, content = record.partition(b'\r\n\r\n')
+        fields = _parse_header(header)
+        content = content[:int(fields['Content-Length'])]
+        encoding = fields['Content-Type'].partition('charset=')[2] or None
+        return CachedPage(url, content, encoding)
+
+    def close(self):
+        'Closes the archive'
+        self.archive.close()
+
+# The archive read by each process of a pool (see scrape_archived_edition)
+_reader = None  # pylint: disable=invalid-name
+
+def init_worker(path):
+    'Initializes a process of a pool to scrape editions from an archive'
+    global _reader  # pylint: disable=global-statement,invalid-name
+    _reader = ArchiveReader(path)
+
+def scrape_archived_edition(edition, count, parser, profiler=None):
+    '''Scrapes the first 'count' entries of a list edition from the archive
+    of the current process (see init_worker). Returns the list of entries.
+
+    Each edition is scraped with a new Scraper, so the result only depends
+    on the edition. Entries of several editions need to go through a
+    GPUCarryOver, in order, to get the same results as a single scraper.
+    A Profiler, if given, profiles the pages of the edition.
+    '''
+    scraper = Scraper(parser=parser, retain=False, source=_reader)
+    if profiler:
+        profiler.attach(scraper)
+    return list(scraper.iter_entries(edition, edition, count))
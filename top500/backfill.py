@@ -0,0 +1,161 @@
+'''Backfilling of list editions from the rank history of the systems.
+
+The details page of each system has the history of its ranks in all the
+list editions where it was listed. Scraping the details page of every
+system found in a range of editions thus gives all the (year, month, rank)
+listings of those editions, without scraping most of their list pages.
+
+The systems are found in the list pages of a sample of the editions. Any
+ranks of an edition that the histories don't cover then come from its list
+pages, which can reveal more systems. Systems come and go between editions,
+so most list pages have a few ranks that no history covers (the systems that
+were only listed between two editions of the sample): the list pages with
+up to 'max_gaps' of them aren't scraped, and these ranks are left out. The
+listings of the list pages that were scraped take precedence over the
+histories, and are used to cross-check them.
+'''
+
+from top500.scraper import list_pages, ENTRIES_PER_PAGE
+from top500.urlgen import editions, url_for_list
+
+# By default, the list pages of one out of every 4 editions (i.e. one
+# every two years) are scraped
+DEFAULT_SAMPLE_EVERY = 4
+
+# By default, a tenth of the ranks of a list page can be left out instead of
+# scraping it
+DEFAULT_MAX_GAPS = ENTRIES_PER_PAGE // 10
+
+# Fields of the listings that are cross-checked
+CHECKED_FIELDS = ('system_id', 'cores', 'rmax', 'rpeak')
+
+class Backfill:
+    '''Rebuilds the list editions between 'start' and 'end' (date objects),
+    inclusive, from the rank histories of their systems. Only the first
+    'count' entries of each edition are considered.
+
+    Params:
+     - scraper: the Scraper used to scrape the pages
+     - sample_every: the list pages of one out of this many editions are
+       scraped to find the systems and to cross-check their histories. The
+       last edition is always part of the sample.
+     - max_gaps: maximum number of ranks of a list page that no history
+       covers which are left out instead of scraping the page (0 to scrape
+       the list pages of all the ranks not covered)
+    '''
+
+    def __init__(self, scraper, start, end, count=500,
+                 sample_every=DEFAULT_SAMPLE_EVERY, max_gaps=DEFAULT_MAX_GAPS):
+        self.scraper = scraper
+        self.editions = list(editions(start, end))
+        self.count = count
+        self.sample_every = sample_every
+        self.max_gaps = max_gaps
+        # (year, month, rank) -> listing, from the rank histories and from
+        # the list pages
+        self.history = {}
+        self.listed = {}
+        # The systems whose histories have been scraped, and the list pages
+        # scraped, as (edition, page number) tuples
+        self.systems = set()
+        self.pages = set()
+
+    def sample(self):
+        'Returns the editions whose list pages are scraped to start with'
+        return sorted(self.editions[::-self.sample_every])
+
+    def __scrape_pages(self, pages):
+        '''Scrapes some list pages, given as (edition, page number, limit)
+        tuples, and the histories of the new systems found in them'''
+        found = []
+        urls = [url_for_list(edition, pagenum)
+                for edition, pagenum, _ in pages]
+        for i, (edition, pagenum, limit) in enumerate(pages):
+            print("** Page %d of edition %d/%d"
+                  % (pagenum, edition.year, edition.month))
+            if i + 1 < len(urls):
+                self.scraper.prefetch_list_page(urls[i + 1])
+            for listing in self.scraper.list_page_listings(urls[i], limit):
+                self.listed[(listing['year'], listing['month'],
+                             listing['rank'])] = listing
+                if listing['system_id'] not in self.systems:
+                    self.systems.add(listing['system_id'])
+                    found.append(listing['system_id'])
+            self.pages.add((edition, pagenum))
+        print("* Scraping the histories of %d systems" % len(found))
+        wanted = {(edition.year, edition.month) for edition in self.editions}
+        for history in self.scraper.system_histories(found).values():
+            for listing in history:
+                key = (listing['year'], listing['month'], listing['rank'])
+                if key[:2] in wanted and key[2] <= self.count:
+                    self.history.setdefault(key, listing)
+
+    def __uncovered(self):
+        '''Returns the ranks that no listing covers in each list page not
+        scraped yet, as a dictionary of lists of (year, month, rank) tuples
+        by (edition, page number, limit)'''
+        uncovered = {}
+        for edition in self.editions:
+            for pagenum, limit in list_pages(self.count):
+                if (edition, pagenum) in self.pages:
+                    continue
+                first = (pagenum - 1) * ENTRIES_PER_PAGE + 1
+                keys = [(edition.year, edition.month, rank)
+                        for rank in range(first, first + limit)]
+                uncovered[(edition, pagenum, limit)] = [
+                    key for key in keys if key not in self.history]
+        return uncovered
+
+    def __missing_pages(self):
+        '''Returns the list pages (as (edition, page number, limit) tuples)
+        not scraped yet that have more than max_gaps ranks that no listing
+        covers'''
+        return [page for page, keys in self.__uncovered().items()
+                if len(keys) > self.max_gaps]
+
+    def gaps(self):
+        '''Returns the ranks left out, that no listing covers, as sorted
+        (year, month, rank) tuples, once run() has been called'''
+        return sorted(key for keys in self.__uncovered().values()
+                      for key in keys)
+
+    def run(self):
+        '''Scrapes the list pages of the sample and the histories of their
+        systems, and then the list pages with more than max_gaps ranks still
+        missing'''
+        pages = [(edition, pagenum, limit) for edition in self.sample()
+                 for pagenum, limit in list_pages(self.count)]
+        while pages:
+            self.__scrape_pages(pages)
+            pages = self.__missing_pages()
+        total = len(self.editions) * len(list_pages(self.count))
+        print("* Scraped %d of %d list pages and the histories of %d systems"
+              % (len(self.pages), total, len(self.systems)))
+
+    def cross_check(self):
+        '''Compares the listings of the list pages that were scraped with the
+        histories. Returns the differences, as (year, month, rank, field,
+        value in the list page, value in the history) tuples. A history
+        missing a listing is reported with the 'rank' field.'''
+        differences = []
+        for key, listing in sorted(self.listed.items()):
+            history = self.history.get(key)
+            if history is None:
+                differences.append(key + ('rank', listing['rank'], None))
+                continue
+            for field in CHECKED_FIELDS:
+                if listing[field] != history[field]:
+                    differences.append(key + (field, listing[field],
+                                              history[field]))
+        return differences
+
+    def listings(self):
+        '''Returns the listings of all the editions, in (year, month, rank)
+        order, taken from the list pages when they were scraped'''
+        listings = {**self.history, **self.listed}
+        return [listings[key] for key in sorted(listings)]
+
+    def iter_entries(self):
+        '''Generator for the entries of all the editions, in (year, month,
+        rank) order, once run() has been called'''
+        yield from self.scraper.iter_listings(self.listings())
@@ -0,0 +1,249 @@
+'''Persistent on-disk cache for the pages downloaded from the TOP500 site.
+
+Page contents are stored once per distinct content (i.e. they are addressed
+by their SHA-1 digest), and an SQLite index maps each URL to its content and
+to the HTTP validators (ETag, Last-Modified) needed to revalidate it.
+
+How long a cached page is used without asking the server depends on the kind
+of page: the lists of past editions never change, so they never expire. The
+list of the latest edition and the system/site details pages are revalidated
+with a conditional request once their TTL expires.
+'''
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from top500.urlgen import list_edition, InvalidReference, LAST_LIST
+
+# Default maximum size of the stored contents, in bytes
+DEFAULT_CACHE_SIZE = 1024 * 1024 * 1024
+
+# How long (in seconds) a cached page is used without revalidating it.
+# None means that the page never expires.
+PAST_LIST_TTL = None
+LIST_TTL = 24 * 3600
+DETAILS_TTL = 7 * 24 * 3600
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS pages (
+    url TEXT PRIMARY KEY,
+    digest TEXT NOT NULL,
+    encoding TEXT,
+    etag TEXT,
+    last_modified TEXT,
+    fetched REAL NOT NULL,
+    accessed REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS objects (
+    digest TEXT PRIMARY KEY,
+    size INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS pages_accessed ON pages (accessed);
+CREATE INDEX IF NOT EXISTS pages_digest ON pages (digest);
+'''
+
+def ttl_for(url):
+    '''Returns the TTL (in seconds, or None for "forever") for a page URL,
+    depending on the kind of page'''
+    try:
+        edition = list_edition(url)
+    except InvalidReference:
+        # Not a list page: system and site details can change over time
+        return DETAILS_TTL
+    if edition < LAST_LIST:
+        return PAST_LIST_TTL
+    return LIST_TTL
+
+class CachedPage:
+    '''A page served from the cache. It provides the same attributes as the
+    "requests" response objects that the scraper uses.'''
+
+    status_code = 200
+    from_cache = True
+
+    def __init__(self, url, content, encoding):
+        self.url = url
+        self.content = content
+        self.encoding = encoding
+
+    @property
+    def text(self):
+        'The content of the page, decoded'
+        return self.content.decode(self.encoding or 'utf-8', errors='replace')
+
+class ResponseCache:
+    '''Cache of downloaded pages, stored in a directory.
+
+    Params:
+     - directory: where to store the cache. It is created if needed.
+     - max_size: maximum size of the stored contents, in bytes. The least
+       recently used pages are evicted when it is exceeded.
+    '''
+
+    def __init__(self, directory, max_size=DEFAULT_CACHE_SIZE):
+        self.directory = directory
+        self.max_size = max_size
+        os.makedirs(os.path.join(directory, 'objects'), exist_ok=True)
+        # The scraper can fetch pages from several threads
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(os.path.join(directory, 'index.sqlite'),
+                                  check_same_thread=False)
+        self.db.executescript(SCHEMA)
+
+    def __path(self, digest):
+        'Path of the file that stores the content with the given digest'
+        return os.path.join(self.directory, 'objects', digest[:2], digest)
+
+    def __load(self, url, digest, encoding):
+        'Reads a cached page, updating its access time'
+        with open(self.__path(digest), 'rb') as content:
+            page = CachedPage(url, content.read(), encoding)
+        with self.lock, self.db:
+            self.db.execute('UPDATE pages SET accessed = ? WHERE url = ?',
+                            (time.time(), url))
+        return page
+
+    def __lookup(self, url):
+        'Returns the index row for an URL, or None'
+        with self.lock:
+            return self.db.execute(
+                'SELECT digest, encoding, etag, last_modified, fetched '
+                'FROM pages WHERE url = ?', (url,)).fetchone()
+
+    def get(self, url):
+        '''Returns the cached page for an URL if it is still fresh according
+        to its TTL, None otherwise'''
+        row = self.__lookup(url)
+        if not row:
+            return None
+        digest, encoding, _, _, fetched = row
+        ttl = ttl_for(url)
+        try:
+            if ttl is not None and time.time() - fetched > ttl:
+                # Stale pages are revalidated, which needs their content
+                if not os.path.exists(self.__path(digest)):
+                    raise FileNotFoundError(self.__path(digest))
+                return None
+            return self.__load(url, digest, encoding)
+        except FileNotFoundError:
+            # The content was removed: forget the page, so that it is not
+            # revalidated
+            self.__forget(url)
+            return None
+
+    def conditional_headers(self, url):
+        '''Returns the HTTP headers to revalidate a cached (but stale) page, or
+        an empty dictionary if the page is not cached'''
+        row = self.__lookup(url)
+        headers = {}
+        if row:
+            _, _, etag, last_modified, _ = row
+            if etag:
+                headers['If-None-Match'] = etag
+            if last_modified:
+                headers['If-Modified-Since'] = last_modified
+        return headers
+
+    def refresh(self, url, page):
+        '''Marks a cached page as fresh, after the server confirmed that it
+        didn't change with a "304 Not Modified" response (a "requests"
+        response object, whose validators replace the cached ones). Returns
+        the cached page, or None if it was removed from the cache meanwhile
+        (e.g. evicted by another thread).
+        '''
+        with self.lock, self.db:
+            # A 304 response may only send the validators that changed
+            self.db.execute(
+                'UPDATE pages SET fetched = ?, '
+                'etag = COALESCE(?, etag), '
+                'last_modified = COALESCE(?, last_modified) WHERE url = ?',
+                (time.time(), page.headers.get('ETag'),
+                 page.headers.get('Last-Modified'), url))
+        row = self.__lookup(url)
+        if not row:
+            return None
+        digest, encoding, _, _, _ = row
+        try:
+            return self.__load(url, digest, encoding)
+        except FileNotFoundError:
+            self.__forget(url)
+            return None
+
+    def store(self, url, page):
+        'Adds a downloaded page (a "requests" response object) to the cache'
+        content = page.content
+        digest = hashlib.sha1(content).hexdigest()
+        path = self.__path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write to a temporary file first, so that a concurrent reader
+            # never sees partial contents
+            tmp = '%s.%d.%d' % (path, os.getpid(), threading.get_ident())
+            with open(tmp, 'wb') as out:
+                out.write(content)
+            os.replace(tmp, path)
+        now = time.time()
+        with self.lock, self.db:
+            old = self.db.execute('SELECT digest FROM pages WHERE url = ?',
+                                  (url,)).fetchone()
+            self.db.execute('INSERT OR REPLACE INTO objects VALUES (?, ?)',
+                            (digest, len(content)))
+            self.db.execute(
+                'INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (url, digest, page.encoding or page.apparent_encoding,
+                 page.headers.get('ETag'), page.headers.get('Last-Modified'),
+                 now, now))
+            # The previous content of the page may not be used anymore
+            if old and old[0] != digest:
+                self.__release(old[0])
+        self.evict()
+
+    def __release(self, digest):
+        '''Removes a content if no page uses it. Returns its size if removed,
+        None otherwise. Must be called with the lock held, in a transaction.
+        '''
+        if self.db.execute('SELECT 1 FROM pages WHERE digest = ?',
+                           (digest,)).fetchone():
+            return None
+        size = self.db.execute('SELECT size FROM objects WHERE digest = ?',
+                               (digest,)).fetchone()
+        self.db.execute('DELETE FROM objects WHERE digest = ?', (digest,))
+        try:
+            os.remove(self.__path(digest))
+        except FileNotFoundError:
+            pass
+        return size[0] if size else 0
+
+    def __forget(self, url):
+        'Removes a page from the index, and its content if no page uses it'
+        with self.lock, self.db:
+            row = self.db.execute('SELECT digest FROM pages WHERE url = ?',
+                                  (url,)).fetchone()
+            if row:
+                self.db.execute('DELETE FROM pages WHERE url = ?', (url,))
+                self.__release(row[0])
+
+    def size(self):
+        'Returns the total size of the stored contents, in bytes'
+        with self.lock:
+            return self.db.execute(
+                'SELECT COALESCE(SUM(size), 0) FROM objects').fetchone()[0]
+
+    def evict(self):
+        '''Removes the least recently used pages until the stored contents
+        fit in max_size'''
+        excess = self.size() - self.max_size
+        while excess > 0:
+            with self.lock, self.db:
+                row = self.db.execute('SELECT url, digest FROM pages '
+                                      'ORDER BY accessed LIMIT 1').fetchone()
+                if not row:
+                    return
+                url, digest = row
+                self.db.execute('DELETE FROM pages WHERE url = ?', (url,))
+                # The same content could be used by other URLs
+                size = self.__release(digest)
+            if size:
+                excess -= size
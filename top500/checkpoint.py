@@ -0,0 +1,84 @@
+'''Checkpoint journal for long scraping runs.
+
+The journal is a text file with one JSON record per line. A record is added
+each time all the entries of a list page have been written to the output,
+with the size of the output at that point and the total number of entries
+written. A run that is interrupted can then be resumed: the output is
+truncated to the size recorded for the last completed page (dropping any
+entries of a partially scraped page), and the completed pages are skipped.
+'''
+
+import json
+import os
+
+class Journal:
+    '''Journal of the list pages completed in a scraping run.
+
+    Params:
+     - path: the journal file
+     - resume: whether to load the records of a previous run from the file
+       (if it exists) and continue it. Otherwise the journal starts empty.
+    '''
+
+    def __init__(self, path, resume=False):
+        self.path = path
+        self.completed = set()
+        # Size of the output and number of entries written after the last
+        # completed page, if any
+        self.offset = None
+        self.entries = 0
+        if resume and os.path.exists(path):
+            self.__load()
+        self.file = open(path, 'a' if resume else 'w', encoding='utf-8')
+
+    def __load(self):
+        '''Reads the records of a previous run. A record that is incomplete
+        (the run was interrupted while writing it) is removed from the file,
+        so that the records of this run start on a line of their own.'''
+        # Size of the file up to the last complete record
+        size = 0
+        with open(self.path, 'rb') as journal:
+            for line in journal:
+                # Records that aren't complete are the last one, which the
+                # run was interrupted while writing: the page it refers to
+                # is not complete
+                if not line.endswith(b'\n'):
+                    break
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                self.completed.add((record['year'], record['month'],
+                                    record['page']))
+                self.offset = record['offset']
+                self.entries = record['entries']
+                size += len(line)
+        os.truncate(self.path, size)
+
+    def is_completed(self, edition, page):
+        'Checks if a page of a list edition was completed already'
+        return (edition.year, edition.month, page) in self.completed
+
+    def record(self, edition, page, offset, entries):
+        '''Records that a page of a list edition has been completed.
+
+        Params:
+         - edition: a 'date' object for the list edition
+         - page: the page number
+         - offset: the size of the output after writing the page's entries
+         - entries: the total number of entries written so far
+        '''
+        self.completed.add((edition.year, edition.month, page))
+        self.offset = offset
+        self.entries = entries
+        self.file.write(json.dumps({'year': edition.year,
+                                    'month': edition.month,
+                                    'page': page,
+                                    'offset': offset,
+                                    'entries': entries}) + '\n')
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def close(self):
+        'Closes the journal file'
+        self.file.close()
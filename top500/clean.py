@@ -0,0 +1,192 @@
+'''Cleaning of the scraped entries for their analysis, as done by
+analisi/analisi.R to produce data/top500-clean.csv.
+
+Entries are cleaned one at a time, so that they can be cleaned as they are
+scraped (see CleanCSVWriter) or read from an output of the scraper, in
+constant memory. Cleaning an entry:
+ - keeps only the CLEAN_FIELDS that are useful for the analysis
+ - adds the date of its list ('list'), and the number of its edition
+   ('edition', 1 for the first list, of June 1993)
+ - converts rmax and rpeak to GFlop/s: they are in TFlop/s from edition
+   FIRST_TFLOPS_EDITION
+ - merges the names of the same manufacturer and of the versions of the same
+   operating system, and groups operating systems in families ('osfamily')
+ - replaces the "N/A" values of the operating system and the compiler with
+   missing values
+
+Names are merged with lists of rules, applied in order: a (regular
+expression, name) tuple replaces any value that matches the expression with
+the name. The merged and formatted values are memoized (up to MEMO_SIZE of
+each), as they repeat a lot.
+
+Usage (to clean an output of the scraper in CSV format):
+    python3 -m top500.clean RAW CLEAN
+'''
+
+import argparse
+import re
+from datetime import date
+from functools import lru_cache
+from top500.readers import read_csv
+from top500.urlgen import FIRST_LIST, VALID_MONTHS
+from top500.writers import TextWriter, DEFAULT_BATCH_SIZE
+
+# The fields of a cleaned entry, in the order of data/top500-clean.csv
+CLEAN_FIELDS = ('manufacturer', 'cores', 'memory', 'processor',
+                'interconnect', 'rmax', 'rpeak', 'nmax', 'nhalf', 'power',
+                'os', 'compiler', 'math', 'mpi', 'country', 'system_id',
+                'city', 'segment', 'year', 'rank', 'list', 'edition',
+                'osfamily')
+
+# Performance is in TFlop/s instead of GFlop/s from this edition
+FIRST_TFLOPS_EDITION = 25
+
+# Number of results of merge and of the formatting functions memoized
+MEMO_SIZE = 4096
+
+# Fields where "N/A" means a missing value
+NA_FIELDS = ('os', 'compiler')
+
+MANUFACTURER_RULES = (
+    (re.compile('^Cray'), 'Cray'),
+    (re.compile('^Dell', re.IGNORECASE), 'Dell'),
+    (re.compile('^(IBM|Lenovo)'), 'IBM'),
+    (re.compile('^(HP|Hewlett)'), 'HP'),
+    (re.compile('Fujitsu'), 'Fujitsu'),
+    (re.compile('NEC'), 'NEC'),
+    (re.compile('Hitachi'), 'Hitachi'),
+    (re.compile('ClusterVision'), 'ClusterVision'),
+    (re.compile('T-Platforms'), 'T-Platforms'),
+    (re.compile('NSSOL'), 'NSSOL'),
+    (re.compile('SGI|Networx'), 'SGI'),
+    (re.compile('Kendall|KSR'), 'KSR'),
+    (re.compile('Raytheon'), 'Raytheon-Aspen Systems'),
+    (re.compile('supermicro', re.IGNORECASE), 'SuperMicro'),
+    # Several in-house designs of the NRCPC, in China
+    (re.compile('NRCPC|National Research|University'), 'Self-made'),
+)
+
+OS_RULES = (
+    (re.compile('OSF/1'), 'OSF/1'),
+    (re.compile('Windows'), 'Windows'),
+    (re.compile('UNICOS'), 'UNICOS'),
+    (re.compile('Ubuntu'), 'Ubuntu'),
+    (re.compile('bullx', re.IGNORECASE), 'Bullx'),
+    (re.compile('redhat|rhel', re.IGNORECASE), 'Red Hat Enterprise Linux'),
+    (re.compile('suse|SLES', re.IGNORECASE), 'SuSE Linux'),
+)
+
+# Applied to the operating systems once merged by the OS_RULES
+OSFAMILY_RULES = (
+    (re.compile('Linux|Ubuntu|CentOS|Bullx|RaiseOS|TOSS|CNL',
+                re.IGNORECASE), 'Linux'),
+    (re.compile('AIX|IRIX|HP|Unix|CMOST|Solaris|SunOS|MacOS|HI-UX|Ultrix|'
+                'PARIX|Super-UX|UNICOS|ConvexOS|SPP-UX|Tru64|OSF/1|KSR|EWS|'
+                'UXP', re.IGNORECASE), 'Unix'),
+    (re.compile('Cell OS|CRS-OS|NX/2|Paragon'), 'Other'),
+)
+
+def edition_number(year, month):
+    'Returns the number of the edition of a list (1 for the first one)'
+    return ((year - FIRST_LIST.year) * len(VALID_MONTHS)
+            + VALID_MONTHS.index(month) - VALID_MONTHS.index(FIRST_LIST.month)
+            + 1)
+
+@lru_cache(maxsize=MEMO_SIZE)
+def merge(rules, value):
+    'Returns the value merged by a list of rules (None for missing values)'
+    if value is None:
+        return None
+    for pattern, name in rules:
+        if pattern.search(value):
+            value = name
+    return value
+
+def clean_entry(entry):
+    'Returns a cleaned entry, as a dictionary with the CLEAN_FIELDS'
+    clean = {field: entry.get(field) for field in CLEAN_FIELDS}
+    clean['list'] = date(entry['year'], entry['month'], 1)
+    clean['edition'] = edition_number(entry['year'], entry['month'])
+    if clean['edition'] >= FIRST_TFLOPS_EDITION:
+        for field in ('rmax', 'rpeak'):
+            if isinstance(clean[field], float):
+                clean[field] *= 1000
+    clean['manufacturer'] = merge(MANUFACTURER_RULES, clean['manufacturer'])
+    clean['os'] = merge(OS_RULES, clean['os'])
+    for field in NA_FIELDS:
+        if clean[field] == 'N/A':
+            clean[field] = None
+    clean['osfamily'] = merge(OSFAMILY_RULES, clean['os'])
+    return clean
+
+@lru_cache(maxsize=MEMO_SIZE)
+def format_number(number):
+    '''Formats a float like R's write.csv does: with up to 15 significant
+    digits, in scientific notation if that is shorter'''
+    mantissa, _, exponent = ('%.14e' % number).partition('e')
+    mantissa = mantissa.rstrip('0').rstrip('.')
+    exponent = int(exponent)
+    digits = len(mantissa.lstrip('-').replace('.', ''))
+    scientific = '%se%s%02d' % (mantissa, '-' if exponent < 0 else '+',
+                                abs(exponent))
+    fixed = '%.*f' % (max(digits - 1 - exponent, 0), number)
+    return fixed if len(fixed) <= len(scientific) else scientific
+
+@lru_cache(maxsize=MEMO_SIZE)
+def quote(text):
+    'Quotes a string for a CSV file, like R does'
+    return '"%s"' % text.replace('"', '""')
+
+def format_value(value):
+    '''Formats a value of a cleaned entry for data/top500-clean.csv: strings
+    quoted, numbers and dates as they are, and NA for missing values'''
+    if value is None:
+        return 'NA'
+    kind = type(value)
+    if kind is str:
+        return quote(value)
+    if kind is float:
+        return format_number(value)
+    # Integers, and dates in ISO format
+    return str(value)
+
+class CleanCSVWriter(TextWriter):
+    '''Writes the cleaned version of entries in the CSV format of
+    data/top500-clean.csv, with a header unless appending'''
+
+    def __init__(self, outfile, append=False, batch_size=DEFAULT_BATCH_SIZE):
+        super().__init__(outfile, append, batch_size)
+        if not append:
+            self.stream.write(','.join('"%s"' % field
+                                       for field in CLEAN_FIELDS) + '\n')
+
+    def write_batch(self, entries):
+        for entry in entries:
+            clean = clean_entry(entry)
+            self.stream.write(','.join([format_value(clean[field])
+                                        for field in CLEAN_FIELDS]) + '\n')
+
+def clean_file(source, destination):
+    '''Cleans the entries of an output of the scraper in CSV format, and
+    writes them to 'destination'. Returns the number of entries.'''
+    writer = CleanCSVWriter(destination)
+    count = 0
+    for entry in read_csv(source):
+        writer.write(entry)
+        count += 1
+    writer.close()
+    return count
+
+def main():
+    'Cleans an output of the scraper'
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+    parser.add_argument('raw', help="CSV file written by the scraper")
+    parser.add_argument('clean', help="CSV file to write")
+    args = parser.parse_args()
+    count = clean_file(args.raw, args.clean)
+    print("Cleaned %d entries" % count)
+
+if __name__ == '__main__':
+    main()
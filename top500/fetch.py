@@ -0,0 +1,216 @@
+'''Downloading of pages from the TOP500 site.
+
+A Fetcher downloads pages with a timeout, and retries the requests that
+fail because of transient errors (connection problems, timeouts and the
+RETRY_STATUSES), waiting between attempts with an exponential backoff with
+random jitter.
+
+Requests can also go through a RateLimiter: a token bucket that limits the
+number of requests per second. It adapts to the server: when it asks to slow
+down (429 and 503 responses, possibly with a Retry-After header) all the
+requests pause and the rate is halved, and the rate then grows back while
+requests succeed (until there's no limit again, if there was none).
+'''
+
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+import requests
+from requests.adapters import HTTPAdapter
+
+# Seconds to wait for the server to connect and to send data
+DEFAULT_TIMEOUT = 30.0
+
+# Number of times a failed request is retried
+DEFAULT_RETRIES = 5
+
+# The wait before the Nth retry is a random time between 0 and
+# BACKOFF_BASE * 2^N seconds, up to BACKOFF_MAX seconds
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 60.0
+
+# Responses that are worth retrying
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# Responses with which the server asks to slow down
+THROTTLE_STATUSES = (429, 503)
+
+# Requests per second when a rate limiter without a rate (i.e. unlimited) is
+# first asked to slow down, the lowest rate it goes down to, and how much
+# the rate increases after each successful request
+THROTTLED_RATE = 2.0
+MIN_RATE = 0.1
+RATE_INCREASE = 0.05
+
+# Requests per second at which a rate limiter without a rate that was asked
+# to slow down is unlimited again
+UNTHROTTLED_RATE = 10 * THROTTLED_RATE
+
+class DownloadError(Exception):
+    'A problem occurred while fetching a page with "requests.get"'
+    pass
+
+def retry_after(response):
+    '''Returns the seconds to wait according to the Retry-After header of a
+    response, or None if it doesn't have a valid one'''
+    value = response.headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max((when - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+def backoff(attempt):
+    'Returns the seconds to wait before retrying after a failed attempt'
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+class RateLimiter:
+    '''Token bucket limiting the rate of the requests, which can be made
+    from several threads.
+
+    Params:
+     - rate: maximum number of requests per second, or None for no limit
+       (until the server asks to slow down)
+     - burst: number of requests that can be made at once after being
+       idle. Defaults to one second worth of requests.
+     - clock: function that returns the current time, in seconds
+     - sleep: function that waits for some seconds
+    '''
+
+    def __init__(self, rate=None, burst=None, clock=time.monotonic,
+                 sleep=time.sleep):
+        self.max_rate = rate
+        self.rate = rate
+        self.max_burst = burst or max(rate or 1.0, 1.0)
+        self.burst = self.max_burst
+        self.tokens = self.burst
+        self.clock = clock
+        self.sleep = sleep
+        self.updated = clock()
+        # No requests are made until then, after being throttled
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+    def __refill(self, now):
+        'Adds the tokens accumulated since the last update'
+        if self.rate:
+            self.tokens = min(self.burst, self.tokens
+                              + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        'Waits until a request can be made'
+        while True:
+            with self.lock:
+                now = self.clock()
+                self.__refill(now)
+                if now < self.paused_until:
+                    wait = self.paused_until - now
+                elif self.rate is None:
+                    return
+                elif self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                else:
+                    wait = (1 - self.tokens) / self.rate
+            self.sleep(wait)
+
+    def throttle(self, pause=None):
+        '''Slows down after the server asked to: halves the rate, and pauses
+        all the requests for 'pause' seconds if given'''
+        with self.lock:
+            now = self.clock()
+            self.__refill(now)
+            if self.rate is None:
+                self.rate = THROTTLED_RATE
+                self.burst = 1.0
+                self.tokens = self.burst
+            else:
+                self.rate = max(self.rate / 2, MIN_RATE)
+            if pause:
+                self.paused_until = max(self.paused_until, now + pause)
+
+    def succeeded(self):
+        '''Lets the rate grow back towards its maximum after a success. A
+        limiter without a rate is unlimited again once the rate reaches
+        UNTHROTTLED_RATE.'''
+        with self.lock:
+            if self.rate is None or self.rate == self.max_rate:
+                return
+            self.__refill(self.clock())
+            self.rate += RATE_INCREASE
+            if self.max_rate is not None:
+                self.rate = min(self.rate, self.max_rate)
+            elif self.rate >= UNTHROTTLED_RATE:
+                self.rate = None
+                self.burst = self.max_burst
+                self.tokens = self.burst
+
+class Fetcher:
+    '''Downloads pages with a "requests" session, retrying failed requests.
+
+    Params:
+     - jobs: number of threads that download pages at the same time. The
+       connection pool keeps a connection for each of them.
+     - timeout: seconds to wait for the server to connect and to send data
+     - retries: number of times a failed request is retried
+     - rate: maximum number of requests per second (see RateLimiter), or
+       None for no limit
+    '''
+
+    def __init__(self, jobs=1, timeout=DEFAULT_TIMEOUT,
+                 retries=DEFAULT_RETRIES, rate=None):
+        self.timeout = timeout
+        self.retries = retries
+        self.limiter = RateLimiter(rate)
+        self.session = requests.Session()
+        # All the pages are on the same site, so a single pool is used
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(jobs, 1))
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def get(self, url, headers=None):
+        '''Downloads an URL, retrying transient errors, and returns the
+        "requests" response. Raises DownloadError when all the attempts
+        fail.'''
+        attempt = 0
+        while True:
+            self.limiter.acquire()
+            try:
+                page = self.session.get(url, headers=headers,
+                                        timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as error:
+                problem = str(error)
+                wait = backoff(attempt)
+            else:
+                if page.status_code not in RETRY_STATUSES:
+                    self.limiter.succeeded()
+                    return page
+                problem = "error %d" % page.status_code
+                wait = backoff(attempt)
+                if page.status_code in THROTTLE_STATUSES:
+                    pause = retry_after(page)
+                    self.limiter.throttle(pause)
+                    if pause is not None:
+                        wait = max(wait, pause)
+            if attempt >= self.retries:
+                raise DownloadError("Failed to download %s: %s"
+                                    % (url, problem))
+            attempt += 1
+            print("-- Retrying (%d/%d) in %.1fs after %s: %s"
+                  % (attempt, self.retries, wait, problem, url))
+            time.sleep(wait)
+
+    def close(self):
+        'Closes the connections'
+        self.session.close()
@@ -0,0 +1,145 @@
+'''Histories of the systems and sites across the list editions, and
+differences between editions.
+
+A HistoryIndex is built once from the entries of an output of the scraper
+(see top500.readers), and then answers in constant time how a system or a
+site moved across the lists, and which systems entered, left or moved
+between two editions, joining the systems of both editions by their ids.
+
+Example:
+
+    index = HistoryIndex.from_file('csv', 'top500.csv')
+    index.system_history('178764')
+    diff = index.diff(date(2017, 6, 1), date(2017, 11, 1))
+    diff.entered, diff.exited, diff.rank_changes()
+'''
+
+from collections import namedtuple
+from datetime import date
+from operator import attrgetter
+from top500.readers import read_entries
+
+# A listing of a system in an edition (a date object)
+Listing = namedtuple('Listing', ('edition', 'rank', 'rmax', 'rpeak', 'power',
+                                 'system_id', 'site_id'))
+
+# Order of the listings
+ORDER = attrgetter('edition', 'rank')
+
+def listing(entry):
+    'Returns the Listing of an entry'
+    return Listing(date(entry['year'], entry['month'], 1), entry['rank'],
+                   entry['rmax'], entry['rpeak'], entry['power'],
+                   entry['system_id'], entry['site_id'])
+
+def _ratio(new, old):
+    'Returns new / old, or None if either is missing or not a number'
+    if not isinstance(new, (int, float)) or not isinstance(old, (int, float)) \
+       or not old:
+        return None
+    return new / old
+
+class EditionDiff:
+    '''Differences between two editions ('old' and 'new', date objects),
+    given by the listings of each, by system id.
+
+    Attributes:
+     - entered: the listings of the systems in the new edition only
+     - exited: the listings of the systems in the old edition only
+     - stayed: (old listing, new listing) tuples for the systems in both
+    all of them in rank order (of the new edition for 'stayed').
+    '''
+
+    def __init__(self, old, new, before, after):
+        self.old = old
+        self.new = new
+        self.entered = sorted((listing for system_id, listing in after.items()
+                               if system_id not in before), key=ORDER)
+        self.exited = sorted((listing for system_id, listing in before.items()
+                              if system_id not in after), key=ORDER)
+        self.stayed = sorted(((before[system_id], listing)
+                              for system_id, listing in after.items()
+                              if system_id in before),
+                             key=lambda pair: ORDER(pair[1]))
+
+    def rank_changes(self):
+        '''Returns the positions gained by each system that stayed (negative
+        if it went down), by system id'''
+        return {new.system_id: old.rank - new.rank
+                for old, new in self.stayed}
+
+    def rmax_growth(self):
+        '''Returns the ratio between the new and the old rmax of each system
+        that stayed (None if either is missing), by system id'''
+        return {new.system_id: _ratio(new.rmax, old.rmax)
+                for old, new in self.stayed}
+
+    def total_rmax_growth(self):
+        'Returns the ratio between the total rmax of both editions'
+        def total(listings):
+            return sum(listing.rmax for listing in listings
+                       if isinstance(listing.rmax, (int, float)))
+        return _ratio(total([new for _, new in self.stayed] + self.entered),
+                      total([old for old, _ in self.stayed] + self.exited))
+
+class HistoryIndex:
+    '''Index of the listings of the systems and sites, built from entries.
+
+    Params:
+     - entries: an iterable with the entries to index. More can be added
+       later with add().
+    '''
+
+    def __init__(self, entries=()):
+        # system_id or site_id -> listings, in (edition, rank) order
+        self.systems = {}
+        self.sites = {}
+        # edition -> {system_id: listing}
+        self.editions = {}
+        for entry in entries:
+            self.add(entry)
+
+    @classmethod
+    def from_file(cls, fmt, path):
+        'Builds the index of the entries in a file in the given format'
+        return cls(read_entries(fmt, path))
+
+    @staticmethod
+    def __insert(listings, item):
+        'Adds a listing to a list of listings, keeping them in order'
+        listings.append(item)
+        # Entries usually come in order
+        if len(listings) > 1 and ORDER(listings[-2]) > ORDER(item):
+            listings.sort(key=ORDER)
+
+    def add(self, entry):
+        'Adds an entry to the index'
+        item = listing(entry)
+        self.__insert(self.systems.setdefault(item.system_id, []), item)
+        if item.site_id is not None:
+            self.__insert(self.sites.setdefault(item.site_id, []), item)
+        self.editions.setdefault(item.edition, {})[item.system_id] = item
+
+    def system_history(self, system_id):
+        'Returns the listings of a system, in edition order'
+        return self.systems.get(system_id, [])
+
+    def site_history(self, site_id):
+        '''Returns the listings of the systems of a site, in (edition, rank)
+        order'''
+        return self.sites.get(site_id, [])
+
+    def edition(self, edition):
+        'Returns the listings of an edition (a date object), in rank order'
+        return sorted(self.editions.get(edition, {}).values(), key=ORDER)
+
+    def diff(self, old, new):
+        'Returns the EditionDiff between two editions (date objects)'
+        return EditionDiff(old, new, self.editions.get(old, {}),
+                           self.editions.get(new, {}))
+
+    def diffs(self):
+        'Generator for the EditionDiff between each edition and the next'
+        editions = sorted(self.editions)
+        for old, new in zip(editions, editions[1:]):
+            yield self.diff(old, new)
@@ -0,0 +1,329 @@
+'''Lookups of the details of systems and sites by id, for other tools.
+
+A LookupService answers with the details of a system or a site as the
+scraper gets them (see Scraper.system_details and Scraper.site_details):
+from a store of details, if any, or scraped from their details pages. The
+answers are kept in an LRUCache, bounded in number of items, for up to a
+TTL, so that most lookups don't reach the TOP500 site. The details of many
+ids can be looked up at once (see LookupService.lookup_many): the ones that
+aren't cached are scraped concurrently, and each one only once however many
+lookups ask for it at the same time.
+
+The cache can be warmed with the systems and sites of an output of the
+scraper (see LookupService.warm_from_file), which then answer with the
+details of their latest entry.
+
+Lookups can also be served over HTTP, as JSON (see make_server):
+ - GET /system/ID and /site/ID: the details of a system or a site, or a 404
+   error if it can't be found
+ - GET /systems?ids=ID,ID,... and /sites?ids=ID,ID,...: an object with the
+   details of each system or site by id (null if it can't be found)
+ - GET /stats: the number of items, hits and misses of the cache
+Other errors are answered with a 500 error.
+
+Usage (to serve lookups over HTTP):
+    python3 -m top500.lookup [--host HOST] [--port PORT] [--warm OUTPUT] ...
+'''
+
+import argparse
+import json
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+from top500.cache import ResponseCache, DETAILS_TTL, DEFAULT_CACHE_SIZE
+from top500.fetch import Fetcher, DownloadError
+from top500.readers import read_entries, READERS
+from top500.scraper import Scraper, ENTRY_FIELDS, SITE_FIELDS, SYSTEM_FIELDS
+from top500.store import SQLiteStore
+
+# The kinds of items that can be looked up
+KINDS = ('system', 'site')
+
+# Default maximum number of items in the cache of a LookupService
+DEFAULT_MAX_ITEMS = 10000
+
+# Default number of threads that scrape the details of a batch at once
+DEFAULT_JOBS = 4
+
+DEFAULT_HOST = '127.0.0.1'
+# Not the port of benchmarks.server, so that both can run at once
+DEFAULT_PORT = 8550
+
+class LRUCache:
+    '''Cache of a bounded number of items, which expire after a TTL. The
+    least recently used items are evicted when it's full. It can be used
+    from several threads.
+
+    Params:
+     - max_items: maximum number of items
+     - ttl: seconds that an item is kept, or None for "forever"
+     - clock: function that returns the current time, in seconds
+    '''
+
+    def __init__(self, max_items=DEFAULT_MAX_ITEMS, ttl=DETAILS_TTL,
+                 clock=time.monotonic):
+        self.max_items = max_items
+        self.ttl = ttl
+        self.clock = clock
+        self.lock = threading.Lock()
+        # key -> (expiry time or None, value), least recently used first
+        self.items = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.items)
+
+    def get(self, key):
+        'Returns the value of a key, or None if missing or expired'
+        with self.lock:
+            item = self.items.get(key)
+            if item is not None and item[0] is not None \
+               and item[0] <= self.clock():
+                del self.items[key]
+                item = None
+            if item is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.items.move_to_end(key)
+            return item[1]
+
+    def put(self, key, value):
+        'Sets the value of a key, evicting the least recently used if needed'
+        expires = None if self.ttl is None else self.clock() + self.ttl
+        with self.lock:
+            self.items[key] = (expires, value)
+            self.items.move_to_end(key)
+            while len(self.items) > self.max_items:
+                self.items.popitem(last=False)
+
+    def clear(self):
+        'Removes all the items'
+        with self.lock:
+            self.items.clear()
+
+    def stats(self):
+        'Returns the number of items, hits and misses, as a dictionary'
+        with self.lock:
+            return {'items': len(self.items), 'max_items': self.max_items,
+                    'hits': self.hits, 'misses': self.misses}
+
+class LookupService:
+    '''Looks up the details of systems and sites by id (see the module's
+    documentation). Details are returned as dictionaries, which callers are
+    free to modify.
+
+    Params:
+     - scraper: the Scraper that gets the details that aren't cached. By
+       default, one that downloads pages with a connection for each job.
+     - jobs: number of threads that scrape details at the same time
+     - max_items: maximum number of systems and sites in the cache
+     - ttl: seconds that details are cached, or None for "forever"
+    '''
+
+    def __init__(self, scraper=None, jobs=DEFAULT_JOBS,
+                 max_items=DEFAULT_MAX_ITEMS, ttl=DETAILS_TTL):
+        self.scraper = scraper or Scraper(retain=False, fetcher=Fetcher(jobs))
+        self.cache = LRUCache(max_items, ttl)
+        self.executor = ThreadPoolExecutor(max_workers=jobs)
+        self.lock = threading.Lock()
+        # Details being scraped, as futures by (kind, id)
+        self.inflight = {}
+
+    def __scrape(self, kind, item_id):
+        'Scrapes the details of a system or site, and caches them'
+        try:
+            if kind == 'system':
+                details = self.scraper.system_details(item_id)
+            else:
+                details = self.scraper.site_details(item_id)
+            self.cache.put((kind, item_id), details)
+            return details
+        finally:
+            with self.lock:
+                del self.inflight[(kind, item_id)]
+
+    def __future(self, kind, item_id):
+        '''Returns a future for the details of a system or site that aren't
+        cached, scraping them unless they're already being scraped'''
+        if kind not in KINDS:
+            raise ValueError("Unknown kind: %s" % kind)
+        key = (kind, item_id)
+        with self.lock:
+            future = self.inflight.get(key)
+            if future is None:
+                future = self.executor.submit(self.__scrape, kind, item_id)
+                self.inflight[key] = future
+        return future
+
+    def lookup(self, kind, item_id):
+        '''Returns the details of a 'system' or 'site'. Raises DownloadError
+        if it can't be found.'''
+        details = self.cache.get((kind, item_id))
+        if details is None:
+            details = self.__future(kind, item_id).result()
+        return dict(details)
+
+    def lookup_many(self, kind, item_ids):
+        '''Returns the details of some systems or sites, by id, in the order
+        of the ids (None for the ones that can't be found). The ones that
+        aren't cached are scraped concurrently.'''
+        found = {}
+        futures = {}
+        for item_id in item_ids:
+            if item_id in found or item_id in futures:
+                continue
+            details = self.cache.get((kind, item_id))
+            if details is None:
+                futures[item_id] = self.__future(kind, item_id)
+            else:
+                found[item_id] = details
+        for item_id, future in futures.items():
+            try:
+                found[item_id] = future.result()
+            except DownloadError:
+                found[item_id] = None
+        return {item_id: None if found[item_id] is None
+                else dict(found[item_id]) for item_id in item_ids}
+
+    def system(self, system_id):
+        'Returns the details of a system (see lookup)'
+        return self.lookup('system', system_id)
+
+    def site(self, site_id):
+        'Returns the details of a site (see lookup)'
+        return self.lookup('site', site_id)
+
+    def warm(self, entries):
+        '''Caches the details of the systems and sites of some entries, the
+        last ones (usually the latest) replacing the others. Returns the
+        number of entries.'''
+        count = 0
+        for entry in entries:
+            system = dict.fromkeys(ENTRY_FIELDS)
+            for field in SYSTEM_FIELDS.values():
+                system[field] = entry.get(field)
+            self.cache.put(('system', entry['system_id']), system)
+            if entry.get('site_id') is not None:
+                self.cache.put(('site', entry['site_id']),
+                               {field: entry.get(field)
+                                for field in SITE_FIELDS})
+            count += 1
+        return count
+
+    def warm_from_file(self, fmt, path):
+        '''Caches the details of the systems and sites of an output of the
+        scraper in the given format (see warm)'''
+        return self.warm(read_entries(fmt, path))
+
+    def close(self):
+        'Waits for the scraping in progress, and releases the connections'
+        self.executor.shutdown()
+        self.scraper.close()
+        self.scraper.fetcher.close()
+        self.scraper.store.close()
+
+class LookupHandler(BaseHTTPRequestHandler):
+    '''Handles the HTTP requests for lookups (see the module's
+    documentation), with the LookupService of the server'''
+
+    def __reply(self, status, body):
+        'Sends a JSON response'
+        content = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        'Answers a lookup'
+        service = self.server.service
+        url = urlsplit(self.path)
+        parts = url.path.strip('/').split('/')
+        try:
+            if len(parts) == 2 and parts[0] in KINDS:
+                self.__reply(200, service.lookup(parts[0], parts[1]))
+            elif len(parts) == 1 and parts[0][:-1] in KINDS \
+                 and parts[0].endswith('s'):
+                ids = [item_id
+                       for value in parse_qs(url.query).get('ids', [])
+                       for item_id in value.split(',') if item_id]
+                self.__reply(200, service.lookup_many(parts[0][:-1], ids))
+            elif parts == ['stats']:
+                self.__reply(200, service.cache.stats())
+            else:
+                self.__reply(404, {'error': "Unknown path: %s" % url.path})
+        except DownloadError as error:
+            self.__reply(404, {'error': str(error)})
+        except ValueError as error:
+            # Ids that aren't numbers
+            self.__reply(400, {'error': str(error)})
+        except Exception as error:  # pylint: disable=broad-except
+            # e.g. a page that can't be scraped. The server goes on.
+            self.log_error("Lookup of %s failed: %r", self.path, error)
+            self.__reply(500, {'error': "%s: %s" % (type(error).__name__,
+                                                    error)})
+
+def make_server(service, host=DEFAULT_HOST, port=DEFAULT_PORT):
+    '''Returns an HTTP server for the lookups of a LookupService, handling
+    each request in a thread. Call its serve_forever() method to run it.'''
+    server = ThreadingHTTPServer((host, port), LookupHandler)
+    server.service = service
+    return server
+
+def main():
+    'Serves lookups of systems and sites over HTTP'
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+    parser.add_argument('--host', default=DEFAULT_HOST,
+                        help="Address to listen on")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT,
+                        help="Port to listen on")
+    parser.add_argument('-j', '--jobs', type=int, default=DEFAULT_JOBS,
+                        help="Number of details pages to download at once")
+    parser.add_argument('--max-items', type=int, default=DEFAULT_MAX_ITEMS,
+                        metavar='ITEMS',
+                        help="Maximum number of systems and sites cached")
+    parser.add_argument('--ttl', type=int, default=DETAILS_TTL,
+                        metavar='SECONDS',
+                        help="Seconds that the details are cached")
+    parser.add_argument('--cache', metavar='DIR',
+                        help="Cache the downloaded pages in DIR (see "
+                        "the scraper's --cache)")
+    parser.add_argument('--store', metavar='FILE',
+                        help="Look up details in an SQLite store of details "
+                        "(see the scraper's --store) before scraping them")
+    parser.add_argument('--warm', metavar='OUTPUT',
+                        help="Warm the cache with the systems and sites of "
+                        "an output of the scraper")
+    parser.add_argument('-o', '--format', default='csv', choices=READERS,
+                        help="Format of the output given with --warm")
+    args = parser.parse_args()
+    cache = None
+    if args.cache:
+        cache = ResponseCache(args.cache, DEFAULT_CACHE_SIZE)
+    store = SQLiteStore(args.store) if args.store else None
+    scraper = Scraper(retain=False, cache=cache, store=store,
+                      fetcher=Fetcher(args.jobs))
+    service = LookupService(scraper, args.jobs, args.max_items, args.ttl)
+    if args.warm:
+        count = service.warm_from_file(args.format, args.warm)
+        print("Warmed the cache with %d entries" % count)
+    server = make_server(service, args.host, args.port)
+    print("Serving lookups on http://%s:%d/" % (args.host, args.port))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+
+if __name__ == '__main__':
+    main()
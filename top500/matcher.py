@@ -0,0 +1,105 @@
+'''Fuzzy matching of system components in the TOP500 listings.
+
+The text of a system in a list page mixes its name with some of its
+components (processor, interconnect, GPU). The processor and interconnect
+are known from the system's details page, but they are not written exactly
+the same way in both places, so they are detected with difflib's
+SequenceMatcher allowing "close enough" matches.
+
+The same strings show up again and again (the same system in several
+editions, the same processor in many systems), so the matcher keeps:
+ - an index of the known components, each with a SequenceMatcher that has
+   already analysed it (difflib caches the analysis of its second sequence)
+ - the results of comparing each part with each component, and the name/GPU
+   split of each system's text: up to 'memo_size' of each, the least
+   recently used being evicted so that memory stays bounded
+Before computing a full ratio, the cheaper upper bounds real_quick_ratio()
+and quick_ratio() are used to discard parts that can't match. All of this
+gives exactly the same results as computing every ratio.
+'''
+
+from difflib import SequenceMatcher
+from functools import lru_cache
+
+# The minimum ratio for difflib's SequenceMatcher to accept two strings
+# as equal. This is the default ratio of a ComponentMatcher, which removes
+# the known components (processor, interconnect) from the text of a system
+SM_RATIO = 0.79
+
+# Default number of comparisons and of splits memoized by a ComponentMatcher.
+# A whole scrape of the lists has a few tens of thousands of different ones.
+MEMO_SIZE = 65536
+
+class ComponentMatcher:
+    '''Detects known components (processor, interconnect) within the
+    text of a system in a list page.
+
+    Params:
+     - ratio: the minimum SequenceMatcher ratio to consider that two
+       strings are the same component
+     - memo_size: maximum number of results of could_be and of split
+       memoized (see their cache_info())
+    '''
+
+    def __init__(self, ratio=SM_RATIO, memo_size=MEMO_SIZE):
+        self.ratio = ratio
+        # Known component -> SequenceMatcher with the component as 2nd seq.
+        self.index = {}
+        self.could_be = lru_cache(maxsize=memo_size)(self.__could_be)
+        self.split = lru_cache(maxsize=memo_size)(self.__split)
+
+    def __matcher(self, component):
+        'Returns the SequenceMatcher prepared for a known component'
+        try:
+            return self.index[component]
+        except KeyError:
+            matcher = SequenceMatcher(None, b=component)
+            self.index[component] = matcher
+            return matcher
+
+    def __could_be(self, part, component):
+        '''Checks if a part of a system's text could be the given component,
+        i.e. if their SequenceMatcher ratio is above the configured one'''
+        if part == component:
+            return True
+        matcher = self.__matcher(component)
+        matcher.set_seq1(part)
+        # Each of these is an upper bound of the next one
+        return (matcher.real_quick_ratio() > self.ratio and
+                matcher.quick_ratio() > self.ratio and
+                matcher.ratio() > self.ratio)
+
+    def remove_known(self, parts, components):
+        '''Removes from a list of parts those that could be any of the
+        given (known) components.
+
+        For example, system 177556 has these parts in its listing name:
+        ['Sequoia-BlueGene/Q', 'Power BQC 16C 1.60 GHz', 'Custom']
+
+        In its details page, though, the interconnect is 'Custom
+        Interconnect', and the processor is 'Power BQC 16C 1.6GHz'
+        '''
+        toremove = []
+        for part in parts:
+            for component in components:
+                if component and self.could_be(part, component):
+                    if not part in toremove:
+                        toremove.append(part)
+        for part in toremove:
+            parts.remove(part)
+
+    def __split(self, system_id, text, processor, interconnect):
+        '''Splits the text of a system in a list page into its name and GPU,
+        after removing its known processor and interconnect.
+
+        The first remaining comma-separated part is assumed to be the name,
+        and any other remaining content the GPU/co-processor.
+
+        Returns a (name, gpu) tuple. Either of them is None if there's no
+        content left for it.
+        '''
+        parts = [x.strip() for x in text.split(',')]
+        self.remove_known(parts, (processor, interconnect))
+        name = parts.pop(0) if parts else None
+        gpu = ', '.join(parts) if parts else None
+        return name, gpu
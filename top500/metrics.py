@@ -0,0 +1,169 @@
+'''Metrics of a scraping run, collected through the scraper's hooks.
+
+Metrics can be exported in JSON or in the Prometheus text format:
+ - top500_fetch_seconds: histogram of the time to get each page, by kind
+   of page (list, system, site) and source (network, cache, archive)
+ - top500_fetch_bytes_total: size of the pages obtained, by kind and source
+ - top500_parse_seconds: histogram of the time to parse each page, by kind
+ - top500_match_seconds: histogram of the time of the fuzzy matching of the
+   components of each listed system
+ - top500_lookups_total: lookups of system and site details, by kind and
+   where they were found (memory, store) or if they had to be scraped
+ - top500_entries_total: number of entries scraped
+ - top500_entries_per_second: entries scraped per second of the run
+'''
+
+import json
+import threading
+import time
+
+# Upper bounds of the buckets of the histograms, in seconds
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+           1.0, 2.5, 5.0, 10.0, float('inf'))
+
+FORMATS = ('json', 'prometheus')
+
+class Histogram:
+    'Cumulative histogram of observed values, with fixed buckets'
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        'Adds a value to the histogram'
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+    def to_dict(self):
+        'Returns the histogram as a dictionary'
+        return {'count': self.count, 'sum': self.sum,
+                'buckets': {('+Inf' if bound == float('inf') else str(bound)):
+                            count for bound, count
+                            in zip(self.buckets, self.counts)}}
+
+def _series(name, labels):
+    '''Formats the name of a series and its labels (a tuple of (name, value)
+    tuples) for Prometheus'''
+    if not labels:
+        return name
+    return '%s{%s}' % (name, ','.join('%s="%s"' % label for label in labels))
+
+class Metrics:
+    '''Collects the metrics of a scraping run. Use attach() to collect them
+    from a Scraper. Hooks can be called from several threads.'''
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.start = time.time()
+        # (name, labels) -> Histogram, where labels is a tuple of tuples
+        self.histograms = {}
+        # (name, labels) -> value
+        self.counters = {}
+
+    def observe(self, name, value, **labels):
+        'Adds a value to a histogram'
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            try:
+                histogram = self.histograms[key]
+            except KeyError:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def inc(self, name, value=1, **labels):
+        'Increments a counter'
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def on_fetch(self, url, kind, source, seconds, size):
+        'Hook for each page obtained by the scraper'
+        self.observe('top500_fetch_seconds', seconds, kind=kind, source=source)
+        self.inc('top500_fetch_bytes_total', size, kind=kind, source=source)
+
+    def on_parse(self, kind, seconds):
+        'Hook for each page parsed by the scraper'
+        self.observe('top500_parse_seconds', seconds, kind=kind)
+
+    def on_match(self, seconds):
+        'Hook for the matching of the components of each listed system'
+        self.observe('top500_match_seconds', seconds)
+
+    def on_lookup(self, kind, found):
+        'Hook for each lookup of the details of a system or site'
+        self.inc('top500_lookups_total', kind=kind, found=found)
+
+    def on_entry(self, entry):
+        'Hook for each list entry scraped'
+        self.inc('top500_entries_total')
+
+    def attach(self, scraper):
+        'Collects the metrics of a Scraper, adding hooks to it'
+        scraper.add_hook('fetch', self.on_fetch)
+        scraper.add_hook('parse', self.on_parse)
+        scraper.add_hook('match', self.on_match)
+        scraper.add_hook('lookup', self.on_lookup)
+        scraper.add_hook('entry', self.on_entry)
+
+    def entries_per_second(self):
+        'Returns the number of entries scraped per second since the start'
+        entries = self.counters.get(('top500_entries_total', ()), 0)
+        return entries / max(time.time() - self.start, 1e-9)
+
+    def to_json(self):
+        'Returns the metrics in JSON format'
+        with self.lock:
+            metrics = {
+                'elapsed_seconds': time.time() - self.start,
+                'entries_per_second': self.entries_per_second(),
+                'counters': [dict(labels, name=name, value=value)
+                             for (name, labels), value
+                             in sorted(self.counters.items())],
+                'histograms': [dict(labels, name=name, **histogram.to_dict())
+                               for (name, labels), histogram
+                               in sorted(self.histograms.items())],
+            }
+        return json.dumps(metrics, indent=2)
+
+    def to_prometheus(self):
+        'Returns the metrics in the Prometheus text exposition format'
+        lines = []
+        with self.lock:
+            for name in sorted({name for name, _ in self.counters}):
+                lines.append('# TYPE %s counter' % name)
+                for (counter, labels), value in sorted(self.counters.items()):
+                    if counter == name:
+                        lines.append('%s %s' % (_series(name, labels), value))
+            for name in sorted({name for name, _ in self.histograms}):
+                lines.append('# TYPE %s histogram' % name)
+                for (histogram, labels), values \
+                        in sorted(self.histograms.items()):
+                    if histogram != name:
+                        continue
+                    for bound, count in zip(values.buckets, values.counts):
+                        bound = '+Inf' if bound == float('inf') else bound
+                        lines.append('%s %d' % (
+                            _series(name + '_bucket',
+                                    labels + (('le', bound),)), count))
+                    lines.append('%s %s' % (_series(name + '_sum', labels),
+                                            values.sum))
+                    lines.append('%s %d' % (_series(name + '_count', labels),
+                                            values.count))
+            lines.append('# TYPE top500_entries_per_second gauge')
+            lines.append('top500_entries_per_second %s'
+                         % self.entries_per_second())
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path, fmt='json'):
+        'Writes the metrics to a file, in one of the FORMATS'
+        with open(path, 'w', encoding='utf-8') as output:
+            if fmt == 'prometheus':
+                output.write(self.to_prometheus())
+            else:
+                output.write(self.to_json() + '\n')
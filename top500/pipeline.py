@@ -0,0 +1,196 @@
+'''Pipeline to scrape several list editions at once, using several cores.
+
+Editions go through three stages, which run at the same time:
+ - fetch: a thread downloads all the pages of an edition (its list pages,
+   and the details pages of the systems and sites linked from them), with
+   several threads for the details pages
+ - parse: a pool of processes scrapes the entries of each edition from its
+   pages, as if they were an archive (see scrape_fetched_edition)
+ - write: the entries of each edition are passed on in edition order, as
+   soon as the edition and all the previous ones are parsed
+
+Memory is bounded by backpressure: the fetch stage waits while 'depth'
+editions are fetched and not yet parsed. Details pages of the systems and
+sites of recent editions are kept (up to PAGES_KEPT) so that they are not
+downloaded again for the next editions, where most of them are listed too.
+'''
+
+import multiprocessing
+import queue
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from top500 import urlgen
+from top500.cache import CachedPage
+from top500.scraper import Scraper, DownloadError, _fetch, list_pages
+from top500.urlgen import url_for_list, url_for_site, url_for_system
+
+# Details pages kept by the fetch stage for the next editions
+PAGES_KEPT = 2000
+
+class FetchedPages:
+    '''The pages fetched for an edition, by URL. It can be used as the
+    source of a Scraper, to scrape them.
+
+    Params:
+     - pages: dictionary with the (content, encoding) of each page by URL
+    '''
+
+    def __init__(self, pages):
+        self.pages = pages
+
+    def __contains__(self, url):
+        return url in self.pages
+
+    def fetch(self, url):
+        '''Returns the page for an URL. Raises DownloadError if it wasn't
+        fetched.'''
+        try:
+            content, encoding = self.pages[url]
+        except KeyError:
+            raise DownloadError("Not fetched: %s" % url)
+        return CachedPage(url, content, encoding)
+
+def init_worker(base_url):
+    'Initializes a process of the parse stage to scrape pages of a site'
+    urlgen.BASE_URL = base_url
+
+def scrape_fetched_edition(edition, pages, count, parser):
+    '''Scrapes the first 'count' entries of a list edition from its pages (a
+    FetchedPages object). Returns the list of entries.
+
+    Like scrape_archived_edition, each edition is scraped with a new Scraper,
+    and entries of several editions need to go through a GPUCarryOver, in
+    order, to get the same results as a single scraper.
+    '''
+    scraper = Scraper(parser=parser, retain=False, source=pages)
+    return list(scraper.iter_entries(edition, edition, count))
+
+class Pipeline:
+    '''Scrapes list editions with a fetch stage, a parse stage in a pool of
+    processes, and a write stage (see the module's documentation).
+
+    Params:
+     - fetcher: the Fetcher used to download the pages
+     - jobs: number of threads that download details pages at the same time
+     - processes: number of processes that parse the pages
+     - parser: how to parse the pages (one of PARSERS)
+     - cache: a ResponseCache, if any
+     - archive: an ArchiveWriter to add the downloaded pages to, if any
+     - depth: number of fetched editions waiting to be parsed. Defaults to
+       the number of processes.
+    '''
+
+    # pylint: disable=too-many-arguments
+    def __init__(self, fetcher, jobs=1, processes=1, parser='html.parser',
+                 cache=None, archive=None, depth=None):
+        self.fetcher = fetcher
+        self.jobs = jobs
+        self.processes = processes
+        self.parser = parser
+        self.cache = cache
+        self.archive = archive
+        self.depth = depth or processes
+        # URL -> (content, encoding) of recently fetched details pages
+        self.kept = OrderedDict()
+
+    def __download(self, url):
+        'Downloads a page, returning its (content, encoding)'
+        page = _fetch(url, self.fetcher, self.cache)
+        if self.archive:
+            self.archive.add(url, page)
+        return page.content, page.encoding
+
+    def __details(self, url):
+        '''Returns the (content, encoding) of a details page, downloading it
+        unless it was kept from a previous edition'''
+        page = self.kept.get(url)
+        if page is None:
+            page = self.__download(url)
+        return page
+
+    def fetch_edition(self, edition, count, executor):
+        '''Downloads the pages needed to scrape the first 'count' entries of
+        an edition. Returns them as a FetchedPages object.'''
+        pages = {}
+        details = []
+        # The details pages are found in the list pages like the parse stage
+        # will find them
+        scraper = Scraper(parser=self.parser, retain=False,
+                          source=FetchedPages(pages), fetcher=self.fetcher)
+        for pagenum, limit in list_pages(count):
+            url = url_for_list(edition, pagenum)
+            pages[url] = self.__download(url)
+            for listing in scraper.list_page_listings(url, limit):
+                details.append(url_for_system(listing['system_id']))
+                if listing['site_id'] is not None:
+                    details.append(url_for_site(listing['site_id']))
+        details = list(OrderedDict.fromkeys(details))
+        for url, page in zip(details, executor.map(self.__details, details)):
+            pages[url] = page
+            self.kept[url] = page
+            self.kept.move_to_end(url)
+        while len(self.kept) > PAGES_KEPT:
+            self.kept.popitem(last=False)
+        return FetchedPages(pages)
+
+    def __fetch_all(self, selected, count, fetched, stop):
+        '''Fetch stage: puts the (edition, pages) of each edition in the
+        'fetched' queue, and None at the end. Errors are put in the queue
+        too, to be raised by the write stage.'''
+        try:
+            with ThreadPoolExecutor(max_workers=self.jobs) as executor:
+                for edition in selected:
+                    if stop.is_set():
+                        return
+                    print("* Fetching TOP500 list edition: %d/%d"
+                          % (edition.year, edition.month))
+                    fetched.put((edition,
+                                 self.fetch_edition(edition, count, executor)))
+            fetched.put(None)
+        except Exception as error:  # pylint: disable=broad-except
+            fetched.put(error)
+
+    def run(self, selected, count):
+        '''Generator for the (edition, entries) of the first 'count' entries
+        of some editions, in order'''
+        fetched = queue.Queue(maxsize=self.depth)
+        stop = threading.Event()
+        fetch_stage = threading.Thread(target=self.__fetch_all, daemon=True,
+                                       args=(selected, count, fetched, stop))
+        # Worker processes are spawned rather than forked, as the fetch stage
+        # runs in a thread, and they look for the pages at the same site
+        pool = ProcessPoolExecutor(
+            self.processes, mp_context=multiprocessing.get_context('spawn'),
+            initializer=init_worker, initargs=(urlgen.BASE_URL,))
+        fetch_stage.start()
+        parsing = deque()
+        done = False
+        try:
+            while True:
+                # Keep the pool busy, without getting ahead of the write
+                # stage by more editions than processes
+                while not done and len(parsing) < self.processes:
+                    item = fetched.get()
+                    if isinstance(item, Exception):
+                        raise item
+                    if item is None:
+                        done = True
+                        break
+                    edition, pages = item
+                    parsing.append((edition, pool.submit(
+                        scrape_fetched_edition, edition, pages, count,
+                        self.parser)))
+                if not parsing:
+                    break
+                edition, future = parsing.popleft()
+                yield edition, future.result()
+        finally:
+            stop.set()
+            # Unblock the fetch stage if it is waiting for room in the queue
+            while fetch_stage.is_alive():
+                try:
+                    fetched.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+            pool.shutdown(cancel_futures=True)
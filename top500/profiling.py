@@ -0,0 +1,167 @@
+'''Profiling of a scraping run, by kind of page.
+
+A Profiler hooks into the scraper's enter and leave events to find out
+which kind of page ('list', 'system' or 'site') the scraper is working on,
+and keeps a separate deterministic profile (cProfile) for each kind, and
+for the rest of the run ('other'). The work on a list page includes
+building the entries of its listings. Time spent on a page within another
+(e.g. the details page of a system while building an entry) counts for the
+inner page only.
+
+Allocations are traced with tracemalloc: for the first TRACED_PAGES pages
+of each kind, and the first TRACED_PAGES entries of the list pages, the
+memory allocated while working on them (including any pages within them),
+by line of code, is compared with the memory allocated before, and the
+differences added up.
+
+The report has, for each kind of page and for the whole run, the functions
+sorted by their own time, and the lines that allocated the most memory.
+
+The scraper's hooks are called by the thread working on each page, so
+profiles are only accurate when the pages are scraped one at a time, i.e.
+with a single job.
+'''
+
+import cProfile
+import io
+import pstats
+import time
+import tracemalloc
+from collections import Counter
+
+PAGE_KINDS = ('list', 'system', 'site')
+
+# The kind of work done outside of any page
+OTHER = 'other'
+
+# Pages of each kind (and entries of list pages) whose allocations are traced
+TRACED_PAGES = 5
+
+# Lines of each part of the report
+REPORT_LINES = 25
+
+# Allocations of tracemalloc itself (e.g. snapshots of the outer pages) are
+# left out
+SNAPSHOT_FILTERS = (tracemalloc.Filter(False, tracemalloc.__file__),)
+
+def _snapshot():
+    'Takes a snapshot of the allocations'
+    return tracemalloc.take_snapshot().filter_traces(SNAPSHOT_FILTERS)
+
+class Profiler:
+    '''Profiles a scraping run, by kind of page.
+
+    Params:
+     - traced_pages: number of pages of each kind whose allocations are
+       traced
+    '''
+
+    def __init__(self, traced_pages=TRACED_PAGES):
+        self.traced_pages = traced_pages
+        self.profiles = {kind: cProfile.Profile()
+                         for kind in PAGE_KINDS + (OTHER,)}
+        # The kinds of the pages being worked on, innermost last, with the
+        # time and the allocations snapshot (if traced) when they started
+        self.stack = []
+        # Pages and entries (see the scraper's enter event) worked on
+        self.pages = Counter()
+        self.entries = Counter()
+        self.seconds = Counter()
+        # Memory allocated by line of code (filename, lineno), by kind
+        self.allocations = {kind: Counter() for kind in PAGE_KINDS}
+        self.started = None
+
+    def attach(self, scraper):
+        'Profiles the pages of a Scraper, adding hooks to it'
+        scraper.add_hook('enter', self.enter)
+        scraper.add_hook('leave', self.leave)
+
+    def start(self):
+        'Starts profiling the run'
+        tracemalloc.start()
+        self.started = time.perf_counter()
+        self.profiles[OTHER].enable()
+
+    def stop(self):
+        'Stops profiling the run'
+        self.profiles[self.__current()].disable()
+        self.seconds[OTHER] = time.perf_counter() - self.started \
+            - sum(self.seconds[kind] for kind in PAGE_KINDS)
+        tracemalloc.stop()
+
+    def __current(self):
+        'The kind of page being worked on'
+        return self.stack[-1][0] if self.stack else OTHER
+
+    def enter(self, kind, part):
+        'Called when the scraper starts working on a page or entry'
+        self.profiles[self.__current()].disable()
+        counter = self.pages if part == 'page' else self.entries
+        counter[kind] += 1
+        snapshot = None
+        if counter[kind] <= self.traced_pages:
+            snapshot = _snapshot()
+        self.stack.append((kind, time.perf_counter(), snapshot))
+        self.profiles[kind].enable()
+
+    def leave(self, kind, part):  # pylint: disable=unused-argument
+        'Called when the scraper finishes working on a page or entry'
+        self.profiles[kind].disable()
+        _, start, before = self.stack.pop()
+        elapsed = time.perf_counter() - start
+        self.seconds[kind] += elapsed
+        if self.stack:
+            # Time spent on this page doesn't count for the outer one
+            outer = self.stack[-1]
+            self.stack[-1] = (outer[0], outer[1] + elapsed, outer[2])
+        if before is not None:
+            after = _snapshot()
+            for stat in after.compare_to(before, 'lineno'):
+                if stat.size_diff > 0:
+                    frame = stat.traceback[0]
+                    self.allocations[kind][(frame.filename, frame.lineno)] \
+                        += stat.size_diff
+        self.profiles[self.__current()].enable()
+
+    def __functions(self, kinds, stream):
+        'Writes the functions of the profiles of some kinds, by own time'
+        stats = pstats.Stats(*(self.profiles[kind] for kind in kinds),
+                             stream=stream)
+        stats.sort_stats('tottime').print_stats(REPORT_LINES)
+
+    @staticmethod
+    def __allocations(allocations, traced, stream):
+        '''Writes the lines of code that allocated the most memory while
+        working on some pages and entries ('traced', as text)'''
+        stream.write("Memory allocated while working on %s: %.1f KiB\n"
+                     % (traced, sum(allocations.values()) / 1024))
+        for (filename, lineno), size in allocations.most_common(REPORT_LINES):
+            stream.write("%10.1f KiB  %s:%d\n" % (size / 1024, filename,
+                                                  lineno))
+        stream.write('\n')
+
+    def report(self):
+        'Returns the report, as text'
+        stream = io.StringIO()
+        for kind in PAGE_KINDS + (OTHER,):
+            counts = ''
+            traced = "%d pages" % min(self.pages[kind], self.traced_pages)
+            if kind != OTHER:
+                counts = ", %d pages" % self.pages[kind]
+            if self.entries[kind]:
+                counts += ", %d entries" % self.entries[kind]
+                traced += " and %d entries" % min(self.entries[kind],
+                                                  self.traced_pages)
+            stream.write("=== %s: %.3fs%s\n\n" % (kind, self.seconds[kind],
+                                                  counts))
+            self.__functions([kind], stream)
+            if kind != OTHER:
+                self.__allocations(self.allocations[kind], traced, stream)
+        stream.write("=== all\n\n")
+        self.__functions(PAGE_KINDS + (OTHER,), stream)
+        return stream.getvalue()
+
+    def write(self, path):
+        'Writes the report to a file'
+        with open(path, 'w', encoding='utf-8') as output:
+            output.write(self.report())
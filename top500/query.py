@@ -0,0 +1,394 @@
+'''Columnar in-memory queries over a TOP500 dataset, using NumPy.
+
+A Dataset keeps each column as a NumPy array: numeric columns as integers,
+or as floats with NaN for the missing values, and text columns dictionary
+encoded (see Categorical). Filters, group-bys and aggregates work on whole
+columns at once, so that the aggregates by edition behind the plots of the
+analysis (see analisi/analisi.R) take milliseconds.
+
+The dataset is loaded from a CSV file (e.g. data/top500-clean.csv, or the
+output of the scraper) and kept in memory. load() also saves a snapshot of
+it next to the CSV file (see top500.snapshot), and maps that into memory
+instead while the CSV file doesn't change.
+
+Example:
+
+    top500 = load('data/top500-clean.csv')
+    spain = top500.where(country='Spain', rank=range(1, 11))
+    top500.group_by('edition', 'segment').aggregate(
+        systems='count', rmax=('sum', 'rmax'))
+
+NumPy needs to be installed to use this module.
+'''
+
+import csv
+import os
+from top500.snapshot import read_snapshot, write_snapshot
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Values of a CSV file that mean that the value is missing
+NA_VALUES = ('', 'NA')
+
+# Columns that are always text, even if their values look like numbers
+TEXT_COLUMNS = ('system_id', 'site_id')
+
+# Suffix of the snapshot of a CSV file (see load)
+SNAPSHOT_SUFFIX = '.snap'
+
+# Aggregate functions of a GroupBy
+AGGREGATES = ('count', 'sum', 'mean', 'min', 'max')
+
+def _require_numpy():
+    'Checks that NumPy is available'
+    if numpy is None:
+        raise RuntimeError("The numpy module is needed for queries")
+
+class Categorical:
+    '''A dictionary-encoded text column: an array of integer codes, which
+    are indexes in the list of its distinct values (its categories). Missing
+    values have the code -1.
+
+    Params:
+     - codes: the array of codes
+     - categories: the sequence of distinct values
+     - index: the dictionary with the code of each value, if known
+    '''
+
+    def __init__(self, codes, categories, index=None):
+        self.codes = codes
+        self.categories = categories
+        self.__index = index
+
+    @property
+    def index(self):
+        'Dictionary with the code of each value, built when first needed'
+        if self.__index is None:
+            self.__index = {value: code
+                            for code, value in enumerate(self.categories)}
+        return self.__index
+
+    @classmethod
+    def from_values(cls, values):
+        '''Encodes a sequence of values (strings, or None for the missing
+        ones). Categories are sorted.'''
+        categories = sorted({value for value in values if value is not None})
+        index = {value: code for code, value in enumerate(categories)}
+        codes = numpy.fromiter((-1 if value is None else index[value]
+                                for value in values),
+                               dtype=numpy.int32, count=len(values))
+        return cls(codes, categories, index)
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, selection):
+        'Selects some rows (e.g. with a mask), keeping the same categories'
+        return Categorical(self.codes[selection], self.categories,
+                           self.__index)
+
+    def equals(self, value):
+        'Returns the mask of the rows with a value'
+        code = self.index.get(value)
+        if code is None:
+            return numpy.zeros(len(self.codes), dtype=bool)
+        return self.codes == code
+
+    def isin(self, values):
+        'Returns the mask of the rows with any of some values'
+        codes = [self.index[value] for value in values if value in self.index]
+        return numpy.isin(self.codes, codes)
+
+    def decode(self):
+        'Returns the values, as an array of objects (None for missing ones)'
+        lookup = numpy.array(list(self.categories) + [None], dtype=object)
+        return lookup[self.codes]
+
+def _parse_column(name, texts):
+    '''Builds a column from its texts in a CSV file: an integer or float
+    array if all its values are numbers, a Categorical otherwise'''
+    values = [None if text in NA_VALUES else text for text in texts]
+    if name not in TEXT_COLUMNS:
+        try:
+            numbers = numpy.array([numpy.nan if value is None else float(value)
+                                   for value in values], dtype=numpy.float64)
+        except ValueError:
+            pass
+        else:
+            if not numpy.isnan(numbers).any() and \
+               numpy.array_equal(numbers, numpy.floor(numbers)):
+                return numbers.astype(numpy.int64)
+            return numbers
+    return Categorical.from_values(values)
+
+def _mask(column, condition):
+    '''Returns the mask of the rows of a column that meet a condition: a
+    value, a collection of values (list, tuple, set or range) or a function
+    that returns a mask for the column'''
+    if callable(condition):
+        return condition(column)
+    if isinstance(condition, (list, tuple, set, frozenset, range)):
+        if isinstance(column, Categorical):
+            return column.isin(condition)
+        return numpy.isin(column, list(condition))
+    if isinstance(column, Categorical):
+        return column.equals(condition)
+    return column == condition
+
+class Dataset:
+    '''A table of columns (NumPy arrays or Categorical objects) of the same
+    length, by name.
+
+    Params:
+     - columns: a dictionary with the columns, in order
+    '''
+
+    def __init__(self, columns):
+        _require_numpy()
+        self.columns = dict(columns)
+        lengths = {len(column) for column in self.columns.values()}
+        if len(lengths) > 1:
+            raise ValueError("Columns of different lengths: %s" % lengths)
+        self.size = lengths.pop() if lengths else 0
+
+    @classmethod
+    def from_csv(cls, path):
+        'Loads a dataset from a CSV file with a header'
+        _require_numpy()
+        with open(path, newline='', encoding='utf-8') as lines:
+            reader = csv.reader(lines)
+            names = next(reader)
+            texts = list(zip(*reader)) or [()] * len(names)
+        return cls((name, _parse_column(name, column))
+                   for name, column in zip(names, texts))
+
+    @classmethod
+    def from_snapshot(cls, path):
+        '''Loads a dataset saved by save(), mapping it into memory. Its
+        columns are read-only.'''
+        _require_numpy()
+        columns = {}
+        for name, column in read_snapshot(path).items():
+            if isinstance(column, tuple):
+                column = Categorical(*column)
+            columns[name] = column
+        return cls(columns)
+
+    def save(self, path):
+        'Saves a snapshot of the dataset (see top500.snapshot)'
+        write_snapshot(path, {
+            name: (column.codes, column.categories)
+            if isinstance(column, Categorical) else column
+            for name, column in self.columns.items()})
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def __contains__(self, name):
+        return name in self.columns
+
+    def values(self, name):
+        '''Returns the values of a column as an array, decoding it if it is
+        a Categorical'''
+        column = self.columns[name]
+        if isinstance(column, Categorical):
+            return column.decode()
+        return column
+
+    def filter(self, mask):
+        'Returns a dataset with the rows selected by a mask'
+        return Dataset((name, column[mask])
+                       for name, column in self.columns.items())
+
+    def where(self, **conditions):
+        '''Returns a dataset with the rows that meet all the conditions, by
+        column: a value, a collection of values, or a function that returns
+        the mask of a column, e.g.
+
+          top500.where(segment=('Academic', 'Research'),
+                       rmax=lambda rmax: rmax > 1000)
+        '''
+        mask = numpy.ones(self.size, dtype=bool)
+        for name, condition in conditions.items():
+            mask &= _mask(self.columns[name], condition)
+        return self.filter(mask)
+
+    def sort(self, *names):
+        'Returns the dataset sorted by some columns (numeric or Categorical)'
+        keys = [self.columns[name] for name in reversed(names)]
+        order = numpy.lexsort([key.codes if isinstance(key, Categorical)
+                               else key for key in keys])
+        return self.filter(order)
+
+    def group_by(self, *names):
+        'Groups the rows by the values of some columns (see GroupBy)'
+        return GroupBy(self, names)
+
+    def rows(self):
+        'Generator for the rows, as dictionaries'
+        columns = {name: self.values(name).tolist() for name in self.columns}
+        for i in range(self.size):
+            yield {name: values[i] for name, values in columns.items()}
+
+class GroupBy:
+    '''The rows of a dataset grouped by the values of some of its columns.
+    Groups are sorted by those values (for Categorical columns, by their
+    codes, i.e. alphabetically, with missing values first).
+
+    Params:
+     - dataset: the Dataset
+     - names: the names of the columns to group by
+    '''
+
+    def __init__(self, dataset, names):
+        self.dataset = dataset
+        self.names = names
+        # Combine the codes of the values of each row into a single integer
+        # key, and number the distinct keys
+        combined = numpy.zeros(dataset.size, dtype=numpy.int64)
+        uniques = []
+        for name in names:
+            column = dataset[name]
+            if isinstance(column, Categorical):
+                values, codes = numpy.unique(column.codes, return_inverse=True)
+            else:
+                values, codes = numpy.unique(column, return_inverse=True)
+            uniques.append(values)
+            combined = combined * len(values) + codes
+        keys, self.groups = numpy.unique(combined, return_inverse=True)
+        self.count_groups = len(keys)
+        # The values of the group-by columns for each group
+        keys_by_name = {}
+        for name, values in zip(reversed(names), reversed(uniques)):
+            codes = values[keys % len(values)]
+            keys = keys // len(values)
+            column = dataset[name]
+            if isinstance(column, Categorical):
+                codes = Categorical(codes.astype(numpy.int32),
+                                    column.categories)
+            keys_by_name[name] = codes
+        self.keys = {name: keys_by_name[name] for name in names}
+        # Rows sorted by group, and where each group starts in them, for
+        # the aggregates that can't use bincount
+        self.order = numpy.argsort(self.groups, kind='stable')
+        self.starts = numpy.flatnonzero(numpy.diff(
+            self.groups[self.order], prepend=-1))
+
+    def count(self, name=None):
+        '''Returns the number of rows of each group, or the number of rows
+        with a value in a column'''
+        if name is None:
+            return numpy.bincount(self.groups, minlength=self.count_groups)
+        present = ~numpy.isnan(self.dataset[name])
+        return numpy.bincount(self.groups, weights=present,
+                              minlength=self.count_groups).astype(numpy.int64)
+
+    def sum(self, name):
+        'Returns the sum of the values of a column in each group'
+        values = numpy.nan_to_num(self.dataset[name].astype(numpy.float64))
+        return numpy.bincount(self.groups, weights=values,
+                              minlength=self.count_groups)
+
+    def mean(self, name):
+        '''Returns the mean of the values of a column in each group (NaN for
+        the groups without values)'''
+        with numpy.errstate(invalid='ignore', divide='ignore'):
+            return self.sum(name) / self.count(name)
+
+    def __reduce(self, ufunc, name):
+        'Reduces the values of a column in each group with a ufunc'
+        values = self.dataset[name].astype(numpy.float64)
+        return ufunc.reduceat(values[self.order], self.starts)
+
+    def min(self, name):
+        'Returns the minimum value of a column in each group, ignoring NaN'
+        return self.__reduce(numpy.fmin, name)
+
+    def max(self, name):
+        'Returns the maximum value of a column in each group, ignoring NaN'
+        return self.__reduce(numpy.fmax, name)
+
+    def aggregate(self, **aggregates):
+        '''Returns a Dataset with a row per group: the values of the
+        group-by columns, and the aggregates given by name, either as
+        'count' or as a (function, column) tuple, where function is one of
+        AGGREGATES. E.g.
+
+          top500.group_by('edition').aggregate(
+              systems='count', rmax=('sum', 'rmax'), top=('max', 'rmax'))
+        '''
+        columns = dict(self.keys)
+        for name, aggregate in aggregates.items():
+            if aggregate == 'count':
+                columns[name] = self.count()
+                continue
+            function, column = aggregate
+            if function not in AGGREGATES:
+                raise ValueError("Unknown aggregate: %s" % function)
+            columns[name] = getattr(self, function)(column)
+        return Dataset(columns)
+
+def load(path, cache=True):
+    '''Loads a dataset from a CSV file. If 'cache' is True, a snapshot of it
+    is also saved (in PATH.snap), which is loaded instead while it is newer
+    than the CSV file'''
+    _require_numpy()
+    snapshot = path + SNAPSHOT_SUFFIX
+    if cache and os.path.exists(snapshot) and \
+       os.path.getmtime(snapshot) >= os.path.getmtime(path):
+        return Dataset.from_snapshot(snapshot)
+    dataset = Dataset.from_csv(path)
+    if cache:
+        dataset.save(snapshot)
+    return dataset
+
+#
+# Queries behind the plots of the analysis
+#
+
+def top_and_bottom(dataset, bottom=500):
+    '''Performance of the first and last systems of each edition: returns
+    a Dataset with the edition and the rmax of the systems with rank 1 and
+    'bottom' in it (NaN for editions without that rank)'''
+    editions = numpy.unique(dataset['edition'])
+    columns = {'edition': editions}
+    for name, rank in (('first', 1), ('last', bottom)):
+        listed = dataset.where(rank=rank)
+        values = numpy.full(len(editions), numpy.nan)
+        values[numpy.searchsorted(editions, listed['edition'])] = \
+            listed['rmax']
+        columns[name] = values
+    return Dataset(columns)
+
+def by_segment(dataset):
+    '''Systems and total performance of each segment in each edition:
+    returns a Dataset with the edition, the segment, the number of systems,
+    their share of the edition, and the sum of their rmax'''
+    segments = dataset.group_by('edition', 'segment').aggregate(
+        systems='count', rmax=('sum', 'rmax'))
+    editions = dataset.group_by('edition').aggregate(systems='count')
+    totals = editions['systems'][numpy.searchsorted(editions['edition'],
+                                                    segments['edition'])]
+    segments.columns['share'] = segments['systems'] / totals
+    return segments
+
+def loglog_fit(dataset, x='cores', y='rmax'):
+    '''Linear regression of log10(y) on log10(x), like lm(log10(y) ~
+    log10(x)) in the analysis, over the rows where both are positive.
+    Returns the (slope, intercept, r squared) tuple.'''
+    xs = dataset[x].astype(numpy.float64)
+    ys = dataset[y].astype(numpy.float64)
+    with numpy.errstate(invalid='ignore'):
+        valid = (xs > 0) & (ys > 0)
+    xs = numpy.log10(xs[valid])
+    ys = numpy.log10(ys[valid])
+    slope, intercept = numpy.polyfit(xs, ys, 1)
+    residuals = ys - (slope * xs + intercept)
+    r_squared = 1 - residuals.var() / ys.var()
+    return float(slope), float(intercept), float(r_squared)
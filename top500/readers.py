@@ -0,0 +1,93 @@
+'''Readers for the list entries written in each of the output formats (see
+top500.writers), e.g. to update an existing output.
+
+Entries are read as dictionaries with the ENTRY_FIELDS, with the values of
+numeric fields converted back to numbers for the text formats (CSV doesn't
+keep types: its empty values are read as None).
+'''
+
+import csv
+import gzip
+import json
+import sqlite3
+from top500.scraper import ENTRY_FIELDS, INTEGER_FIELDS, FLOAT_FIELDS
+from top500.writers import ENTRY_INTEGER_FIELDS, pyarrow
+
+def _value(field, text):
+    'Converts the text of a field in a CSV file to its value'
+    if text == '':
+        return None
+    try:
+        if field in INTEGER_FIELDS or field in ENTRY_INTEGER_FIELDS:
+            return int(text)
+        if field in FLOAT_FIELDS:
+            return float(text)
+    except ValueError:
+        # Numeric fields can contain text when the site didn't provide
+        # a number
+        pass
+    return text
+
+def _read_csv(lines):
+    'Generator for the entries in the lines of a CSV file'
+    for row in csv.DictReader(lines):
+        yield {field: _value(field, row[field]) for field in ENTRY_FIELDS}
+
+def read_csv(path):
+    'Generator for the entries in a CSV file'
+    with open(path, newline='', encoding='utf-8') as lines:
+        yield from _read_csv(lines)
+
+def read_csv_gz(path):
+    'Generator for the entries in a gzip-compressed CSV file'
+    with gzip.open(path, 'rt', newline='', encoding='utf-8') as lines:
+        yield from _read_csv(lines)
+
+def read_jsonl(path):
+    'Generator for the entries in a JSON Lines file'
+    with open(path, encoding='utf-8') as lines:
+        for line in lines:
+            yield json.loads(line)
+
+def read_sqlite(path):
+    '''Generator for the entries in an SQLite database, as joined by its
+    'top500' view, in (year, month, rank) order'''
+    db = sqlite3.connect(path)
+    try:
+        cursor = db.execute('SELECT %s FROM top500 ORDER BY year, month, rank'
+                            % ', '.join(ENTRY_FIELDS))
+        for row in cursor:
+            yield dict(zip(ENTRY_FIELDS, row))
+    finally:
+        db.close()
+
+def _require_pyarrow():
+    'Checks that pyarrow is available'
+    if pyarrow is None:
+        raise RuntimeError("The pyarrow module is needed for this format")
+
+def read_parquet(path):
+    'Generator for the entries in an Apache Parquet file'
+    _require_pyarrow()
+    for batch in pyarrow.parquet.ParquetFile(path).iter_batches():
+        yield from batch.to_pylist()
+
+def read_arrow(path):
+    'Generator for the entries in an Apache Arrow IPC file'
+    _require_pyarrow()
+    with pyarrow.ipc.open_file(path) as reader:
+        for i in range(reader.num_record_batches):
+            yield from reader.get_batch(i).to_pylist()
+
+READERS = {
+    'csv': read_csv,
+    'csv.gz': read_csv_gz,
+    'jsonl': read_jsonl,
+    'parquet': read_parquet,
+    'arrow': read_arrow,
+    'sqlite': read_sqlite,
+}
+
+def read_entries(fmt, path):
+    'Generator for the entries in a file in the given format (see FORMATS)'
+    return READERS[fmt](path)
@@ -1,11 +1,17 @@
 '''Scraper for the TOP500 list pages'''
 
-import locale
 import re
-from difflib import SequenceMatcher
-import requests
-from bs4 import BeautifulSoup
-from top500.urlgen import id_from_link, list_edition, url_for_system, url_for_site
+import time
+from collections import namedtuple
+from functools import wraps
+from datetime import date
+from concurrent.futures import ThreadPoolExecutor
+from bs4 import BeautifulSoup, SoupStrainer
+from top500.fetch import Fetcher, DownloadError
+from top500.matcher import ComponentMatcher
+from top500.store import DetailStore
+from top500.urlgen import id_from_link, list_edition, url_for_system, \
+    url_for_site, url_for_list, editions, page_kind
 
 # The list of fields we know about for a system.
 # This is a dictionary where the keys are the name of the fields
@@ -53,6 +59,19 @@ ENTRY_FIELDS = list(SYSTEM_FIELDS.values()) + ['year', 'month', 'rank']
 # site and system). We don't scrape that page as it's redundant.
 LIST_COLS = ('rank', 'site', 'system', 'cores', 'rmax', 'rpeak', 'power')
 
+# Which columns do we find in the table with the rank history of a system,
+# the second table of its details page. It has a row for each of the list
+# editions where the system was listed, e.g. "11/2017".
+HISTORY_COLS = ('list', 'rank', 'system', 'manufacturer', 'cores', 'rmax',
+                'rpeak', 'power')
+HISTORY_LIST_RE = re.compile(r'(\d{1,2})/(\d{4})$')
+
+# The fields of a listing: the details of a system found in a row of a list
+# page, or of the rank history of the system. A list entry is built from a
+# listing and the details of the system and the site.
+LISTING_FIELDS = ('year', 'month', 'rank', 'system_id', 'site_id', 'text',
+                  'manufacturer', 'cores', 'rmax', 'rpeak', 'power')
+
 # The list of rows with details about a site, on the site's details page
 SITE_ROWS = {
     'URL': 'site_url',
@@ -72,27 +91,75 @@ INTEGER_FIELDS = ('memory', 'cores', 'nmax', 'nhalf')
 FLOAT_FIELDS = ('rmax', 'rpeak', 'power', 'hpcg')
 NUMERIC_FIELDS = INTEGER_FIELDS + FLOAT_FIELDS
 
-# The minimum ratio for difflib's SequenceMatcher to accept two strings
-# as equal. This is used when cleaning up a system's listing entry by
-# removing details about known other fields (processor, interconnect)
-SM_RATIO = 0.79
-
-# The site uses the en_US locale with UTF8 encoding. Setting this for
-# the number parsing functions (i.e. separators)
-locale.setlocale(locale.LC_ALL, 'en_US.UTF-8')
-
-class DownloadError(Exception):
-    'A problem occurred while fetching a page with "requests.get"'
-    pass
+# The fields of an entry that are kept about a system between list editions.
+# All the other fields are set by each list entry (from the listing itself or
+# from the site's details), so there is no need to keep them.
+SYSTEM_RECORD_FIELDS = ('system_url', 'memory', 'processor', 'interconnect',
+                        'nmax', 'nhalf', 'hpcg', 'os', 'compiler', 'math',
+                        'mpi', 'gpu')
+
+# A compact, tuple-backed record of a system's details, as kept in the
+# scraper's system cache
+SystemRecord = namedtuple('SystemRecord', SYSTEM_RECORD_FIELDS)
+
+# The entries of each page of a list edition
+ENTRIES_PER_PAGE = 100
+
+# Numbers in the site are written in the en_US format: commas separate
+# thousands and the dot is the decimal point. A value starts with the
+# number, and can be followed by units or notes, e.g. "1,234.5 kW (Derived)"
+NUMBER_RE = re.compile(r'[\d,.]+')
+
+# How pages can be parsed:
+#  - 'html.parser': build the tree of the whole page with Python's parser
+#  - 'strained': only build the elements of the page that we scrape
+#  - 'lxml': like 'strained', but using the (faster) lxml parser, which
+#    needs to be installed separately
+PARSERS = ('html.parser', 'strained', 'lxml')
+
+# The elements of each kind of page that are scraped. See the functions
+# that scrape each of them for details.
+STRAINERS = {
+    'list': SoupStrainer('tr'),
+    'system': SoupStrainer('table'),
+    'site': SoupStrainer(['h1', 'table']),
+}
 
-def _fetch(url, session):
-    '''Downloads an URL and returns a 'requests' response object'''
+def _fetch(url, fetcher, cache=None):
+    '''Downloads an URL with a Fetcher and returns a 'requests' response
+    object. If a ResponseCache is provided, the page is served from it while
+    fresh, revalidated when stale, and stored in it once downloaded (again,
+    if it's no longer cached when the server confirms it didn't change).'''
+    headers = {}
+    if cache:
+        page = cache.get(url)
+        if page:
+            return page
+        headers = cache.conditional_headers(url)
     print("-- Downloading: %s" % url)
-    page = session.get(url)
+    page = fetcher.get(url, headers=headers)
+    if page.status_code == 304 and cache:
+        cached = cache.refresh(url, page)
+        if cached:
+            return cached
+        # The page was evicted from the cache since it was revalidated
+        page = fetcher.get(url)
     if page.status_code != 200:
         raise DownloadError("Something went wrong: %d" % page.status_code)
+    if cache:
+        cache.store(url, page)
     return page
 
+def _atoi(text):
+    '''Converts a number in the site's format to an integer. Like
+    locale.atoi, but independent of the current locale'''
+    return int(text.replace(',', ''))
+
+def _atof(text):
+    '''Converts a number in the site's format to a float. Like
+    locale.atof, but independent of the current locale'''
+    return float(text.replace(',', ''))
+
 def _numeric_value(var, val):
     '''Clean up a value for a numeric variable:
        - remove any text on it (e.g. units, thousands separators)
@@ -101,71 +168,254 @@ def _numeric_value(var, val):
     # Negative values are incorrect: there's no numeric variable in the
     # dataset where negative numbers make sense. If the value starts
     # with a minus we replace it with an empty value
-    if re.match(r'-', val):
+    if val.startswith('-'):
         return None
 
-    match = re.match(r'([\d,.]+)', val)
+    match = NUMBER_RE.match(val)
     if not match:
         # The provided value doesn't start with a number
         return val
     value = match.group(0)
     if var in INTEGER_FIELDS:
-        value = locale.atoi(value)
+        value = _atoi(value)
     elif var in FLOAT_FIELDS:
-        value = locale.atof(value)
+        value = _atof(value)
     return value
 
-def _could_be(part1, part2):
-    '''Helper function for fuzzy_remove: check if 2 items could be the same
-    component/variable value'''
-    #if part1 == part2 or part1 in part2 or part2 in part1:
-    #    return True
-    could_be = SequenceMatcher(None, part1, part2).ratio() > SM_RATIO
-    return could_be
+def _listing(edition, rank, system_id, site_id, text, manufacturer, numbers):
+    '''Returns a listing (a dictionary with LISTING_FIELDS) from the texts of
+    a row of a list page or of a rank history, where 'text' is the text of
+    the system's link (see Scraper.__parse_system_details) and 'numbers' are
+    the texts of the cores, rmax, rpeak and power columns'''
+    cores, rmax, rpeak, power = numbers
+    # Several systems don't provide details about Power
+    try:
+        power = _atof(power)
+    except ValueError:
+        power = None
+    return {'year': edition.year, 'month': edition.month, 'rank': rank,
+            'system_id': system_id, 'site_id': site_id, 'text': text,
+            'manufacturer': manufacturer, 'cores': _atoi(cores),
+            'rmax': _atof(rmax), 'rpeak': _atof(rpeak), 'power': power}
+
+def _system_record(system):
+    'Returns the SystemRecord for the details of a system (a dictionary)'
+    return SystemRecord._make(system[field] for field in SYSTEM_RECORD_FIELDS)
+
+def list_pages(count):
+    '''Returns the pages of a list edition needed to get its first 'count'
+    entries, as (page number, limit) tuples, where limit is the number of
+    entries to scrape from the page'''
+    pages = [(page + 1, ENTRIES_PER_PAGE)
+             for page in range(count // ENTRIES_PER_PAGE)]
+    if count % ENTRIES_PER_PAGE:
+        # A partial page was requested
+        pages.append((len(pages) + 1, count % ENTRIES_PER_PAGE))
+    return pages
+
+# Events of the scraping process that functions can be hooked to, and the
+# arguments the functions are called with:
+#  - fetch: (url, kind, source, seconds, size) for each page obtained, where
+#    kind is the kind of page (see urlgen.page_kind) and source is 'network',
+#    'cache' or 'archive'
+#  - parse: (kind, seconds) for each page parsed
+#  - match: (seconds) for the fuzzy matching of a listed system's components
+#  - lookup: (kind, found) for each lookup of the details of a 'system' or
+#    'site', where found is 'memory', 'store' or 'scraped'. Details that are
+#    prefetched are looked up once, when the entry is built, as found where
+#    they were prefetched from.
+#  - entry: (entry) for each list entry added
+#  - enter, leave: (kind, part) when the scraper starts and finishes working
+#    on a 'list', 'system' or 'site' page. The part is 'page' for downloading
+#    and parsing the page and extracting its data, and 'entry' for building
+#    the entry of a listing of a list page (matching its components and
+#    looking up its details). Details pages that aren't prefetched are
+#    worked on within an entry.
+HOOKS = ('fetch', 'parse', 'match', 'lookup', 'entry', 'enter', 'leave')
+
+def _working_on(kind, part='page'):
+    '''Decorator for the methods of the Scraper that work on a page of some
+    kind (or on a part of it), to call the functions hooked to the enter and
+    leave events'''
+    def decorator(method):
+        @wraps(method)
+        def wrapper(self, *args, **kwargs):
+            for hook in self.hooks.get('enter', ()):
+                hook(kind, part)
+            try:
+                return method(self, *args, **kwargs)
+            finally:
+                for hook in self.hooks.get('leave', ()):
+                    hook(kind, part)
+        return wrapper
+    return decorator
+
+class GPUCarryOver:
+    '''The scraper keeps the GPU of a system from its previous list entries
+    when the listing of a later edition doesn't mention it. Editions that
+    are scraped separately (e.g. in parallel, by different scrapers) miss
+    that: passing their entries, in (year, month, rank) order, through this
+    callable object applies it to them.
+
+    Params:
+     - gpus: the GPUs of the systems in previous entries, by system_id
+    '''
 
-def _fuzzy_remove(parts, system):
-    '''Attempts to detect known system parts to remove them, comparing strings
-    with difflib's SequenceMatcher allowing "close enough" matches.
+    def __init__(self, gpus=None):
+        self.gpus = dict(gpus or {})
 
-    For example, system 177556 has these parts in its listing name:
-    ['Sequoia-BlueGene/Q', 'Power BQC 16C 1.60 GHz', 'Custom']
+    def __call__(self, entry):
+        if entry['gpu']:
+            self.gpus[entry['system_id']] = entry['gpu']
+        else:
+            entry['gpu'] = self.gpus.get(entry['system_id'])
+        return entry
 
-    In its details page, though, the interconnect is 'Custom Interconnect', and
-    the processor is 'Power BQC 16C 1.6GHz'
-    '''
-    toremove = []
-    for part in parts:
-        if system['processor'] and _could_be(part, system['processor']):
-            if not part in toremove:
-                toremove.append(part)
-        if system['interconnect'] and _could_be(part, system['interconnect']):
-            if not part in toremove:
-                toremove.append(part)
-    for part in toremove:
-        parts.remove(part)
+class Scraper:
+    '''scrappety scrap
 
+    Scraped entries are passed to entry_callback, if any, and kept in
+    memory unless 'retain' is False. Details about systems are kept in a
+    cache of compact SystemRecord objects.
 
-class Scraper:
-    "scrappety scrap"
+    Pages are downloaded from the site with a 'fetcher' (by default, a
+    Fetcher for the number of jobs), unless a 'source' is given: then they
+    are obtained with its fetch(url) method (e.g. an ArchiveReader).
+    Pages can also be added to an 'archive' (an ArchiveWriter).
 
-    def __init__(self, entry_callback=None):
+    Functions can be hooked to events of the scraping process with
+    add_hook(), e.g. to collect metrics (see HOOKS).
+    '''
+
+    def __init__(self, entry_callback=None, jobs=1, cache=None, store=None,
+                 parser='html.parser', retain=True, source=None, archive=None,
+                 fetcher=None):
+        if parser not in PARSERS:
+            raise ValueError("Unknown parser: %s" % parser)
         self.entry_callback = entry_callback
+        self.parser = parser
+        self.matcher = ComponentMatcher()
+        self.cache = cache
+        self.source = source
+        self.archive = archive
+        self.hooks = {}
+        # Persistent store of system and site details, if any. Details
+        # are loaded from it when they are not found in memory.
+        self.store = store or DetailStore()
         self.sites = {}
         self.systems = {}
         self.entries = []
-        self.session = requests.Session()
+        self.retain = retain
+        # The fetcher's connection pool holds a connection per job
+        self.fetcher = fetcher or Fetcher(jobs)
+        self.session = self.fetcher.session
+        # With more than one job, the details pages of the systems and
+        # sites found in a list page are downloaded concurrently while
+        # the page's rows are parsed, and so is the next list page.
+        self.executor = None
+        if jobs > 1:
+            self.executor = ThreadPoolExecutor(max_workers=jobs)
+        # Pages being downloaded in the background, as futures by
+        # (kind, id) for details and by ('list', url) for list pages. Each
+        # page is only requested once, however many rows reference it.
+        self.inflight = {}
+        # Where the details prefetched and not looked up yet were found
+        # ('store' or 'scraped'), by (kind, id)
+        self.prefetched = {}
+
+    def __fetch(self, url):
+        '''Downloads a page, through the response cache if there is one, or
+        gets it from the source. Archives it if needed.'''
+        start = time.perf_counter()
+        if self.source:
+            page = self.source.fetch(url)
+            source = 'archive'
+        else:
+            page = _fetch(url, self.fetcher, self.cache)
+            source = 'cache' if getattr(page, 'from_cache', False) \
+                else 'network'
+        if 'fetch' in self.hooks:
+            self.__emit('fetch', url, page_kind(url), source,
+                        time.perf_counter() - start, len(page.content))
+        if self.archive:
+            self.archive.add(url, page)
+        return page
+
+    def __emit(self, event, *args):
+        'Calls the functions hooked to an event'
+        for hook in self.hooks.get(event, ()):
+            hook(*args)
+
+    def add_hook(self, event, hook):
+        'Adds a function to be called on an event (one of HOOKS)'
+        if event not in HOOKS:
+            raise ValueError("Unknown event: %s" % event)
+        self.hooks.setdefault(event, []).append(hook)
+
+    def __soup(self, page, kind):
+        '''Parses a downloaded page of the given kind ('list', 'system' or
+        'site') with the configured parser'''
+        start = time.perf_counter()
+        if self.parser == 'html.parser':
+            soup = BeautifulSoup(page.text, 'html.parser')
+        else:
+            backend = 'lxml' if self.parser == 'lxml' else 'html.parser'
+            soup = BeautifulSoup(page.text, backend,
+                                 parse_only=STRAINERS[kind])
+        if 'parse' in self.hooks:
+            self.__emit('parse', kind, time.perf_counter() - start)
+        return soup
 
     def __add_list_entry(self, entry):
         "Adds a system entry to the list"
         # We cache systems by their ID, so we don't have to re-scrape their
         # details pages.
-        self.systems[entry['system_id']] = entry
-        self.entries.append(entry)
+        self.systems[entry['system_id']] = _system_record(entry)
+        if self.retain:
+            self.entries.append(entry)
         if self.entry_callback:
             self.entry_callback(entry)
+        self.__emit('entry', entry)
 
+    @_working_on('system')
     def __scrape_system_page(self, system_id):
         '''Downloads and scrapes a system's details page.
+        Returns a dictionary of system properties.'''
+        page = self.__fetch(url_for_system(system_id))
+        return self.__parse_system_page(system_id, self.__soup(page, 'system'))
+
+    @_working_on('system')
+    def __scrape_system_history(self, system_id):
+        '''Downloads and scrapes a system's details page, including the
+        history of its ranks. Returns a (details, history) tuple, where
+        history is a list of listings.'''
+        page = self.__fetch(url_for_system(system_id))
+        soup = self.__soup(page, 'system')
+        system = self.__parse_system_page(system_id, soup)
+        history = []
+        tables = soup.find_all('table')
+        if len(tables) < 2:
+            return system, history
+        for row in tables[1].find_all('tr'):
+            cols = row.find_all('td')
+            if len(cols) != len(HISTORY_COLS):
+                # The header row, which uses TH instead of TD
+                continue
+            match = HISTORY_LIST_RE.match(cols[0].get_text(strip=True))
+            if not match:
+                print("Igoring unknown list '%s' in the history of system %s"
+                      % (cols[0].get_text(strip=True), system_id))
+                continue
+            edition = date(int(match.group(2)), int(match.group(1)), 1)
+            history.append(_listing(
+                edition, int(cols[1].get_text()), system_id,
+                system['site_id'], cols[2].get_text(strip=True),
+                cols[3].get_text(strip=True),
+                [col.get_text() for col in cols[4:]]))
+        return system, history
+
+    def __parse_system_page(self, system_id, soup):
+        '''Scrapes a system's details page.
         Sample row from a details page:
 
             <tr>
@@ -173,12 +423,11 @@ class Scraper:
                 <td>12,345</td>
             </tr>
 
-        Returns a dictionary of system properties.'''
+        Returns a dictionary of system properties. The site_id is taken
+        from the link to the site, if any.'''
 
         system = dict.fromkeys(ENTRY_FIELDS)
         system['system_id'] = system_id
-        page = _fetch(url_for_system(system_id), self.session)
-        soup = BeautifulSoup(page.text, 'html.parser')
 
         # There are two tables in a system details page: the details
         # themselves and the history of ranks. We scrape the first one.
@@ -198,9 +447,12 @@ class Scraper:
                       (fieldname, system_id))
                 continue
             system[variable] = value
+            if variable == 'site_name' and row.td.a:
+                system['site_id'] = id_from_link(row.td.a['href'])
 
         return system
 
+    @_working_on('site')
     def __scrape_site_page(self, site_id):
         '''Downloads and scrapes a site's details page.
         Returns a dictionary of site properties with SITE_FIELDS as keys.
@@ -208,8 +460,8 @@ class Scraper:
 
         site = dict.fromkeys(SITE_FIELDS)
         site['site_id'] = site_id
-        page = _fetch(url_for_site(site_id), self.session)
-        soup = BeautifulSoup(page.text, 'html.parser')
+        page = self.__fetch(url_for_site(site_id))
+        soup = self.__soup(page, 'site')
 
         # The name of the site is in the first non-empt H1 element
         # of a site details page
@@ -237,32 +489,88 @@ class Scraper:
 
         return site
 
+    def __load_site(self, site_id):
+        '''Returns the (details, found) of a site from the store, where found
+        is 'store', or scraped from its details page (and then stored), where
+        found is 'scraped'.'''
+        site = self.store.get_site(site_id)
+        if site:
+            return site, 'store'
+        site = self.__scrape_site_page(site_id)
+        self.store.put_site(site_id, site)
+        return site, 'scraped'
+
+    def __load_system(self, system_id):
+        '''Returns the (details, found) of a system from the store, where
+        found is 'store', or scraped from its details page (and then stored),
+        where found is 'scraped'.'''
+        system = self.store.get_system(system_id)
+        if system:
+            return system, 'store'
+        system = self.__scrape_system_page(system_id)
+        self.store.put_system(system_id, system)
+        return system, 'scraped'
+
     def __get_site_details(self, site_id):
-        '''Find details about a site. Check the site cache first, scrape
-        if not found.
+        '''Find details about a site. Check the site cache first, then the
+        store, and scrape if not found.
         '''
+        self.__collect('site', site_id)
+        found = self.prefetched.pop(('site', site_id), 'memory')
         try:
             site = self.sites[site_id]
         except KeyError:
-            site = self.__scrape_site_page(site_id)
+            site, found = self.__load_site(site_id)
             # Add it to the cache
             self.sites[site_id] = site
+        self.__emit('lookup', 'site', found)
         return site
 
     def __get_system_details(self, system_id):
         '''Find details about a system. Check if we scraped its details before,
         and if not, scrape them.
         Note: we don't add the scraped system to the cache here, we only add it
-        when all details are scraped - i.e. we cache full list entries. This saves
-        a bit of time and memory.
+        when all details are scraped - i.e. we cache the details of full list
+        entries. This saves a bit of time and memory. The store, however,
+        keeps the details as scraped from the system's page.
+
+        Returns a SystemRecord.
         '''
+        self.__collect('system', system_id)
+        found = self.prefetched.pop(('system', system_id), 'memory')
         try:
             system = self.systems[system_id]
         except KeyError:
-            system = self.__scrape_system_page(system_id)
+            details, found = self.__load_system(system_id)
+            system = _system_record(details)
+        self.__emit('lookup', 'system', found)
         return system
 
-    def __parse_system_details(self, system, link):
+    def site_details(self, site_id):
+        '''Returns the details of a site (a dictionary with SITE_FIELDS as
+        keys), like __get_site_details, but without adding them to the
+        scraper's memory, so that callers can keep them as they see fit (see
+        top500.lookup). Raises DownloadError if the site can't be found.'''
+        self.__collect('site', site_id)
+        site = self.sites.get(site_id)
+        found = 'memory'
+        if site is None:
+            site, found = self.__load_site(site_id)
+        self.__emit('lookup', 'site', found)
+        return site
+
+    def system_details(self, system_id):
+        '''Returns the details of a system (a dictionary with ENTRY_FIELDS
+        as keys, the ones of a list entry unset) as scraped from its details
+        page, like __get_system_details, but without adding them to the
+        scraper's memory (see site_details). Raises DownloadError if the
+        system can't be found.'''
+        self.__collect('system', system_id)
+        system, found = self.__load_system(system_id)
+        self.__emit('lookup', 'system', found)
+        return system
+
+    def __parse_system_details(self, system, text):
         '''Parses system details in the text within a link in a listing.
 
         Details can include the system name, processor, interconnect or GPU.
@@ -272,103 +580,216 @@ class Scraper:
         Params:
          - system: the dict object for the system, where system details
            will be added. It must already have its system_id filled in
-         - link: a BeautifulSoup Tag object corresponding to the A
-           element with the data to parse.
+         - text: the text within the link
         '''
 
         details = self.__get_system_details(system['system_id'])
         # Update only the fields that we found about
-        system.update({field: details[field]
-                       for field in ENTRY_FIELDS if details[field]})
-
-        # Parse the text within the link.
-        parts = link.get_text(strip=True).split(',')
-        parts = [x.strip() for x in parts]
-
-        # Remove the components that we already have in the details
-        _fuzzy_remove(parts, system)
-
-        # Once the interconnect and processor are removed, the first
-        # element is assumed to be the system name
-        if parts:
-            system['name'] = parts.pop(0)
+        system.update({field: value for field, value
+                       in zip(SYSTEM_RECORD_FIELDS, details) if value})
+
+        # Parse the text within the link, removing the components that we
+        # already have in the details. The first remaining part is the name.
+        start = time.perf_counter()
+        name, gpu = self.matcher.split(system['system_id'], text,
+                                       system['processor'],
+                                       system['interconnect'])
+        if 'match' in self.hooks:
+            self.__emit('match', time.perf_counter() - start)
+        if name is not None:
+            system['name'] = name
         else:
-            # If we are here it very likely means we should tune SM_RATIO
-            # because it removed all parts thinking they belonged elsewhere
+            # If we are here it very likely means we should tune the
+            # matcher's SM_RATIO because it removed all parts thinking they
+            # belonged elsewhere
             print('... Warning: System without name')
             system['name'] = 'Unknown'
 
         # Any remaining content is assumed to be the GPU/co-processor.
         # It should be one part, but some systems have extra content.
-        if parts:
-            system['gpu'] = ', '.join(parts)
+        if gpu is not None:
+            system['gpu'] = gpu
 
-    def __parse_system_column(self, system, col):
-        '''Parses a column value corresponding to a system in one of the
-        list pages. These include various system details. Such a column
-        looks like this:
+    def __parse_list_row(self, edition, cols):
+        '''Parses the columns of a row of a list page (see LIST_COLS) into a
+        listing. The site and system columns look like this:
 
+          <td><a href="/site/SITE_ID">SITE_NAME</a><br>COUNTRY</td>
           <td><a href="https://www.top500.org/system/SYSTEM_ID">
               SYSTEM_NAME, PROCESSOR, INTERCONNECT, GPU
           </a><br/>MANUFACTURER</td>
 
-        However, the details of name, processor, interconnect or GPU
-        vary wildly across systems, so they are parsed in a specific
-        function and completed with the system details page.
+        We are only interested in the SITE_ID of the site; the rest of a
+        site's details are scraped from the site's details page (and cached).
+        The details of name, processor, interconnect or GPU in the text of
+        the system's link vary wildly across systems, so they are parsed in
+        a specific function and completed with the system details page.
 
         Params:
-         - system: the dict object for the system, where system details
-           will be added
-         - col: a BeautifulSoup Tag object corresponding to the TD
-           element with the data to parse.
+         - edition: the list edition of the page
+         - cols: a list with the TD elements of the row
         '''
-        link = col.a
-        system['system_id'] = id_from_link(link['href'])
-        self.__parse_system_details(system, link)
+        site_link = cols[1].a
+        link = cols[2].a
+        text = link.get_text(strip=True)
+        system_id = id_from_link(link['href'])
         # Remove system details, so we're left only with manufacturer
         link.decompose()
-        system['manufacturer'] = col.get_text(strip=True)
-
-    def __parse_site_column(self, system, col):
-        '''Parses a column value corresponding to a site in one of the
-        list pages. Such a column looks like this:
-
-          <td><a href="/site/SITE_ID">SITE_NAME</a><br>COUNTRY</td>
-
-        We are only interested in the SITE_ID; the rest of a site's
-        details are scraped from the site's details page (and cached).
+        return _listing(edition, int(cols[0].get_text()), system_id,
+                        id_from_link(site_link['href']), text,
+                        cols[2].get_text(strip=True),
+                        [col.get_text() for col in cols[3:]])
+
+    def __listing_entry(self, listing):
+        '''Builds a list entry from a listing, with the details of its system
+        and site, and adds it'''
+        entry = self.__build_entry(listing)
+        self.__add_list_entry(entry)
+        return entry
+
+    @_working_on('list', 'entry')
+    def __build_entry(self, listing):
+        '''Returns the list entry of a listing, with the details of its
+        system and site'''
+        entry = dict.fromkeys(ENTRY_FIELDS)
+        entry['system_id'] = listing['system_id']
+        self.__parse_system_details(entry, listing['text'])
+        entry['manufacturer'] = listing['manufacturer']
+        if listing['site_id'] is not None:
+            entry.update(self.__get_site_details(listing['site_id']))
+        for field in ('rank', 'year', 'month', 'cores', 'rmax', 'rpeak',
+                      'power'):
+            entry[field] = listing[field]
+        return entry
+
+    def __schedule(self, kind, item_id):
+        '''Starts scraping the details of a 'system' or 'site' in the
+        background, unless they are already known, in the store, or being
+        scraped.'''
+        known = self.systems if kind == 'system' else self.sites
+        if item_id in known or (kind, item_id) in self.inflight:
+            return
+        if kind == 'system':
+            details = self.store.get_system(item_id)
+            if details:
+                self.systems[item_id] = _system_record(details)
+        else:
+            details = self.store.get_site(item_id)
+            if details:
+                self.sites[item_id] = details
+        if details:
+            self.prefetched[(kind, item_id)] = 'store'
+            return
+        scrape = self.__scrape_system_page if kind == 'system' \
+            else self.__scrape_site_page
+        self.inflight[(kind, item_id)] = self.executor.submit(scrape, item_id)
+        self.prefetched[(kind, item_id)] = 'scraped'
+
+    def __collect(self, kind, item_id):
+        '''Waits for the details of a 'system' or 'site' that are being
+        scraped in the background, if they are, and adds them to the caches
+        '''
+        future = self.inflight.pop((kind, item_id), None)
+        if future is None:
+            return
+        details = future.result()
+        # Note: prefetched system details are replaced by the full list entry
+        # once it is added, like __get_system_details would do.
+        if kind == 'system':
+            self.systems[item_id] = _system_record(details)
+            self.store.put_system(item_id, details)
+        else:
+            self.sites[item_id] = details
+            self.store.put_site(item_id, details)
 
-        Params:
-         - system: the dict object for the system, where site details
-           will be added
-         - col: a BeautifulSoup Tag object corresponding to the TD
-           element with the data to parse.
+    def __prefetch(self, listings):
+        '''Starts scraping the details pages of the systems and sites
+        referenced in the listings concurrently, in their order. Each
+        listing is then parsed as soon as its details are ready.
         '''
-        link = col.a
-        site = self.__get_site_details(id_from_link(link['href']))
-        system.update(site)
+        if not self.executor:
+            return
+        for listing in listings:
+            self.__schedule('system', listing['system_id'])
+            if listing['site_id'] is not None:
+                self.__schedule('site', listing['site_id'])
+
+    def prefetch_list_page(self, url):
+        '''Starts downloading a list page in the background (if the scraper
+        has more than one job), to be scraped later by scrape_list_page or
+        iter_list_page. Does nothing if url is None.'''
+        if not self.executor or url is None or ('list', url) in self.inflight:
+            return
+        self.inflight[('list', url)] = self.executor.submit(self.__fetch, url)
+
+    def remember(self, entry, system=True, site=True):
+        '''Keeps the details of the system and/or the site of an entry
+        scraped before (e.g. read from an existing output), as if the entry
+        had been added by this scraper'''
+        if system:
+            self.systems[entry['system_id']] = _system_record(entry)
+        if site:
+            self.sites[entry['site_id']] = {field: entry[field]
+                                            for field in SITE_FIELDS}
+
+    def forget(self):
+        '''Forgets the details of the systems updated with the entries added
+        so far (e.g. their GPU), so that the next entries are the same as
+        with a new Scraper. Details in the store are still used.'''
+        self.systems = {}
+
+    def close(self):
+        '''Stops downloading pages in the background: the downloads that
+        haven't started are cancelled, and the ones in progress awaited'''
+        if self.executor:
+            self.executor.shutdown(cancel_futures=True)
+        self.inflight = {}
+        self.prefetched = {}
 
     def set_entry_callback(self, callback):
         'Sets the callback function to be called when a list entry is added'
         self.entry_callback = callback
 
     def get_list(self):
-        "Returns the list of scraped systems"
+        '''Returns the list of scraped systems. Note that it is always empty
+        if the scraper doesn't retain entries'''
         return self.entries
 
-    def scrape_list_page(self, url, limit=100):
+    def scrape_list_page(self, url, limit=ENTRIES_PER_PAGE):
         '''This function parses one single page from one of the lists,
         to extracts the data from the table
 
+        '''
+        for _ in self.iter_list_page(url, limit):
+            pass
+
+    def iter_entries(self, start, end, count=500):
+        '''Generator for the entries of the list editions between 'start' and
+        'end' (date objects), inclusive, taking the first 'count' entries of
+        each edition. Entries are yielded in (year, month, rank) order.
+        '''
+        pages = [(url_for_list(edition, page), limit)
+                 for edition in editions(start, end)
+                 for page, limit in list_pages(count)]
+        for i, (url, limit) in enumerate(pages):
+            if i + 1 < len(pages):
+                self.prefetch_list_page(pages[i + 1][0])
+            yield from self.iter_list_page(url, limit)
+
+    @_working_on('list')
+    def list_page_listings(self, url, limit=ENTRIES_PER_PAGE):
+        '''Returns the listings (see LISTING_FIELDS) in one single page from
+        one of the lists, without scraping their details.
         '''
         edition = list_edition(url)
 
-        page = _fetch(url, self.session)
-        soup = BeautifulSoup(page.text, 'html.parser')
+        future = self.inflight.pop(('list', url), None)
+        page = future.result() if future else self.__fetch(url)
+        soup = self.__soup(page, 'list')
 
-        rows = soup.find_all('tr')
+        listings = []
         count = 0
-        for row in rows:
+        for row in soup.find_all('tr'):
             if count > limit:
                 print("... Partial scraping of %d entries from the page"
                       % limit)
@@ -382,19 +803,43 @@ class Scraper:
                 # The code below assumes LIST_COLS are present, so
                 # we check we have so many cols.
                 continue
-            entry = dict.fromkeys(ENTRY_FIELDS)
-            self.__parse_system_column(entry, cols[2])
-            self.__parse_site_column(entry, cols[1])
-            entry['rank'] = int(cols[0].get_text())
-            entry['year'] = edition.year
-            entry['month'] = edition.month
-            entry['cores'] = locale.atoi(cols[3].get_text())
-            entry['rmax'] = locale.atof(cols[4].get_text())
-            entry['rpeak'] = locale.atof(cols[5].get_text())
-            # Several systems don't provide details about Power
-            try:
-                entry['power'] = locale.atof(cols[6].get_text())
-            except ValueError:
-                entry['power'] = None
+            listings.append(self.__parse_list_row(edition, cols))
+        return listings
+
+    def iter_list_page(self, url, limit=ENTRIES_PER_PAGE):
+        '''Generator for the entries in one single page from one of the lists.
+        Entries are yielded in rank order, once they have been added.
+        '''
+        yield from self.iter_listings(self.list_page_listings(url, limit))
 
-            self.__add_list_entry(entry)
+    def iter_listings(self, listings):
+        '''Generator for the entries of some listings (e.g. from the rank
+        histories of systems), which should be in (year, month, rank) order.
+        Entries are yielded in that order, once they have been added.
+        '''
+        self.__prefetch(listings)
+
+        # Entries are always added in rank order, regardless of the order
+        # in which details pages were downloaded: each listing waits for the
+        # details it needs
+        for listing in listings:
+            yield self.__listing_entry(listing)
+
+    def system_histories(self, system_ids):
+        '''Scrapes the details pages of some systems, concurrently if the
+        scraper has more than one job, including the history of their
+        ranks. Returns a dictionary with the history of each system, as a
+        list of listings.'''
+        if self.executor:
+            results = self.executor.map(self.__scrape_system_history,
+                                        system_ids)
+        else:
+            results = map(self.__scrape_system_history, system_ids)
+        histories = {}
+        for system_id, (details, history) in zip(system_ids, results):
+            self.store.put_system(system_id, details)
+            if system_id not in self.systems:
+                # Like prefetched details, until the first entry is added
+                self.systems[system_id] = _system_record(details)
+            histories[system_id] = history
+        return histories
@@ -0,0 +1,187 @@
+'''Binary snapshots of a dataset, which are loaded by memory-mapping them.
+
+A snapshot is a file with:
+ - MAGIC, and the size of the header, as a little-endian 64-bit integer
+ - the header: a JSON object with the number of rows, and the name, type
+   and position in the file of each column and of the string table
+ - the data of each column, as a fixed-width little-endian array: 64-bit
+   integers ('int64'), 64-bit floats with NaN for missing values
+   ('float64'), or for text columns ('string'), 32-bit indexes in the
+   string table, with -1 for missing values
+ - the string table shared by the text columns: the distinct values of all
+   of them, sorted, as the 64-bit positions where each one starts (and
+   where the last one ends) followed by all of them encoded in UTF-8
+
+Each section starts at a multiple of 8 bytes. Loading a snapshot only
+reads its header: columns are NumPy arrays backed by the mapped file, and
+strings are decoded when they are used.
+
+Usage (to convert a CSV file to a snapshot):
+    python3 -m top500.snapshot CSV SNAPSHOT
+'''
+
+import argparse
+import json
+import mmap
+import struct
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+MAGIC = b'TOP500S1'
+
+# Alignment of each section of the file
+ALIGNMENT = 8
+
+# Array type of each type of column
+DTYPES = {
+    'int64': '<i8',
+    'float64': '<f8',
+    'string': '<i4',
+}
+
+class StringTable:
+    '''The string table of a snapshot: a sequence of strings decoded from
+    the mapped file as they are used.
+
+    Params:
+     - offsets: array with the positions where each string starts in
+       'data', and where the last one ends
+     - data: buffer with the UTF-8 encoded strings
+    '''
+
+    def __init__(self, offsets, data):
+        self.offsets = offsets
+        self.data = data
+        self.decoded = {}
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("String index out of range")
+        value = self.decoded.get(index)
+        if value is None:
+            start, end = self.offsets[index], self.offsets[index + 1]
+            value = str(self.data[start:end], 'utf-8')
+            self.decoded[index] = value
+        return value
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+def _padding(size):
+    'Returns the bytes needed to align a section that ends at "size"'
+    return b'\0' * (-size % ALIGNMENT)
+
+def write_snapshot(path, columns):
+    '''Writes a snapshot of a dataset, given as a dictionary of columns by
+    name: NumPy arrays of integers or floats, or (codes, categories) tuples
+    for the text columns, with codes indexing categories (and -1 for
+    missing values)'''
+    strings = sorted({value for column in columns.values()
+                      if isinstance(column, tuple) for value in column[1]})
+    positions = {value: index for index, value in enumerate(strings)}
+    sections = []
+    header = {'rows': None, 'columns': []}
+    for name, column in columns.items():
+        if isinstance(column, tuple):
+            codes, categories = column
+            # Index the codes in the shared string table, with -1 (the last
+            # item) for missing values
+            lookup = numpy.array([positions[value] for value in categories]
+                                 + [-1], dtype=numpy.int32)
+            kind, array = 'string', lookup[codes]
+        elif numpy.issubdtype(column.dtype, numpy.integer):
+            kind, array = 'int64', column
+        else:
+            kind, array = 'float64', column
+        if header['rows'] is None:
+            header['rows'] = len(array)
+        header['columns'].append({'name': name, 'type': kind})
+        sections.append(numpy.ascontiguousarray(array, dtype=DTYPES[kind]))
+    encoded = [value.encode('utf-8') for value in strings]
+    offsets = numpy.zeros(len(encoded) + 1, dtype='<u8')
+    numpy.cumsum([len(value) for value in encoded], out=offsets[1:])
+    sections.append(offsets)
+    sections.append(b''.join(encoded))
+    header['rows'] = header['rows'] or 0
+    # The positions of the sections depend on the size of the header, which
+    # depends on them: compute them until they don't change
+    starts = None
+    while True:
+        text = json.dumps(header).encode('utf-8')
+        position = len(MAGIC) + 8 + len(text) + len(_padding(len(text)))
+        previous, starts = starts, []
+        for section in sections:
+            starts.append(position)
+            size = len(section) if isinstance(section, bytes) \
+                else section.nbytes
+            position += size + len(_padding(size))
+        if starts == previous:
+            break
+        for column, start in zip(header['columns'], starts):
+            column['offset'] = start
+        header['strings'] = {'count': len(strings), 'offsets': starts[-2],
+                             'data': starts[-1], 'size': len(sections[-1])}
+    text = json.dumps(header).encode('utf-8')
+    with open(path, 'wb') as output:
+        output.write(MAGIC)
+        output.write(struct.pack('<Q', len(text)))
+        output.write(text)
+        output.write(_padding(len(text)))
+        for section in sections:
+            data = section if isinstance(section, bytes) else section.tobytes()
+            output.write(data)
+            output.write(_padding(len(data)))
+
+def read_snapshot(path):
+    '''Maps a snapshot into memory. Returns a dictionary of columns by name:
+    NumPy arrays backed by the file, or (codes, StringTable) tuples for the
+    text columns. All the text columns share the same StringTable.'''
+    with open(path, 'rb') as snapshot:
+        data = mmap.mmap(snapshot.fileno(), 0, access=mmap.ACCESS_READ)
+    if data[:len(MAGIC)] != MAGIC:
+        raise ValueError("Not a snapshot: %s" % path)
+    size, = struct.unpack_from('<Q', data, len(MAGIC))
+    start = len(MAGIC) + 8
+    header = json.loads(str(data[start:start + size], 'utf-8'))
+    rows = header['rows']
+    info = header['strings']
+    strings = StringTable(
+        numpy.frombuffer(data, dtype='<u8', count=info['count'] + 1,
+                         offset=info['offsets']),
+        memoryview(data)[info['data']:info['data'] + info['size']])
+    columns = {}
+    for column in header['columns']:
+        array = numpy.frombuffer(data, dtype=DTYPES[column['type']],
+                                 count=rows, offset=column['offset'])
+        if column['type'] == 'string':
+            columns[column['name']] = (array, strings)
+        else:
+            columns[column['name']] = array
+    return columns
+
+def main():
+    'Converts a CSV file to a snapshot'
+    # pylint: disable=import-outside-toplevel
+    from top500.query import Dataset
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+    parser.add_argument('csv', help="CSV file with the dataset")
+    parser.add_argument('snapshot', help="Snapshot file to write")
+    args = parser.parse_args()
+    dataset = Dataset.from_csv(args.csv)
+    dataset.save(args.snapshot)
+    print("Wrote %d rows and %d columns to %s"
+          % (len(dataset), len(dataset.columns), args.snapshot))
+
+if __name__ == '__main__':
+    main()
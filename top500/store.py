@@ -0,0 +1,122 @@
+'''Backing stores for the details of systems and sites.
+
+The scraper keeps the details it scrapes from system and site pages in
+memory. A store keeps them across runs too, so that later runs only need to
+scrape the systems and sites that they didn't see before.
+'''
+
+import json
+import sqlite3
+import threading
+import time
+
+class DetailStore:
+    '''Base class for the stores of system and site details. It doesn't
+    keep anything: it's used when no persistent store is wanted.
+
+    Details are dictionaries, as returned by the scraper for a system or
+    site details page. Each of them is kept with the time it was scraped.
+    '''
+
+    def get_system(self, system_id):
+        'Returns the stored details of a system, or None'
+        return None
+
+    def put_system(self, system_id, system):
+        'Stores the details of a system'
+        pass
+
+    def get_site(self, site_id):
+        'Returns the stored details of a site, or None'
+        return None
+
+    def put_site(self, site_id, site):
+        'Stores the details of a site'
+        pass
+
+    def close(self):
+        'Releases any resources held by the store'
+        pass
+
+class MemoryStore(DetailStore):
+    '''Keeps system and site details in memory, for the current run only.
+    Unlike the scraper's own caches, it keeps the details as scraped from
+    their pages (see Scraper.forget).'''
+
+    def __init__(self):
+        self.systems = {}
+        self.sites = {}
+
+    def get_system(self, system_id):
+        return self.systems.get(system_id)
+
+    def put_system(self, system_id, system):
+        self.systems[system_id] = system
+
+    def get_site(self, site_id):
+        return self.sites.get(site_id)
+
+    def put_site(self, site_id, site):
+        self.sites[site_id] = site
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS systems (
+    id TEXT PRIMARY KEY,
+    scraped REAL NOT NULL,
+    details TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS sites (
+    id TEXT PRIMARY KEY,
+    scraped REAL NOT NULL,
+    details TEXT NOT NULL
+);
+'''
+
+class SQLiteStore(DetailStore):
+    '''Keeps system and site details in an SQLite database, indexed by ID.
+    Details are only read from the database when requested.
+
+    Params:
+     - path: the database file. It is created if needed.
+     - max_age: details scraped more than max_age seconds ago are
+       considered stale, and are not returned. None means no limit.
+    '''
+
+    def __init__(self, path, max_age=None):
+        self.max_age = max_age
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.executescript(SCHEMA)
+
+    def __get(self, table, key):
+        'Returns the details stored for a key in a table, if not stale'
+        with self.lock:
+            row = self.db.execute('SELECT scraped, details FROM %s '
+                                  'WHERE id = ?' % table, (key,)).fetchone()
+        if not row:
+            return None
+        scraped, details = row
+        if self.max_age is not None and time.time() - scraped > self.max_age:
+            return None
+        return json.loads(details)
+
+    def __put(self, table, key, details):
+        'Stores the details for a key in a table'
+        with self.lock, self.db:
+            self.db.execute('INSERT OR REPLACE INTO %s VALUES (?, ?, ?)'
+                            % table, (key, time.time(), json.dumps(details)))
+
+    def get_system(self, system_id):
+        return self.__get('systems', system_id)
+
+    def put_system(self, system_id, system):
+        self.__put('systems', system_id, system)
+
+    def get_site(self, site_id):
+        return self.__get('sites', site_id)
+
+    def put_site(self, site_id, site):
+        self.__put('sites', site_id, site)
+
+    def close(self):
+        self.db.close()
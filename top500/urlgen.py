@@ -51,6 +51,14 @@ def __next(edition):
         year += 1
     return date(year, month, 1)
 
+def page_kind(url):
+    '''Identifies the kind of page of an URL of the site: 'list', 'system' or
+    'site'. Returns None for other URLs.'''
+    match = re.search(r'/(list|system|site)/', url)
+    if not match:
+        return None
+    return match.group(1)
+
 def id_from_link(link):
     '''This returns the last part of an URL path. Assuming an URL of the
     form "https://some.thing/some/path/XXXX, this returns XXXX.
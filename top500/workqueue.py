@@ -0,0 +1,143 @@
+'''Work queue to share the scraping of the list pages between workers.
+
+The queue is an SQLite database with an item per list page. Workers (in
+the same host or in several hosts sharing the file) claim items, scrape
+their pages, and write the entries of each of them to a partial output in
+a directory next to the queue (QUEUE.parts). Once all the items are done,
+the partial outputs are merged into a single output, in (year, month, rank)
+order.
+
+Items are leased: an item claimed by a worker that doesn't complete it
+before its lease expires (e.g. because it died) can be claimed by others.
+Only the worker holding the lease of an item can complete or release it.
+'''
+
+import json
+import os
+import sqlite3
+import time
+from collections import namedtuple
+from datetime import date
+
+# Seconds a worker has to complete an item it claimed
+DEFAULT_LEASE = 600
+
+# Suffix of the directory with the partial outputs
+PARTS_SUFFIX = '.parts'
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS items (
+    year INTEGER NOT NULL,
+    month INTEGER NOT NULL,
+    page INTEGER NOT NULL,
+    lim INTEGER NOT NULL,
+    state TEXT NOT NULL DEFAULT 'pending',
+    worker TEXT,
+    expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (year, month, page)
+);
+'''
+
+# An item of the queue: a page of a list edition, and the number of entries
+# to scrape from it
+WorkItem = namedtuple('WorkItem', ('edition', 'page', 'limit'))
+
+class WorkQueue:
+    '''Queue of list pages to scrape, shared by several workers.
+
+    Params:
+     - path: the queue database. It is created if needed.
+    '''
+
+    def __init__(self, path):
+        self.path = path
+        self.parts = path + PARTS_SUFFIX
+        os.makedirs(self.parts, exist_ok=True)
+        # Transactions are handled explicitly, to claim items atomically.
+        # Other workers can keep the database locked for a while.
+        self.db = sqlite3.connect(path, timeout=60, isolation_level=None)
+        self.db.executescript(SCHEMA)
+
+    def add(self, items):
+        'Adds items to the queue, unless they are in it already'
+        self.db.execute('BEGIN IMMEDIATE')
+        self.db.executemany(
+            'INSERT OR IGNORE INTO items (year, month, page, lim) '
+            'VALUES (?, ?, ?, ?)',
+            ((item.edition.year, item.edition.month, item.page, item.limit)
+             for item in items))
+        self.db.execute('COMMIT')
+
+    def claim(self, worker, lease=DEFAULT_LEASE):
+        '''Claims the first item (in edition and page order) that is pending
+        or whose lease expired, for 'lease' seconds. Returns the WorkItem, or
+        None if there are no items left to claim.'''
+        now = time.time()
+        self.db.execute('BEGIN IMMEDIATE')
+        row = self.db.execute(
+            "SELECT year, month, page, lim FROM items "
+            "WHERE state = 'pending' OR (state = 'leased' AND expires < ?) "
+            "ORDER BY year, month, page LIMIT 1", (now,)).fetchone()
+        if row:
+            self.db.execute(
+                "UPDATE items SET state = 'leased', worker = ?, expires = ?, "
+                "attempts = attempts + 1 "
+                "WHERE year = ? AND month = ? AND page = ?",
+                (worker, now + lease) + row[:3])
+        self.db.execute('COMMIT')
+        if not row:
+            return None
+        year, month, page, limit = row
+        return WorkItem(date(year, month, 1), page, limit)
+
+    def __set_state(self, item, worker, state):
+        '''Changes the state of an item leased by a worker. Returns whether
+        the worker still held the lease (otherwise, the item is unchanged).
+        '''
+        cursor = self.db.execute(
+            "UPDATE items SET state = ?, expires = NULL "
+            "WHERE year = ? AND month = ? AND page = ? "
+            "AND state = 'leased' AND worker = ?",
+            (state, item.edition.year, item.edition.month, item.page, worker))
+        return cursor.rowcount > 0
+
+    def complete(self, item, worker):
+        '''Marks an item claimed by a worker as done, once its partial output
+        has been written. Returns False if the worker lost its lease (see
+        claim), and the item was left as it was.'''
+        return self.__set_state(item, worker, 'done')
+
+    def release(self, item, worker):
+        '''Returns an item claimed by a worker to the queue, so that others
+        can claim it. Returns False if the worker lost its lease (see claim),
+        and the item was left as it was.'''
+        return self.__set_state(item, worker, 'pending')
+
+    def counts(self):
+        'Returns the number of items in each state, as a dictionary'
+        return dict(self.db.execute(
+            'SELECT state, COUNT(*) FROM items GROUP BY state').fetchall())
+
+    def items(self):
+        'Returns all the items, in edition and page order'
+        return [WorkItem(date(year, month, 1), page, limit)
+                for year, month, page, limit in self.db.execute(
+                    'SELECT year, month, page, lim FROM items '
+                    'ORDER BY year, month, page')]
+
+    def part_path(self, item):
+        'Returns the path of the partial output of an item'
+        return os.path.join(self.parts, '%04d-%02d-%d.jsonl'
+                            % (item.edition.year, item.edition.month,
+                               item.page))
+
+    def read_part(self, item):
+        'Generator for the entries in the partial output of an item'
+        with open(self.part_path(item), encoding='utf-8') as part:
+            for line in part:
+                yield json.loads(line)
+
+    def close(self):
+        'Closes the queue'
+        self.db.close()
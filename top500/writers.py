@@ -0,0 +1,341 @@
+'''Writers for the scraped list entries, in several output formats.
+
+Writers buffer entries and write them in batches. Available formats:
+ - csv: plain CSV, the original output format of the scraper
+ - csv.gz: gzip-compressed CSV
+ - jsonl: JSON Lines, one JSON object per entry
+ - parquet: Apache Parquet
+ - arrow: Apache Arrow IPC file
+ - sqlite: SQLite database with separate tables for sites, systems and
+   list entries (see SQLiteWriter)
+The Parquet and Arrow formats have typed columns (see column_types), and
+need pyarrow to be installed.
+'''
+
+import csv
+import gzip
+import json
+import os
+import sqlite3
+from top500.scraper import ENTRY_FIELDS, INTEGER_FIELDS, FLOAT_FIELDS, \
+    SITE_FIELDS, SYSTEM_RECORD_FIELDS
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+FORMATS = ('csv', 'csv.gz', 'jsonl', 'parquet', 'arrow', 'sqlite')
+
+# Formats that can be written to a stream (e.g. the standard output)
+STREAM_FORMATS = ('csv', 'jsonl')
+
+# Number of entries buffered before writing them
+DEFAULT_BATCH_SIZE = 1000
+
+# Fields of an entry that are integers, other than the INTEGER_FIELDS from
+# the details of a system
+ENTRY_INTEGER_FIELDS = ('year', 'month', 'rank')
+
+class Writer:
+    '''Base class for the writers. Entries are buffered and written in
+    batches by write_batch, which subclasses implement.
+
+    Params:
+     - outfile: the name of the output file, or a stream
+     - append: whether to add entries to an existing output file
+     - batch_size: number of entries to buffer before writing them
+    '''
+
+    # Whether the output can be truncated to the size it had after a batch
+    # (see tell()) and appended to, to resume an interrupted run
+    resumable = False
+    # Whether entries written again replace the ones in the output, so that
+    # entries can be appended in any order
+    upsert = False
+
+    def __init__(self, outfile, append=False, batch_size=DEFAULT_BATCH_SIZE):
+        self.outfile = outfile
+        self.append = append
+        self.batch_size = batch_size
+        self.batch = []
+
+    def write(self, entry):
+        'Adds an entry to the output'
+        self.batch.append(entry)
+        if len(self.batch) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        'Writes the buffered entries'
+        if self.batch:
+            self.write_batch(self.batch)
+            self.batch = []
+
+    def write_batch(self, entries):
+        'Writes a batch of entries'
+        raise NotImplementedError
+
+    def tell(self):
+        'Returns the current size of the output, once flushed'
+        raise NotImplementedError
+
+    @staticmethod
+    def truncate(path, size):
+        '''Truncates an output file to a size returned by tell(), dropping
+        the entries written after it'''
+        os.truncate(path, size)
+
+    def close(self):
+        'Writes any buffered entries and closes the output'
+        self.flush()
+
+class TextWriter(Writer):
+    '''Base class for the writers of text formats. The output file is opened
+    by the writer if given by its name, and can also be a stream.'''
+
+    resumable = True
+
+    def __init__(self, outfile, append=False, batch_size=DEFAULT_BATCH_SIZE):
+        super().__init__(outfile, append, batch_size)
+        self.owned = isinstance(outfile, str)
+        if self.owned:
+            self.stream = self.open(outfile, 'a' if append else 'w')
+        else:
+            self.stream = outfile
+
+    @staticmethod
+    def open(path, mode):
+        'Opens the output file'
+        return open(path, mode, encoding='utf-8')
+
+    def flush(self):
+        super().flush()
+        self.stream.flush()
+
+    def tell(self):
+        self.flush()
+        return self.stream.tell()
+
+    def close(self):
+        self.flush()
+        if self.owned:
+            self.stream.close()
+
+class CSVWriter(TextWriter):
+    'Writes entries in CSV format, with a header unless appending'
+
+    def __init__(self, outfile, append=False, batch_size=DEFAULT_BATCH_SIZE):
+        super().__init__(outfile, append, batch_size)
+        self.csvwriter = csv.writer(self.stream,
+                                    delimiter=',',
+                                    quotechar='"',
+                                    quoting=csv.QUOTE_MINIMAL)
+        if not append:
+            # Write header (column names)
+            self.csvwriter.writerow(ENTRY_FIELDS)
+
+    def write_batch(self, entries):
+        self.csvwriter.writerows(entry.values() for entry in entries)
+
+class GzipCSVWriter(CSVWriter):
+    '''Writes entries in gzip-compressed CSV format. Appending adds a new
+    gzip member to the file, which decompresses as a single CSV file.'''
+
+    resumable = False
+
+    @staticmethod
+    def open(path, mode):
+        return gzip.open(path, mode + 't', encoding='utf-8')
+
+class JSONLinesWriter(TextWriter):
+    'Writes entries as JSON objects, one per line'
+
+    def write_batch(self, entries):
+        self.stream.writelines(json.dumps(entry) + '\n' for entry in entries)
+
+def column_types():
+    'Returns the pyarrow type of each of the ENTRY_FIELDS'
+    types = {}
+    for field in ENTRY_FIELDS:
+        if field in INTEGER_FIELDS or field in ENTRY_INTEGER_FIELDS:
+            types[field] = pyarrow.int64()
+        elif field in FLOAT_FIELDS:
+            types[field] = pyarrow.float64()
+        else:
+            types[field] = pyarrow.string()
+    return types
+
+def _typed(value, kind):
+    '''Converts a value to the given Python type, or None if it can't be.
+    Numeric fields can contain text when the site didn't provide a number'''
+    if value is None or isinstance(value, kind):
+        return value
+    try:
+        return kind(value)
+    except ValueError:
+        return None
+
+class ArrowWriter(Writer):
+    '''Writes entries in the Apache Arrow IPC file format, with typed columns.
+    Each batch of entries is written as an Arrow record batch.'''
+
+    def __init__(self, outfile, append=False, batch_size=DEFAULT_BATCH_SIZE):
+        if pyarrow is None:
+            raise RuntimeError("The pyarrow module is needed for this format")
+        if append:
+            raise ValueError("Can't append to a %s file" % type(self).__name__)
+        super().__init__(outfile, append, batch_size)
+        types = column_types()
+        self.schema = pyarrow.schema(list(types.items()))
+        self.converters = {field: int if kind == pyarrow.int64()
+                                  else float if kind == pyarrow.float64()
+                                  else str
+                           for field, kind in types.items()}
+        self.output = self.open_output()
+
+    def open_output(self):
+        'Opens the output file'
+        return pyarrow.ipc.new_file(self.outfile, self.schema)
+
+    def table(self, entries):
+        'Builds a pyarrow Table from a batch of entries'
+        columns = [[_typed(entry[field], self.converters[field])
+                    for entry in entries] for field in ENTRY_FIELDS]
+        return pyarrow.Table.from_arrays(columns, schema=self.schema)
+
+    def write_batch(self, entries):
+        self.output.write_table(self.table(entries))
+
+    def close(self):
+        self.flush()
+        self.output.close()
+
+class ParquetWriter(ArrowWriter):
+    '''Writes entries in the Apache Parquet format, with typed columns.
+    Each batch of entries is written as a row group.'''
+
+    def open_output(self):
+        return pyarrow.parquet.ParquetWriter(self.outfile, self.schema)
+
+# Columns of each table of the SQLite output. Entries only have the fields
+# that can change between list editions; the rest are in the system and
+# site tables.
+SITE_COLUMNS = ['site_id'] + [field for field in SITE_FIELDS
+                              if field != 'site_id']
+SYSTEM_COLUMNS = ['system_id', 'site_id'] + [field for field
+                                             in SYSTEM_RECORD_FIELDS
+                                             if field != 'gpu']
+ENTRY_COLUMNS = ['year', 'month', 'rank', 'system_id', 'name', 'gpu',
+                 'manufacturer', 'cores', 'rmax', 'rpeak', 'power']
+
+def _column(field):
+    'SQL definition of a column for a field'
+    if field in INTEGER_FIELDS or field in ENTRY_INTEGER_FIELDS:
+        return '%s INTEGER' % field
+    if field in FLOAT_FIELDS:
+        return '%s REAL' % field
+    return '%s TEXT' % field
+
+SQLITE_SCHEMA = '''
+PRAGMA foreign_keys = ON;
+CREATE TABLE IF NOT EXISTS sites (
+    %(sites)s,
+    PRIMARY KEY (site_id)
+);
+CREATE TABLE IF NOT EXISTS systems (
+    %(systems)s,
+    PRIMARY KEY (system_id),
+    FOREIGN KEY (site_id) REFERENCES sites (site_id)
+);
+CREATE TABLE IF NOT EXISTS entries (
+    %(entries)s,
+    PRIMARY KEY (year, month, rank),
+    FOREIGN KEY (system_id) REFERENCES systems (system_id)
+);
+CREATE INDEX IF NOT EXISTS systems_site_id ON systems (site_id);
+CREATE INDEX IF NOT EXISTS entries_system_id ON entries (system_id);
+CREATE INDEX IF NOT EXISTS entries_edition ON entries (year, month);
+DROP VIEW IF EXISTS top500;
+CREATE VIEW top500 AS
+    SELECT %(fields)s
+    FROM entries
+    JOIN systems USING (system_id)
+    LEFT JOIN sites USING (site_id);
+''' % {
+    'sites': ',\n    '.join(_column(field) for field in SITE_COLUMNS),
+    'systems': ',\n    '.join(_column(field) for field in SYSTEM_COLUMNS),
+    'entries': ',\n    '.join(_column(field) for field in ENTRY_COLUMNS),
+    'fields': ', '.join(ENTRY_FIELDS),
+}
+
+class SQLiteWriter(Writer):
+    '''Writes entries to an SQLite database, normalized into 3 tables:
+     - sites: the details of each site, by site_id
+     - systems: the details of each system that don't change across list
+       editions, by system_id, with the site_id of its site
+     - entries: the list entries, by (year, month, rank), with the
+       system_id and the details that change in each edition
+    Sites and systems are updated with their latest details. The 'top500'
+    view joins them back into the ENTRY_FIELDS of each entry (also of the
+    entries without a site, e.g. rebuilt with --history).
+    The view is recreated when the database is opened, so that outputs
+    written by previous versions get the current one.
+
+    Entries are replaced if they are written again, so there's no need to
+    truncate the output to resume an interrupted run.
+    '''
+
+    resumable = True
+    upsert = True
+
+    def __init__(self, outfile, append=False, batch_size=DEFAULT_BATCH_SIZE):
+        super().__init__(outfile, append, batch_size)
+        if not append and os.path.exists(outfile):
+            os.remove(outfile)
+        self.db = sqlite3.connect(outfile)
+        self.db.executescript(SQLITE_SCHEMA)
+
+    @staticmethod
+    def __upsert(table, columns):
+        'SQL statement to insert or replace rows in a table'
+        return 'INSERT OR REPLACE INTO %s (%s) VALUES (%s)' % (
+            table, ', '.join(columns), ', '.join('?' for _ in columns))
+
+    def write_batch(self, entries):
+        with self.db:
+            for table, columns in (('sites', SITE_COLUMNS),
+                                   ('systems', SYSTEM_COLUMNS),
+                                   ('entries', ENTRY_COLUMNS)):
+                self.db.executemany(
+                    self.__upsert(table, columns),
+                    ([entry[field] for field in columns] for entry in entries
+                     # Entries without a site have no row in sites
+                     if table != 'sites' or entry['site_id'] is not None))
+
+    def tell(self):
+        self.flush()
+        return 0
+
+    @staticmethod
+    def truncate(path, size):
+        pass
+
+    def close(self):
+        self.flush()
+        self.db.close()
+
+WRITERS = {
+    'csv': CSVWriter,
+    'csv.gz': GzipCSVWriter,
+    'jsonl': JSONLinesWriter,
+    'parquet': ParquetWriter,
+    'arrow': ArrowWriter,
+    'sqlite': SQLiteWriter,
+}
+
+def open_writer(fmt, outfile, append=False, batch_size=DEFAULT_BATCH_SIZE):
+    'Returns a writer for the given format (one of FORMATS)'
+    return WRITERS[fmt](outfile, append, batch_size)